@@ -2,25 +2,40 @@
 
 import os
 import sys
-import tempfile
-import shutil
-from datetime import datetime
+import queue
+import time
 
 import pyperclip
-from PySide6.QtWidgets import QWidget, QFileDialog, QMessageBox
-from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QWidget, QFileDialog, QMessageBox, QListWidgetItem
+from PySide6.QtCore import QTimer, Qt
+from PySide6.QtGui import QTextCursor
 
 # Importações dos componentes locais
 from .ui.main_ui import setup_ui
 from .ui.styles import BTN_RECORD_ACTIVE_STYLE, BTN_COPY_SUCCESS_STYLE
 from .services.device_manager import get_audio_devices
-from .services.audio_recorder import RecordingThread
-from .services.transcriber import TranscriptionThread, get_model
-
+from .services.audio_recorder import (RECORDING_FORMATS, WARM_CAPTURE_ENV, RecordingThread, AudioSaveThread,
+                                      WarmInput)
+from .services.transcriber import StreamingTranscriptionThread, WorkerStreamingTranscriptionThread
+from .services.job_queue import (JobScheduler, TranscriptionJob, PRIORITY_FILE, PRIORITY_RECORDING,
+                                 RUNNING, DONE, FAILED)
+from .services import inference_worker, instrumentation, model_store, tuning
+
+from .services.model_pool import get_model_pool
+from .services.quantization import QUANTIZED_SUFFIX, base_model_name, is_quantized, quantized_path
+from .services.speculative import DEFAULT_DRAFT_MODEL
 from .threads import ModelLoaderThread 
 
+# Modelos pré-carregados após o primeiro, separados por vírgula (ex.: "tiny,large-v3")
+PREFETCH_ENV = "S2T_PREFETCH_MODELS"
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
 class Speech2TextApp(QWidget):
-    def __init__(self):
+    def __init__(self, autoload_model=True):
         super().__init__()
         self.setWindowTitle("Transcrição de Áudio")
         self.setMinimumSize(600, 400)
@@ -31,18 +46,34 @@ class Speech2TextApp(QWidget):
         self.loaded_model_name = None
         self.is_recording = False
         self.recording_thread = None
-        self.transcription_thread = None
+        self.recording_overflows = 0
+        self.warm_input = None  # Stream de entrada mantido aberto (captura quente)
+        self.scheduler = JobScheduler(parent=self)
+        self.job_items = {}     # id do trabalho -> item da lista de trabalhos
+        self.measured_job = None # Trabalho cujo fim encerra a medição de latência
+        self.displayed_job = None # Trabalho cujo texto (parcial ou final) está na área de texto
+        self.streaming_thread = None
+        self.live_segments = []
+        self.live_pending_result = None # (arquivo, manter áudio) aguardando o fim da transcrição ao vivo
         self.current_audio_file = None
+        self.unsaved_recording = None # Arquivo temporário da última gravação, para "Salvar Áudio"
+        self.recording_spools = {}  # id do trabalho -> arquivo temporário da gravação transcrita
+        self.audio_save_thread = None
         self.devices = None 
 
         # Configuração da UI
         setup_ui(self)
+        self.warm_capture_tooltip = self.warm_capture_checkbox.toolTip()
         self._populate_mics()
         self._populate_models() # NOVO: Preenche o ComboBox de modelos
         self._connect_signals()
         
-        # NOVO: Inicia o carregamento do modelo padrão
-        self._change_model() 
+        # Inicia o carregamento do modelo padrão só depois que a janela
+        # aparecer, para não atrasar a abertura.
+        if autoload_model:
+            QTimer.singleShot(0, self._change_model)
+        if os.environ.get(WARM_CAPTURE_ENV) == "1":
+            QTimer.singleShot(0, lambda: self.warm_capture_checkbox.setChecked(True))
 
     def _connect_signals(self):
         """Conecta os sinais dos widgets aos slots (métodos)."""
@@ -50,6 +81,18 @@ class Speech2TextApp(QWidget):
         self.btn_file.clicked.connect(self._on_select_file)
         self.btn_copy.clicked.connect(self._copy_text)
         self.btn_save_audio.clicked.connect(self._save_current_audio)
+        self.btn_latency.clicked.connect(self._toggle_latency)
+        self.btn_cancel_job.clicked.connect(self._cancel_job)
+        self.jobs_list.itemClicked.connect(self._show_job_text)
+        self.speculative_checkbox.toggled.connect(self._on_speculative_toggled)
+        self.warm_capture_checkbox.toggled.connect(self._update_warm_input)
+        self.mic_combo.currentIndexChanged.connect(self._update_warm_input)
+
+        self.scheduler.job_added.connect(self._on_job_updated)
+        self.scheduler.job_started.connect(self._on_job_started)
+        self.scheduler.job_segment.connect(self._on_job_segment)
+        self.scheduler.job_progress.connect(self._on_job_updated)
+        self.scheduler.job_finished.connect(self._on_job_finished)
 
         # NOVO: Conecta o combobox de modelo e a thread
         self.model_combo.currentIndexChanged.connect(self._change_model)
@@ -58,6 +101,47 @@ class Speech2TextApp(QWidget):
         self.copy_timer.setSingleShot(True)
         self.copy_timer.timeout.connect(self._reset_copy_button)
 
+    def _on_speculative_toggled(self, checked):
+        """Carrega o modelo de rascunho em segundo plano assim que a opção é ligada."""
+        if not checked:
+            return
+        if inference_worker.enabled():
+            # No mesmo processo de trabalho do modelo escolhido
+            inference_worker.get_worker_pool().prefetch(
+                [name for name in (self.loaded_model_name, DEFAULT_DRAFT_MODEL) if name])
+        else:
+            get_model_pool().prefetch(DEFAULT_DRAFT_MODEL)
+
+    def _update_warm_input(self):
+        """Abre, troca ou fecha o stream quente conforme a opção e o microfone escolhido."""
+        if self.is_recording:
+            return  # Reaplicado quando a gravação terminar
+        device_idx = self.mic_combo.currentData()
+        wanted = self.warm_capture_checkbox.isChecked() and device_idx is not None
+        if self.warm_input is not None:
+            if wanted and self.warm_input.device_idx == device_idx:
+                self._show_warm_stats()
+                return
+            self.warm_input.close()
+            self.warm_input = None
+        if not wanted:
+            self.warm_capture_checkbox.setToolTip(self.warm_capture_tooltip)
+            return
+        try:
+            self.warm_input = WarmInput(device_idx, self.devices[device_idx])
+        except Exception as e:
+            instrumentation.log(f"Erro ao abrir a captura quente: {e}")
+            self.warm_capture_checkbox.blockSignals(True)
+            self.warm_capture_checkbox.setChecked(False)
+            self.warm_capture_checkbox.blockSignals(False)
+            self.status_label.setText("Não foi possível manter o microfone aberto")
+            self.status_label.setStyleSheet("color: red; font-weight: bold;")
+            return
+        self._show_warm_stats()
+
+    def _show_warm_stats(self):
+        self.warm_capture_checkbox.setToolTip(f"{self.warm_capture_tooltip}\n{self.warm_input.format_stats()}")
+
     def _populate_mics(self):
         """Preenche o ComboBox com os microfones encontrados."""
         input_devices, all_devices = get_audio_devices()
@@ -82,6 +166,8 @@ class Speech2TextApp(QWidget):
         }
         for display_name, internal_name in models.items():
             self.model_combo.addItem(display_name, internal_name)
+            # Variante quantizada: pesos em int8, mais leve e mais rápida sem GPU
+            self.model_combo.addItem(f"{display_name} - int8 CPU", internal_name + QUANTIZED_SUFFIX)
         
         # Define o 'medium' como padrão
         self.model_combo.setCurrentText("Equilibrado (medium)")
@@ -118,19 +204,24 @@ class Speech2TextApp(QWidget):
             return
 
         # 2. Verifica se o modelo já existe no cache do Whisper.
+        #    A versão int8 é gerada a partir do checkpoint do modelo base.
+        base_name = base_model_name(model_name)
         cache_path = os.path.join(os.path.expanduser("~"), ".cache", "whisper")
-        expected_model_file = os.path.join(cache_path, f"{model_name}.pt")
+        expected_model_file = os.path.join(cache_path, f"{base_name}.pt")
 
         proceed = True # Flag para controlar se devemos prosseguir
 
-        # 3. Se o arquivo do modelo não existir, exibe o diálogo de confirmação.
-        if not os.path.exists(expected_model_file):
+        # 3. Se o arquivo do modelo não existir (nem sua versão convertida
+        #    para carga mapeada, nem o modelo já na memória), exibe o diálogo de confirmação.
+        if (not os.path.exists(expected_model_file) and not model_store.is_converted(base_name)
+                and not (is_quantized(model_name) and os.path.exists(quantized_path(model_name)))
+                and not self._model_resident(model_name)):
             model_info = {
                 "large-v3": "aprox. 3.1 GB", "medium": "aprox. 1.5 GB",
                 "small": "aprox. 488 MB", "base": "aprox. 148 MB",
                 "tiny": "aprox. 78 MB"
             }
-            info = model_info.get(model_name, "Tamanho desconhecido")
+            info = model_info.get(base_name, "Tamanho desconhecido")
 
             reply = QMessageBox.question(
                 self,
@@ -168,10 +259,23 @@ class Speech2TextApp(QWidget):
         """Recebe o modelo carregado e atualiza a aplicação."""
         if model:
             self.current_model = model
+            self.loaded_model_name = self.model_loader_thread.model_name
             self.status_label.setText(f"Modelo '{self.model_combo.currentData()}' pronto!")
             self.status_label.setStyleSheet("color: #27ae60; font-weight: bold;")
+            if inference_worker.enabled():
+                tooltip = inference_worker.get_worker_pool().format_stats()
+            else:
+                tooltip = get_model_pool().format_stats()
+            # Comparação com o float32 medida por `python -m app.tune --int8`
+            comparison = (tuning.get_profile(self.loaded_model_name) or {}).get("fp32_comparison")
+            if comparison:
+                tooltip += (f"\nint8 vs. float32: WER {comparison['wer_delta']:+.1%}, "
+                            f"{comparison['speedup']}x mais rápido")
+            self.status_label.setToolTip(tooltip)
+            self._prefetch_models()
         else:
             self.current_model = None
+            self.loaded_model_name = None
             self.status_label.setText("Falha ao carregar o modelo!")
             self.status_label.setStyleSheet("color: red; font-weight: bold;")
             QMessageBox.critical(self, "Erro de Modelo", "Não foi possível carregar o modelo selecionado.")
@@ -179,6 +283,19 @@ class Speech2TextApp(QWidget):
         # Reabilita a UI
         self.set_ui_enabled(True)
     
+    def _model_resident(self, model_name):
+        if inference_worker.enabled():
+            return inference_worker.get_worker_pool().is_resident(model_name)
+        return get_model_pool().is_resident(model_name)
+
+    def _prefetch_models(self):
+        """Pré-carrega em segundo plano os modelos listados em S2T_PREFETCH_MODELS."""
+        names = os.environ.get(PREFETCH_ENV, "")
+        pool = inference_worker.get_worker_pool() if inference_worker.enabled() else get_model_pool()
+        for name in filter(None, (n.strip() for n in names.split(","))):
+            if not pool.is_resident(name):
+                pool.prefetch([name] if inference_worker.enabled() else name)
+
     def set_ui_enabled(self, enabled):
         """Habilita ou desabilita os principais widgets de interação."""
         self.btn_record.setEnabled(enabled)
@@ -207,24 +324,29 @@ class Speech2TextApp(QWidget):
         # Verifica se deve salvar o áudio
         save_audio = self.save_audio_checkbox.isChecked()
         
+        audio_format = self.audio_format_combo.currentData()
         if save_audio:
             # Solicita onde salvar o arquivo
+            spec = RECORDING_FORMATS[audio_format]
             output_path, _ = QFileDialog.getSaveFileName(
-                self, "Salvar Gravação como WAV", "gravacao.wav", "WAV Files (*.wav)"
+                self, f"Salvar Gravação como {spec['format']}", "gravacao" + spec["extension"], spec["filter"]
             )
             if not output_path:
                 return
         else:
-            # Usa arquivo temporário
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(tempfile.gettempdir(), f"transcricao_temp_{timestamp}.wav")
+            # Sem arquivo: o áudio vai da gravação para a transcrição em memória
+            # (e, na taxa do dispositivo, para um arquivo temporário)
+            output_path = None
 
         self.current_audio_file = output_path
+        self._set_unsaved_recording(None)
         self.is_recording = True
         self.btn_record.setText("Parar Gravação")
         self.btn_record.setStyleSheet("background-color: #ff4444; color: white; font-weight: bold;")
         self.btn_file.setEnabled(False)  # Desabilita seleção de arquivo durante gravação
         self.save_audio_checkbox.setEnabled(False)  # Desabilita checkbox durante gravação
+        self.live_transcription_checkbox.setEnabled(False)
+        self.audio_format_combo.setEnabled(False)
         self.model_combo.setEnabled(False)
         self.status_label.setText("Gravando: 0 segundos")
         self.status_label.setStyleSheet("color: red; font-weight: bold;")
@@ -232,16 +354,47 @@ class Speech2TextApp(QWidget):
         # Oculta botão de salvar áudio se estiver visível
         self.btn_save_audio.setVisible(False)
 
-        # Cria e configura thread de gravação
-        self.recording_thread = RecordingThread(device_idx, output_path, self.devices, save_audio)
+        # Transcrição ao vivo: a gravação alimenta a fila consumida pela thread de streaming
+        audio_queue = None
+        self.streaming_thread = None
+        if self.live_transcription_checkbox.isChecked() and self.current_model is not None:
+            audio_queue = queue.Queue()
+            self.live_segments = []
+            self.live_pending_result = None
+            self.text_edit.clear()
+            if inference_worker.enabled():
+                # No processo de trabalho que já tem o modelo, não numa segunda cópia aqui
+                self.streaming_thread = WorkerStreamingTranscriptionThread(self.loaded_model_name, audio_queue)
+            else:
+                self.streaming_thread = StreamingTranscriptionThread(self.current_model, audio_queue)
+            self.streaming_thread.partial_text.connect(self._on_live_partial)
+            self.streaming_thread.segment_finalized.connect(self._on_live_segment)
+            self.streaming_thread.streaming_finished.connect(self._on_live_finished)
+            self.streaming_thread.transcription_error.connect(self._on_transcription_error)
+            self.streaming_thread.start()
+
+        # Cria e configura thread de gravação (no stream quente, se estiver aberto)
+        warm_input = self.warm_input
+        if warm_input is not None and warm_input.device_idx != device_idx:
+            warm_input = None
+        self.recording_thread = RecordingThread(device_idx, output_path, self.devices, save_audio, audio_queue,
+                                                audio_format, warm_input=warm_input)
         self.recording_thread.recording_finished.connect(self._on_recording_success)
         self.recording_thread.recording_error.connect(self._on_recording_error)
         self.recording_thread.recording_update.connect(self._update_recording_time)
+        self.recording_thread.recording_overflow.connect(self._on_recording_overflow)
+        self.recording_overflows = 0
         self.recording_thread.start()
 
     def _stop_recording(self):
         """Para a gravação"""
         if self.recording_thread:
+            # O trabalho medido vai do clique em "Parar" até o texto na tela; as
+            # threads da gravação e da transcrição ao vivo medem dentro dele
+            metrics = instrumentation.begin_job("gravação")
+            self.recording_thread.metrics = metrics
+            if self.streaming_thread is not None:
+                self.streaming_thread.metrics = metrics
             self.recording_thread.stop_recording()
             self.status_label.setText("Finalizando gravação...")
             self.status_label.setStyleSheet("color: orange; font-weight: bold;")
@@ -251,86 +404,251 @@ class Speech2TextApp(QWidget):
         minutes = seconds // 60
         secs = seconds % 60
         if minutes > 0:
-            self.status_label.setText(f"Gravando: {minutes}min {secs}s")
+            text = f"Gravando: {minutes}min {secs}s"
         else:
-            self.status_label.setText(f"Gravando: {secs} segundos")
+            text = f"Gravando: {secs} segundos"
+        if self.recording_overflows:
+            text += f" ({self.recording_overflows} falha(s) de buffer)"
+        self.status_label.setText(text)
+
+    def _on_recording_overflow(self, count):
+        """Atualiza o total de overflows de captura reportados pela gravação"""
+        self.recording_overflows = count
 
-    def _on_recording_success(self, output_path, keep_audio):
+    def _on_recording_success(self, audio, output_path, keep_audio):
         """Chamado quando gravação é bem-sucedida"""
-        print("Gravação bem-sucedida, iniciando transcrição...")
+        instrumentation.log("Gravação bem-sucedida, iniciando transcrição...")
         
         self.is_recording = False
         self.btn_record.setText("Iniciar Gravação")
         self.btn_record.setStyleSheet("")  # Remove estilo customizado
         self.btn_file.setEnabled(True)  # Reabilita seleção de arquivo
         self.save_audio_checkbox.setEnabled(True)  # Reabilita checkbox
+        self.live_transcription_checkbox.setEnabled(True)
+        self.audio_format_combo.setEnabled(True)
         self.model_combo.setEnabled(True)
+        self._update_warm_input()
+
+        spool_path = self.recording_thread.spool_path
+        if self.streaming_thread is not None:
+            # O texto já foi sendo transcrito; só falta finalizar o último trecho
+            self._set_unsaved_recording(spool_path)
+            self.live_pending_result = (output_path, keep_audio)
+            self.btn_record.setEnabled(False)
+            self.btn_file.setEnabled(False)
+            self.status_label.setText("Gravação concluída! Finalizando transcrição ao vivo...")
+            self.status_label.setStyleSheet("color: orange; font-weight: bold;")
+            return
+
         self.status_label.setText("Gravação concluída! Iniciando transcrição...")
         self.status_label.setStyleSheet("color: green; font-weight: bold;")
         
-        # Inicia transcrição automaticamente
-        self._transcribe_file(output_path, keep_audio)
+        # Coloca a transcrição na fila à frente dos arquivos, passando o áudio já em memória
+        job = self._transcribe_file(output_path, keep_audio, audio=audio, priority=PRIORITY_RECORDING,
+                                    metrics=self.recording_thread.metrics)
+        if job is not None:
+            self.measured_job = job
+            if spool_path:
+                self.recording_spools[job.id] = spool_path
+        else:
+            _remove_file(spool_path)
 
     def _on_recording_error(self, error_msg):
         """Chamado quando há erro na gravação"""
-        print(f"Erro na gravação: {error_msg}")
+        instrumentation.log(f"Erro na gravação: {error_msg}")
+        if self.recording_thread.metrics is not None:
+            instrumentation.end_job(self.recording_thread.metrics)
         
         self.is_recording = False
         self.btn_record.setText("Iniciar Gravação")
         self.btn_record.setStyleSheet("")  # Remove estilo customizado
         self.btn_file.setEnabled(True)  # Reabilita seleção de arquivo
         self.save_audio_checkbox.setEnabled(True)  # Reabilita checkbox
+        self.live_transcription_checkbox.setEnabled(True)
+        self.audio_format_combo.setEnabled(True)
         self.model_combo.setEnabled(True)
+        self._update_warm_input()
         self.status_label.setText("Erro na gravação")
         self.status_label.setStyleSheet("color: red; font-weight: bold;")
         QMessageBox.critical(self, "Erro na Gravação", f"Falha ao gravar: {error_msg}")
 
+    def _on_live_segment(self, text):
+        """Um trecho da transcrição ao vivo foi finalizado."""
+        self.live_segments.append(text)
+        self.text_edit.setPlainText(" ".join(self.live_segments))
+
+    def _on_live_partial(self, text):
+        """Mostra o texto confirmado seguido da hipótese do trecho atual."""
+        self.text_edit.setPlainText(" ".join(self.live_segments + [text]).strip())
+
+    def _on_live_finished(self, text):
+        """Chamado quando a transcrição ao vivo processou todo o áudio gravado."""
+        self.streaming_thread = None
+        if self.live_pending_result is None:
+            # A gravação falhou; o erro já foi exibido
+            return
+        output_path, keep_audio = self.live_pending_result
+        self.live_pending_result = None
+        self._on_transcription_success(text, output_path, keep_audio)
+
     def _on_select_file(self):
-        path, _ = QFileDialog.getOpenFileName(
-            self, "Abrir Arquivo de Áudio", ".", 
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Abrir Arquivos de Áudio", ".", 
             "Áudio (*.wav *.m4a *.mp3 *.flac *.ogg)"
         )
-        if path:
-            self._transcribe_file(path, keep_audio=True)  # Arquivos selecionados são sempre mantidos
-
-    def _transcribe_file(self, path, keep_audio=False):
+        metrics = None
+        if paths and self.measured_job is None:
+            metrics = instrumentation.begin_job("arquivo")
+        # Enfileirados de uma vez: arquivos curtos do mesmo modelo rodam em lote
+        with self.scheduler.holding():
+            for i, path in enumerate(paths):
+                # Arquivos selecionados são sempre mantidos; o primeiro é o medido
+                job = self._transcribe_file(path, keep_audio=True, metrics=metrics if i == 0 else None)
+                if i == 0 and job is not None and metrics is not None:
+                    self.measured_job = job
+
+    def _transcribe_file(self, path, keep_audio=False, audio=None, priority=PRIORITY_FILE, metrics=None):
+        """
+        Coloca o áudio na fila de transcrição; retorna o trabalho (ou None sem
+        modelo). `metrics` é o trabalho da instrumentação que mede este áudio.
+        """
         # ALTERADO: Verifica se um modelo está carregado antes de transcrever
-        if self.current_model is None:
+        if self.loaded_model_name is None:
             QMessageBox.critical(self, "Erro", "Nenhum modelo de IA carregado. Selecione um modelo e aguarde o carregamento.")
             self.status_label.setText("Erro: Modelo não carregado.")
             self.status_label.setStyleSheet("color: red; font-weight: bold;")
+            return None
+
+        # A thread do trabalho obtém o modelo pelo nome no conjunto de modelos residentes
+        # O rascunho só compensa para modelos maiores que ele
+        draft = None
+        if self.speculative_checkbox.isChecked() and self.loaded_model_name != DEFAULT_DRAFT_MODEL:
+            draft = DEFAULT_DRAFT_MODEL
+        job = TranscriptionJob(self.loaded_model_name, path, audio, keep_audio,
+                               vad=self.vad_checkbox.isChecked(),
+                               parallel=self.parallel_checkbox.isChecked(),
+                               priority=priority, draft=draft, metrics=metrics)
+        return self.scheduler.submit(job)
+
+    def _on_job_updated(self, job):
+        """Atualiza a linha do trabalho na lista e a barra de progresso."""
+        item = self.job_items.get(job.id)
+        if item is None:
+            item = QListWidgetItem()
+            item.setData(Qt.ItemDataRole.UserRole, job)
+            self.jobs_list.addItem(item)
+            self.job_items[job.id] = item
+            for widget in self.jobs_widgets:
+                widget.setVisible(True)
+        item.setText(job.describe())
+        self._update_progress()
+
+    def _on_job_started(self, job):
+        self._on_job_updated(job)
+        # Gravações sempre vão para a tela; um arquivo só substitui o que está
+        # na tela se não for outro trabalho em andamento nem o resultado de
+        # uma gravação (os demais podem ser acompanhados clicando na lista)
+        shown = self.displayed_job
+        if (shown is None or job.priority == PRIORITY_RECORDING
+                or (not shown.is_active and shown.priority != PRIORITY_RECORDING)):
+            self._display_job(job)
+
+    def _display_job(self, job):
+        """Passa a mostrar o texto parcial do trabalho (e os segmentos seguintes)."""
+        self.displayed_job = job
+        self.text_edit.setPlainText(job.partial_text or "Transcrevendo... Aguarde...")
+
+    def _on_job_segment(self, job, start, end, text):
+        """Acrescenta cada segmento à área de texto assim que é decodificado."""
+        if job is not self.displayed_job or not text:
+            return
+        if len(job.segments) == 1 or self.text_edit.toPlainText() == "Transcrevendo... Aguarde...":
+            self.text_edit.setPlainText(text)
+        else:
+            cursor = self.text_edit.textCursor()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText(" " + text)
+        self.status_label.setText(f"Transcrevendo {job.label}: {int(end // 60)}min {int(end % 60)}s de áudio")
+
+    def _update_progress(self):
+        """A barra mostra o trabalho em andamento mais antigo; some quando não há nenhum."""
+        running = self.scheduler.running
+        self.progress_bar.setVisible(bool(running))
+        if running:
+            job = running[0]
+            self.progress_bar.setValue(int(job.progress * 100))
+            self.progress_bar.setFormat(f"{job.label}: %p%")
+            pending = len(self.scheduler.pending())
+            text = f"Transcrevendo {len(running)} trabalho(s)"
+            self.status_label.setText(text + (f", {pending} na fila..." if pending else "..."))
+            self.status_label.setStyleSheet("color: orange; font-weight: bold;")
+
+    def _on_job_finished(self, job):
+        self._on_job_updated(job)
+        if job.status == DONE:
+            self._on_transcription_success(job.text, job.file_path, job.keep_audio, job)
+        elif job.status == FAILED:
+            self._on_transcription_error(job.error, job)
+        else:
+            self.status_label.setText(f"Trabalho cancelado: {job.label}")
+            self.status_label.setStyleSheet("color: orange; font-weight: bold;")
+            if job is self.measured_job:
+                self.measured_job = None
+                instrumentation.end_job(job.metrics)
+        # Gravação cujo texto não foi para a tela (ou falhou): não há o que salvar
+        _remove_file(self.recording_spools.pop(job.id, None))
+        self._update_progress()
+
+    def _cancel_job(self):
+        """Cancela o trabalho selecionado na lista ou, sem seleção, o primeiro ativo."""
+        item = self.jobs_list.currentItem()
+        job = item.data(Qt.ItemDataRole.UserRole) if item else None
+        if job is None or not job.is_active:
+            active = self.scheduler.running + self.scheduler.pending()
+            job = active[0] if active else None
+        if job is not None:
+            self.scheduler.cancel(job)
+
+    def _show_job_text(self, item):
+        job = item.data(Qt.ItemDataRole.UserRole)
+        if job.status == RUNNING:
+            self._display_job(job)
+        elif job.status == DONE:
+            self.text_edit.setPlainText(job.text or "Nenhum texto foi detectado no áudio.")
+        elif job.status == FAILED:
+            self.text_edit.setPlainText(f"Erro na transcrição: {job.error}")
+
+    def _on_transcription_success(self, text, file_path, keep_audio, job=None):
+        """Chamado quando transcrição é bem-sucedida (trabalho da fila ou ao vivo)"""
+        # Tempo entre a thread emitir o resultado e a janela recebê-lo
+        finished_at = job.thread.finished_at if job is not None else None
+        if finished_at is not None:
+            with instrumentation.job_scope(job.metrics):
+                instrumentation.record("result_delivery", time.perf_counter() - finished_at)
+
+        if job is not None and job is not self.displayed_job:
+            # Outro trabalho está na tela: o texto deste fica na lista de trabalhos
+            self.status_label.setText(f"Transcrição concluída: {job.label}")
+            self.status_label.setStyleSheet("color: #27ae60; font-weight: bold;")
+            self._finish_job(job)
             return
 
-        self.status_label.setText("Transcrevendo...")
-        self.status_label.setStyleSheet("color: orange; font-weight: bold;")
-        self.text_edit.setPlainText("Transcrevendo... Aguarde...")
-        
-            # NOVO: Desabilita botões e mostra a barra de progresso
-        self.btn_record.setEnabled(False)
-        self.btn_file.setEnabled(False)
-        self.progress_bar.setVisible(True)
-        
-        # ALTERADO: Passa o modelo carregado para a thread de transcrição
-        self.transcription_thread = TranscriptionThread(self.current_model, path, keep_audio)
-        self.transcription_thread.transcription_finished.connect(self._on_transcription_success)
-        self.transcription_thread.transcription_error.connect(self._on_transcription_error)
-        self.transcription_thread.start()
-
-    def _on_transcription_success(self, text, file_path, keep_audio):
-        """Chamado quando transcrição é bem-sucedida"""
-        self.progress_bar.setVisible(False)
-        self.btn_record.setEnabled(True)
-        self.btn_file.setEnabled(True)
+        if job is None:
+            # Transcrição ao vivo: libera os botões travados enquanto finalizava
+            self.btn_record.setEnabled(True)
+            self.btn_file.setEnabled(True)
+        elif job.id in self.recording_spools:
+            self._set_unsaved_recording(self.recording_spools.pop(job.id))
     
         if text:
             self.text_edit.setPlainText(text)
-            self.status_label.setText("Transcrição concluída!")
+            self.status_label.setText("Transcrição concluída!" + self._vad_summary(job))
             self.status_label.setStyleSheet("color: #27ae60; font-weight: bold;")
             
-            # Se o áudio não deve ser mantido e é um arquivo temporário, mostra botão para salvar
-            if not keep_audio and file_path == self.current_audio_file:
+            # Se o áudio só existe em memória, mostra botão para salvar
+            if not keep_audio and self.unsaved_recording is not None:
                 self.btn_save_audio.setVisible(True)
-                self.status_label.setText("Transcrição concluída! (arquivo temporário)")
+                self.status_label.setText("Transcrição concluída! (áudio não salvo)")
                 self.status_label.setStyleSheet("color: #27ae60; font-weight: bold;")
             
         else:
@@ -338,53 +656,114 @@ class Speech2TextApp(QWidget):
             self.status_label.setText("Nenhum texto detectado")
             self.status_label.setStyleSheet("color: orange; font-weight: bold;")
             
-            # Remove arquivo temporário se não foi detectado texto
-            if not keep_audio and file_path == self.current_audio_file:
-                self._cleanup_temp_file()
-
-        # Se não deve manter o áudio e não é o arquivo atual (foi um arquivo temporário antigo)
-        if not keep_audio and file_path != self.current_audio_file:
-            self._cleanup_file(file_path)
-
-    def _on_transcription_error(self, error_msg):
-        """Chamado quando há erro na transcrição"""
-        self.progress_bar.setVisible(False)
-        self.btn_record.setEnabled(True)
-        self.btn_file.setEnabled(True)
+            # Descarta a gravação temporária se não foi detectado texto
+            if not keep_audio:
+                self._set_unsaved_recording(None)
+
+        self._finish_job(job)
+
+    def _finish_job(self, job=None):
+        """Encerra o trabalho medido e atualiza o detalhamento de latência, se visível"""
+        if job is not None:
+            if job is not self.measured_job:
+                return
+            self.measured_job = None
+            instrumentation.end_job(job.metrics)
+        else:
+            # Transcrição ao vivo: o trabalho aberto no "Parar"
+            instrumentation.end_job()
+        if self.latency_label.isVisible():
+            self.latency_label.setText(instrumentation.format_last_job())
+
+    def _toggle_latency(self):
+        """Mostra/oculta o detalhamento de latência do último trabalho"""
+        visible = not self.latency_label.isVisible()
+        if visible:
+            self.latency_label.setText(instrumentation.format_last_job())
+        self.latency_label.setVisible(visible)
+
+    def _vad_summary(self, job):
+        """Resumo do VAD (silêncio ignorado) ou do modo paralelo do trabalho"""
+        if job is None or job.thread is None:
+            return ""
+        parallel = job.thread.parallel_stats
+        if parallel:
+            return f" ({parallel['chunks']} blocos em paralelo, ganho estimado {parallel['estimated_speedup']}x)"
+        speculative = getattr(job.thread, "speculative_stats", None)
+        if speculative:
+            return (f" ({speculative['accept_rate']:.0%} do rascunho aceito, "
+                    f"{speculative['tokens_per_pass']} tokens por passada)")
+        stats = job.thread.vad_stats
+        if not stats or not stats["skipped_seconds"]:
+            return ""
+        return f" ({stats['skipped_ratio']:.0%} de silêncio ignorado)"
+
+    def _on_transcription_error(self, error_msg, job=None):
+        """Chamado quando há erro na transcrição (trabalho da fila ou ao vivo)"""
+        self._finish_job(job)
+        if job is None:
+            self.btn_record.setEnabled(True)
+            self.btn_file.setEnabled(True)
         
         self.status_label.setText("Erro na transcrição")
         self.status_label.setStyleSheet("color: red; font-weight: bold;")
         self.text_edit.setPlainText(f"Erro na transcrição: {error_msg}")
         QMessageBox.critical(self, "Erro na Transcrição", f"Falha na transcrição: {error_msg}")
 
+    def _set_unsaved_recording(self, path):
+        """Troca a gravação temporária oferecida por "Salvar Áudio", apagando a anterior."""
+        if self.unsaved_recording != path:
+            _remove_file(self.unsaved_recording)
+        self.unsaved_recording = path
+
     def _save_current_audio(self):
-        """Salva o arquivo de áudio atual"""
-        if not self.current_audio_file or not os.path.exists(self.current_audio_file):
+        """Salva em segundo plano o áudio da última gravação (na taxa do dispositivo)"""
+        if self.unsaved_recording is None:
             QMessageBox.warning(self, "Erro", "Nenhum arquivo de áudio para salvar.")
             return
         
         # Solicita onde salvar
+        audio_format = self.audio_format_combo.currentData()
+        spec = RECORDING_FORMATS[audio_format]
         save_path, _ = QFileDialog.getSaveFileName(
-            self, "Salvar Áudio", "gravacao.wav", "WAV Files (*.wav)"
+            self, "Salvar Áudio", "gravacao" + spec["extension"], spec["filter"]
         )
         
         if save_path:
-            try:
-                # Copia o arquivo temporário para o local escolhido
-                import shutil
-                shutil.copy2(self.current_audio_file, save_path)
-                
-                # Atualiza status
-                self.status_label.setText(f"Áudio salvo! Transcrição concluída!")
-                self.status_label.setStyleSheet("color: green; font-weight: bold;")
-                
-                # Oculta botão de salvar
-                self.btn_save_audio.setVisible(False)
-                
-                QMessageBox.information(self, "Áudio Salvo", f"Arquivo salvo em:\n{save_path}")
-                
-            except Exception as e:
-                QMessageBox.critical(self, "Erro ao Salvar", f"Falha ao salvar áudio: {e}")
+            self.btn_save_audio.setEnabled(False)
+            self.status_label.setText("Salvando áudio...")
+            self.status_label.setStyleSheet("color: orange; font-weight: bold;")
+
+            # O arquivo temporário passa a ser o salvo
+            self.audio_save_thread = AudioSaveThread(self.unsaved_recording, save_path, audio_format=audio_format)
+            self.unsaved_recording = None
+            self.audio_save_thread.save_finished.connect(self._on_audio_saved)
+            self.audio_save_thread.save_error.connect(self._on_audio_save_error)
+            self.audio_save_thread.start()
+
+    def _on_audio_saved(self, save_path):
+        """Chamado quando o áudio em memória termina de ser gravado em disco"""
+        self.current_audio_file = save_path
+
+        # Atualiza status
+        self.status_label.setText(f"Áudio salvo! Transcrição concluída!")
+        self.status_label.setStyleSheet("color: green; font-weight: bold;")
+
+        # Oculta botão de salvar
+        self.btn_save_audio.setEnabled(True)
+        self.btn_save_audio.setVisible(False)
+
+        QMessageBox.information(self, "Áudio Salvo", f"Arquivo salvo em:\n{save_path}")
+
+    def _on_audio_save_error(self, error_msg):
+        # A gravação temporária continua disponível para outra tentativa
+        source_path = self.audio_save_thread.source_path
+        if self.unsaved_recording is None and os.path.exists(source_path):
+            self.unsaved_recording = source_path
+        self.btn_save_audio.setEnabled(True)
+        self.status_label.setText("Erro ao salvar áudio")
+        self.status_label.setStyleSheet("color: red; font-weight: bold;")
+        QMessageBox.critical(self, "Erro ao Salvar", f"Falha ao salvar áudio: {error_msg}")
 
     def _copy_text(self):
         text = self.text_edit.toPlainText()
@@ -407,31 +786,12 @@ class Speech2TextApp(QWidget):
         self.btn_copy.setStyleSheet("")  # Remove estilo customizado
         self.btn_copy.setEnabled(True)  # Reabilita o botão
 
-    def _cleanup_temp_file(self):
-        """Remove o arquivo temporário atual"""
-        if self.current_audio_file and os.path.exists(self.current_audio_file):
-            try:
-                os.remove(self.current_audio_file)
-                print(f"Arquivo temporário removido: {self.current_audio_file}")
-            except Exception as e:
-                print(f"Erro ao remover arquivo temporário: {e}")
-            finally:
-                self.current_audio_file = None
-
-    def _cleanup_file(self, file_path):
-        """Remove um arquivo específico"""
-        if file_path and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                print(f"Arquivo removido: {file_path}")
-            except Exception as e:
-                print(f"Erro ao remover arquivo: {e}")
-
     def closeEvent(self, event):
-        # AQUI VOCÊ TAMBÉM DEVE INTERROMPER A THREAD DE CARREGAMENTO DE MODELO
-        if self.model_loader_thread and self.model_loader_thread.isRunning():
-            self.model_loader_thread.quit()
-            self.model_loader_thread.wait()
+        # A carga de modelo em andamento não deve mais avisar a janela (nem
+        # mostrar erro quando o processo de trabalho for encerrado abaixo)
+        loading = self.model_loader_thread is not None and self.model_loader_thread.isRunning()
+        if loading:
+            self.model_loader_thread.model_loaded.disconnect()
 
         if self.is_recording and self.recording_thread:
             self.recording_thread.stop_recording()
@@ -440,11 +800,29 @@ class Speech2TextApp(QWidget):
         if self.recording_thread and self.recording_thread.isRunning():
             self.recording_thread.quit()
             self.recording_thread.wait()
+
+        if self.warm_input is not None:
+            self.warm_input.close()
+            self.warm_input = None
         
-        if self.transcription_thread and self.transcription_thread.isRunning():
-            self.transcription_thread.quit()
-            self.transcription_thread.wait()
+        # Cancela a fila e espera os trabalhos em andamento pararem (nos
+        # processos de trabalho, o cancelamento encerra o processo na hora)
+        self.scheduler.shutdown()
+        inference_worker.shutdown_worker_pool()
+        if loading:
+            # Sem processos de trabalho, uma carga em andamento não pode ser interrompida
+            self.model_loader_thread.wait()
+
+        if self.streaming_thread and self.streaming_thread.isRunning():
+            self.streaming_thread.wait()
         
-        self._cleanup_temp_file()
+        if self.audio_save_thread and self.audio_save_thread.isRunning():
+            self.audio_save_thread.wait()
+
+        # Gravações temporárias não salvas
+        self._set_unsaved_recording(None)
+        for path in self.recording_spools.values():
+            _remove_file(path)
+        self.recording_spools.clear()
         
         event.accept()
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+Transcrição em lote, sem interface gráfica.
+
+Uso:
+    python -m app.batch pasta/ "notas/**/*.m4a" -o resultados.jsonl --workers 4
+
+Os arquivos são distribuídos entre processos de trabalho; cada processo carrega
+o modelo uma única vez. Com `--batch-size N`, cada processo recebe grupos de N
+arquivos e decodifica os curtos (até 30 s) juntos, numa passada do modelo.
+Cada resultado vira uma linha JSON em `--output`, e o manifesto
+(`<output>.manifest`) registra os arquivos concluídos para que uma execução
+interrompida continue de onde parou.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from .services import tuning, whisper_service
+from .services.result_cache import get_result_cache
+
+AUDIO_EXTENSIONS = (".wav", ".m4a", ".mp3", ".flac", ".ogg")
+
+# Modelo carregado em cada processo de trabalho (um por processo)
+_worker_model = None
+_worker_options = {}
+
+
+def collect_audio_files(inputs):
+    """Expande diretórios (recursivamente), globs e arquivos numa lista ordenada e sem repetição."""
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        found.append(os.path.join(root, name))
+        elif os.path.isfile(item):
+            found.append(item)
+        else:
+            found.extend(p for p in glob.glob(item, recursive=True)
+                         if os.path.isfile(p) and p.lower().endswith(AUDIO_EXTENSIONS))
+
+    unique = {os.path.abspath(p) for p in found}
+    return sorted(unique)
+
+
+def _file_signature(path):
+    """Identifica a versão do arquivo: se mudar, o arquivo é transcrito de novo."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def load_manifest(manifest_path):
+    """Lê o manifesto e retorna {caminho: assinatura} dos arquivos já concluídos."""
+    done = {}
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha truncada por uma interrupção
+                continue
+            if entry.get("status") == "done":
+                done[entry["path"]] = {"size": entry["size"], "mtime": entry["mtime"]}
+    return done
+
+
+def _append_line(f, record):
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _init_worker(model_name, device, threads, options, use_cache):
+    """Inicializador dos processos: limita as threads do torch e carrega o modelo uma vez."""
+    global _worker_model, _worker_options
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    _worker_model = whisper_service.load_model(model_name, device)
+    # Decodificação do perfil desta máquina (python -m app.tune); as threads
+    # continuam divididas entre os processos
+    _worker_options = dict(tuning.decode_options(model_name, _worker_model.device.type), **options)
+    if use_cache:
+        _worker_options["cache"] = get_result_cache()
+
+
+def _record(path, result, elapsed):
+    segments = [
+        {"start": round(s["start"], 2), "end": round(s["end"], 2), "text": s["text"].strip()}
+        for s in result.get("segments", [])
+    ]
+    return {
+        "path": path,
+        "text": result.get("text", "").strip(),
+        "language": result.get("language"),
+        "segments": segments,
+        "vad": result.get("vad"),
+        "elapsed": round(elapsed, 2),
+    }
+
+
+def _transcribe_one(path):
+    """Executado nos processos de trabalho."""
+    start = time.perf_counter()
+    try:
+        result = whisper_service.transcribe(_worker_model, path, **_worker_options)
+        return _record(path, result, time.perf_counter() - start)
+    except Exception as e:
+        return {"path": path, "error": str(e), "elapsed": round(time.perf_counter() - start, 2)}
+
+
+def _transcribe_group(paths):
+    """
+    Executado nos processos de trabalho: um grupo de arquivos decodificado em
+    lote. Se o lote falhar (ex.: um arquivo ilegível), cada arquivo é refeito
+    sozinho para isolar o erro. O tempo de cada arquivo é a média do lote.
+    """
+    if len(paths) == 1:
+        return [_transcribe_one(paths[0])]
+    start = time.perf_counter()
+    try:
+        results = whisper_service.transcribe_batch(_worker_model, paths, batch_size=len(paths),
+                                                   **_worker_options)
+    except Exception:
+        return [_transcribe_one(path) for path in paths]
+    elapsed = (time.perf_counter() - start) / len(paths)
+    return [_record(path, result, elapsed) for path, result in zip(paths, results)]
+
+
+def run_batch(inputs, output_path, model_name="small", workers=1, device=None,
+              threads_per_worker=None, language=whisper_service.DEFAULT_LANGUAGE, use_cache=True,
+              vad=False, batch_size=1):
+    """Transcreve os arquivos de `inputs` e grava os resultados em `output_path` (JSONL)."""
+    manifest_path = output_path + ".manifest"
+    files = collect_audio_files(inputs)
+    done = load_manifest(manifest_path)
+
+    pending = [p for p in files if done.get(p) != _file_signature(p)]
+    print(f"{len(files)} arquivo(s) encontrado(s), {len(files) - len(pending)} já concluído(s), "
+          f"{len(pending)} a transcrever")
+    if not pending:
+        return 0
+
+    if device is None:
+        device = whisper_service.get_device()
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    ctx = multiprocessing.get_context("spawn")
+    errors = 0
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out_f, \
+            open(manifest_path, "a", encoding="utf-8") as manifest_f, \
+            ctx.Pool(workers, initializer=_init_worker,
+                     initargs=(model_name, device, threads_per_worker,
+                               {"language": language, "vad": vad}, use_cache)) as pool:
+        try:
+            groups = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            records = (r for group in pool.imap_unordered(_transcribe_group, groups) for r in group)
+            for i, record in enumerate(records, 1):
+                # O resultado é gravado antes do manifesto: nada se perde numa interrupção
+                _append_line(out_f, record)
+                status = "error" if "error" in record else "done"
+                if status == "error":
+                    errors += 1
+                    print(f"[{i}/{len(pending)}] ERRO {record['path']}: {record['error']}")
+                else:
+                    print(f"[{i}/{len(pending)}] {record['path']} ({record['elapsed']}s)")
+                _append_line(manifest_f, {"path": record["path"], "status": status,
+                                          **_file_signature(record["path"])})
+        except KeyboardInterrupt:
+            print("Interrompido; execute novamente para continuar de onde parou.")
+            pool.terminate()
+            raise
+
+    elapsed = time.perf_counter() - start
+    print(f"Concluído: {len(pending) - errors} ok, {errors} erro(s) em {elapsed:.1f}s")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcrição em lote de arquivos de áudio.")
+    parser.add_argument("inputs", nargs="+", help="Arquivos, diretórios ou globs (use aspas)")
+    parser.add_argument("-o", "--output", default="transcricoes.jsonl", help="Arquivo JSONL de saída")
+    parser.add_argument("-m", "--model", default="small", help="Modelo do Whisper (tiny, base, small, ...)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Número de processos de trabalho")
+    parser.add_argument("--threads", type=int, default=None, help="Threads do torch por processo")
+    parser.add_argument("--device", default=None, help="cpu ou cuda (padrão: automático)")
+    parser.add_argument("--language", default=whisper_service.DEFAULT_LANGUAGE, help="Idioma do áudio")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de resultados")
+    parser.add_argument("--vad", action="store_true", help="Remove os silêncios antes de transcrever")
+    parser.add_argument("-b", "--batch-size", type=int, default=1,
+                        help="Arquivos curtos decodificados juntos por processo (ex.: 8)")
+    args = parser.parse_args(argv)
+
+    try:
+        errors = run_batch(args.inputs, args.output, args.model, args.workers, args.device,
+                           args.threads, args.language, not args.no_cache, args.vad,
+                           max(1, args.batch_size))
+    except KeyboardInterrupt:
+        return 130
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
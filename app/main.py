@@ -1,20 +1,44 @@
+import os
 import sys
 from PySide6.QtWidgets import QApplication
-from .app_window import Speech2TextApp 
+from PySide6.QtCore import QTimer
+from .app_window import Speech2TextApp
 from .ui.styles import MAIN_APP_STYLESHEET
 
+# Variável de ambiente usada pelo benchmark de inicialização
+# (benchmarks/startup_benchmark.py): abre a janela, reporta e fecha.
+STARTUP_BENCHMARK_ENV = "S2T_STARTUP_BENCHMARK"
+
+# Módulos que não devem ser importados antes da janela aparecer
+HEAVY_MODULES = ("whisper", "torch")
+
 def start_application():
     """
     Inicializa e executa a aplicação PySide6.
     """
+    benchmark_mode = bool(os.environ.get(STARTUP_BENCHMARK_ENV))
+
     app = QApplication(sys.argv)
-    
+
     # Aplicar o stylesheet principal
     app.setStyleSheet(MAIN_APP_STYLESHEET)
-    
-    window = Speech2TextApp()
+
+    # No modo benchmark o modelo não é carregado: só medimos a abertura da janela
+    window = Speech2TextApp(autoload_model=not benchmark_mode)
     window.show()
-    
+
+    if benchmark_mode:
+        heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+        def _report_startup():
+            # Executado na primeira volta do loop de eventos, com a janela já exibida
+            print("STARTUP_WINDOW_SHOWN")
+            print(f"STARTUP_HEAVY_MODULES={','.join(heavy)}")
+            sys.stdout.flush()
+            app.quit()
+
+        QTimer.singleShot(0, _report_startup)
+
     # Inicia o loop de eventos e retorna o código de status ao sair
     return app.exec()
 
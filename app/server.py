@@ -0,0 +1,538 @@
+"""
+Servidor local de transcrição (HTTP e WebSocket), sem interface gráfica.
+
+Uso:
+    python -m app.server --model small --port 8765
+
+O modelo fica carregado enquanto o servidor roda e é compartilhado por todas
+as ferramentas locais, em vez de cada uma carregar sua própria cópia.
+
+HTTP:
+    POST /transcribe                            corpo = arquivo (wav, flac, mp3...)
+    POST /transcribe?format=s16le&rate=16000    corpo = PCM 16 bits mono
+        parâmetros opcionais: language=pt, vad=1
+    GET  /stats                                 latência, vazão e fila
+    GET  /health
+
+WebSocket (/ws?rate=16000&language=pt):
+    mensagens binárias = PCM 16 bits mono; a mensagem de texto "end"
+    transcreve o que chegou desde o último "end" e responde com o resultado
+    em JSON. A conexão pode ser reaproveitada para várias falas. O áudio
+    acumulado até o "end" tem o mesmo limite de um corpo HTTP; acima dele,
+    a conexão recebe um erro e é fechada (código 1009).
+
+As requisições entram numa fila limitada e são agrupadas em pequenos lotes
+(até --max-batch, esperando no máximo --batch-window ms pelo lote encher).
+Com a fila cheia, novas requisições recebem 503 com Retry-After (ou uma
+mensagem de erro no WebSocket): o cliente deve tentar de novo mais tarde.
+"""
+
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .services import instrumentation, tuning, whisper_service
+from .services.audio_utils import WHISPER_SAMPLE_RATE, read_audio_file, resample_to_16k, to_mono_float32
+from .services.model_pool import get_model_pool
+from .services.result_cache import get_result_cache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_MAX_BATCH = 8
+DEFAULT_BATCH_WINDOW_MS = 20
+MAX_BODY_BYTES = 200 * 2**20
+RETRY_AFTER_SECONDS = 2
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_CLOSE_TOO_BIG = 1009         # Código de fechamento "mensagem grande demais"
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServerBusy(Exception):
+    """A fila de requisições está cheia."""
+
+
+class ServerStats:
+    """Latência (fila e decodificação), vazão e tamanho dos lotes das requisições."""
+
+    def __init__(self, window=1000):
+        self.started = time.time()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.audio_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.latencies = collections.deque(maxlen=window)  # (total, fila) em segundos
+
+    def record(self, queue_seconds, total_seconds, audio_seconds):
+        self.completed += 1
+        self.audio_seconds += audio_seconds
+        self.latencies.append((total_seconds, queue_seconds))
+
+    def record_batch(self, size, seconds):
+        self.batches += 1
+        self.batched_requests += size
+        self.decode_seconds += seconds
+
+    def snapshot(self, queue_size):
+        uptime = time.time() - self.started
+        totals = sorted(t for t, _ in self.latencies)
+        queued = sorted(q for _, q in self.latencies)
+
+        def percentile(values, p):
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1) if values else None
+
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_size": queue_size,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else None,
+            "latency_ms": {"p50": percentile(totals, 0.5), "p95": percentile(totals, 0.95)},
+            "queue_ms": {"p50": percentile(queued, 0.5), "p95": percentile(queued, 0.95)},
+            "requests_per_second": round(self.completed / uptime, 3) if uptime else None,
+            "audio_seconds": round(self.audio_seconds, 1),
+            # Segundos de áudio transcritos por segundo de decodificação
+            "realtime_factor": round(self.audio_seconds / self.decode_seconds, 2) if self.decode_seconds else None,
+        }
+
+
+class _Request:
+    """Um áudio na fila, com as opções e o futuro que recebe o resultado."""
+
+    def __init__(self, audio, language, vad, future):
+        self.audio = audio
+        self.language = language
+        self.vad = vad
+        self.future = future
+        self.enqueued = time.perf_counter()
+        self.started = None
+
+
+class TranscriptionServer:
+    def __init__(self, model_name, device=None, language=whisper_service.DEFAULT_LANGUAGE,
+                 max_queue=DEFAULT_MAX_QUEUE, max_batch=DEFAULT_MAX_BATCH,
+                 batch_window_ms=DEFAULT_BATCH_WINDOW_MS, use_cache=True):
+        self.model_name = model_name
+        self.device = device
+        self.language = language
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self.use_cache = use_cache
+        self.stats = ServerStats()
+        self.model = None
+        self.decode_options = {}
+        self._queue = asyncio.Queue(max_queue)
+        # Uma única thread de inferência: as decodificações do modelo são serializadas
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="inferencia")
+        self._io_executor = ThreadPoolExecutor(2, thread_name_prefix="decodificacao")
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        loop = asyncio.get_running_loop()
+        self.model = await loop.run_in_executor(self._executor, get_model_pool().get,
+                                                self.model_name, self.device)
+        # Perfil de desempenho desta máquina (python -m app.tune), se houver
+        tuning.apply_threads(self.model_name, self.model.device.type)
+        self.decode_options = tuning.decode_options(self.model_name, self.model.device.type)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        instrumentation.log(f"Servidor de transcrição em http://{host}:{port} (modelo '{self.model_name}')")
+        return self._server
+
+    async def transcribe(self, audio, language=None, vad=False):
+        """
+        Enfileira um áudio (16 kHz mono float32) e espera o resultado.
+        Retorna (resultado, segundos na fila); levanta ServerBusy com a fila cheia.
+        """
+        future = asyncio.get_running_loop().create_future()
+        request = _Request(audio, language or self.language, vad, future)
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            raise ServerBusy()
+        result = await future
+        return result, request.started - request.enqueued
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0 and self._queue.empty():
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), max(0.0, timeout)))
+                except asyncio.TimeoutError:
+                    break
+
+            start = time.perf_counter()
+            for request in batch:
+                request.started = start
+            outcomes = await loop.run_in_executor(self._executor, self._run_batch, batch)
+            self.stats.record_batch(len(batch), time.perf_counter() - start)
+            for request, (result, error) in zip(batch, outcomes):
+                if request.future.cancelled():
+                    continue
+                if error is not None:
+                    self.stats.failed += 1
+                    request.future.set_exception(error)
+                else:
+                    request.future.set_result(result)
+
+    def _run_batch(self, batch):
+        """
+        Executado na thread de inferência; retorna (resultado, erro) de cada
+        requisição. Requisições com as mesmas opções são decodificadas juntas
+        (clipes curtos numa só passada do modelo, ver transcribe_batch).
+        """
+        cache = get_result_cache() if self.use_cache else None
+        outcomes = [None] * len(batch)
+        groups = {}
+        for i, request in enumerate(batch):
+            groups.setdefault((request.language, request.vad), []).append(i)
+
+        for (language, vad), indices in groups.items():
+            try:
+                results = whisper_service.transcribe_batch(self.model, [batch[i].audio for i in indices],
+                                                           language, cache=cache, vad=vad,
+                                                           batch_size=self.max_batch,
+                                                           **self.decode_options)
+                for i, result in zip(indices, results):
+                    outcomes[i] = (result, None)
+            except Exception as e:
+                for i in indices:
+                    outcomes[i] = (None, e)
+        return outcomes
+
+    async def _transcribe_response(self, audio, language, vad):
+        """Transcreve e monta a resposta JSON (com os tempos de fila e total)."""
+        start = time.perf_counter()
+        result, queue_seconds = await self.transcribe(audio, language, vad)
+        total = time.perf_counter() - start
+        audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+        self.stats.record(queue_seconds, total, audio_seconds)
+        return {
+            "text": result.get("text", "").strip(),
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"].strip()}
+                         for s in result.get("segments", [])],
+            "language": result.get("language"),
+            "audio_seconds": round(audio_seconds, 3),
+            "latency_ms": round(total * 1000, 1),
+        }
+
+    # --- HTTP -----------------------------------------------------------------
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_http_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+                if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._handle_websocket(reader, writer, headers, query)
+                    break
+
+                status, payload, extra = await self._route(method, url.path, query, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await _write_http_response(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except _BodyTooLarge:
+            await _write_http_response(writer, 413, {"error": "corpo grande demais"}, keep_alive=False)
+        except _BadRequest as e:
+            await _write_http_response(writer, 400, {"error": f"requisição inválida: {e}"}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query, headers, body):
+        if path == "/health":
+            return 200, {"status": "ok", "model": self.model_name}, {}
+        if path == "/stats":
+            return 200, self.stats.snapshot(self._queue.qsize()), {}
+        if path != "/transcribe":
+            return 404, {"error": "rota não encontrada"}, {}
+        if method != "POST":
+            return 405, {"error": "use POST"}, {}
+        if not body:
+            return 400, {"error": "corpo vazio"}, {}
+
+        loop = asyncio.get_running_loop()
+        try:
+            audio = await loop.run_in_executor(self._io_executor, decode_upload, body, query)
+        except Exception as e:
+            return 400, {"error": f"áudio inválido: {e}"}, {}
+        try:
+            response = await self._transcribe_response(audio, query.get("language"), query.get("vad") == "1")
+        except ServerBusy:
+            return 503, {"error": "fila cheia"}, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+        except Exception as e:
+            return 500, {"error": str(e)}, {}
+        return 200, response, {}
+
+    # --- WebSocket ------------------------------------------------------------
+
+    async def _handle_websocket(self, reader, writer, headers, query):
+        # Parâmetros inválidos são recusados antes da troca de protocolo
+        try:
+            rate = int(query.get("rate", WHISPER_SAMPLE_RATE))
+            if rate <= 0:
+                raise ValueError(rate)
+        except ValueError:
+            await _write_http_response(writer, 400, {"error": f"taxa inválida: {query['rate']}"},
+                                       keep_alive=False)
+            return
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+
+        language = query.get("language")
+        vad = query.get("vad") == "1"
+        chunks, size = [], 0
+        close_payload = b""
+        while True:
+            message = await _read_ws_message(reader, writer)
+            if message is None:
+                break
+            if isinstance(message, bytes):
+                size += len(message)
+                if size > MAX_BODY_BYTES:
+                    # Sem "end", o áudio acumularia sem limite na memória
+                    await _send_ws_text(writer, {"error": "áudio grande demais (envie 'end' antes)"})
+                    close_payload = WS_CLOSE_TOO_BIG.to_bytes(2, "big")
+                    break
+                chunks.append(message)
+                continue
+            if message.strip().lower() != "end":
+                await _send_ws_text(writer, {"error": "mensagem desconhecida (use 'end')"})
+                continue
+
+            pcm = b"".join(chunks)
+            chunks, size = [], 0
+            try:
+                audio = await asyncio.get_running_loop().run_in_executor(
+                    self._io_executor, decode_upload, pcm, {"format": "s16le", "rate": rate})
+                response = await self._transcribe_response(audio, language, vad)
+            except ServerBusy:
+                response = {"error": "fila cheia", "retry_after": RETRY_AFTER_SECONDS}
+            except Exception as e:
+                response = {"error": str(e)}
+            await _send_ws_text(writer, response)
+        await _send_ws_frame(writer, 0x8, close_payload)
+
+
+def decode_upload(body, query):
+    """Converte o corpo de uma requisição em um array 16 kHz mono float32."""
+    fmt = query.get("format")
+    rate = int(query.get("rate", WHISPER_SAMPLE_RATE))
+    if fmt in ("s16le", "f32le"):
+        dtype = "<i2" if fmt == "s16le" else "<f4"
+        itemsize = np.dtype(dtype).itemsize
+        audio = to_mono_float32(np.frombuffer(body[:len(body) // itemsize * itemsize], dtype=dtype))
+    else:
+        try:
+            # Decodificado em blocos direto para 16 kHz (ver read_audio_file)
+            return read_audio_file(io.BytesIO(body))
+        except Exception:
+            # Formatos que o libsndfile não lê (mp3, m4a...): decodifica com o ffmpeg
+            with tempfile.NamedTemporaryFile(delete=False) as f:
+                f.write(body)
+            try:
+                return whisper_service.load_audio(f.name)
+            finally:
+                os.remove(f.name)
+    return resample_to_16k(audio, rate) if rate != WHISPER_SAMPLE_RATE else audio
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class _BadRequest(Exception):
+    pass
+
+
+async def _read_http_request(reader):
+    """Lê uma requisição HTTP/1.1; retorna (método, alvo, cabeçalhos, corpo) ou None no fim da conexão."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise _BadRequest("cabeçalhos grandes demais")
+    lines = head.decode("latin-1").split("\r\n")
+    request_line = lines[0].split(" ")
+    if len(request_line) != 3 or not request_line[2].startswith("HTTP/"):
+        raise _BadRequest(f"linha de requisição malformada: {lines[0][:100]!r}")
+    method, target, _ = request_line
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        parts, size = [], 0
+        while True:
+            try:
+                chunk_size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            except ValueError:
+                chunk_size = -1
+            if chunk_size < 0:
+                raise _BadRequest("tamanho de bloco inválido")
+            if chunk_size == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            size += chunk_size
+            if size > MAX_BODY_BYTES:
+                raise _BodyTooLarge()
+            parts.append(await reader.readexactly(chunk_size))
+            await reader.readexactly(2)
+        body = b"".join(parts)
+    else:
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise _BadRequest("Content-Length inválido")
+        if length > MAX_BODY_BYTES:
+            raise _BodyTooLarge()
+        body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+async def _write_http_response(writer, status, payload, extra_headers=None, keep_alive=True):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **(extra_headers or {}),
+    }
+    head = f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+
+
+async def _read_ws_message(reader, writer):
+    """
+    Lê uma mensagem (juntando fragmentos) e responde pings. Retorna bytes
+    (binária), str (texto) ou None quando o cliente fecha a conexão.
+    """
+    parts, opcode, total = [], None, 0
+    while True:
+        try:
+            b1, b2 = await reader.readexactly(2)
+        except asyncio.IncompleteReadError:
+            return None
+        fin, frame_opcode = b1 & 0x80, b1 & 0x0F
+        length = b2 & 0x7F
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2), "big")
+        elif length == 127:
+            length = int.from_bytes(await reader.readexactly(8), "big")
+        # Também a soma dos fragmentos: cada um pode ser pequeno
+        total += length
+        if total > MAX_BODY_BYTES:
+            return None
+        mask = await reader.readexactly(4) if b2 & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            # Desmascara com numpy: mensagens de áudio podem ter vários MB
+            data = np.frombuffer(payload, dtype=np.uint8)
+            payload = (data ^ np.resize(np.frombuffer(mask, dtype=np.uint8), len(data))).tobytes()
+
+        if frame_opcode == 0x8:         # close
+            return None
+        if frame_opcode == 0x9:         # ping
+            await _send_ws_frame(writer, 0xA, payload)
+            continue
+        if frame_opcode == 0xA:         # pong
+            continue
+        if frame_opcode in (0x1, 0x2):
+            opcode = frame_opcode
+        parts.append(payload)
+        if fin:
+            data = b"".join(parts)
+            # Texto inválido vira uma mensagem desconhecida (respondida com erro), não uma exceção
+            return data.decode("utf-8", errors="replace") if opcode == 0x1 else data
+
+
+async def _send_ws_frame(writer, opcode, payload):
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 2**16:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+    writer.write(header + payload)
+    await writer.drain()
+
+
+async def _send_ws_text(writer, payload):
+    await _send_ws_frame(writer, 0x1, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+async def serve(args):
+    server = TranscriptionServer(args.model, args.device, args.language, args.max_queue,
+                                 args.max_batch, args.batch_window, not args.no_cache)
+    tcp_server = await server.start(args.host, args.port)
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local de transcrição (HTTP e WebSocket).")
+    parser.add_argument("-m", "--model", default="small", help="Modelo do Whisper mantido carregado")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Endereço (padrão: só a máquina local)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--device", default=None, help="cpu ou cuda (padrão: automático)")
+    parser.add_argument("--language", default=whisper_service.DEFAULT_LANGUAGE, help="Idioma padrão")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Requisições na fila antes de responder 503")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Requisições por lote")
+    parser.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="Espera máxima (ms) para juntar requisições num lote")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de resultados")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,111 +1,371 @@
+import os
+import shutil
+import tempfile
 import time
+
 import numpy as np
-import sounddevice as sd
 import soundfile as sf
 from PySide6.QtCore import QThread, Signal
 
+from . import instrumentation
+from .audio_utils import WHISPER_SAMPLE_RATE, StreamingResampler
+from .capture_engine import CaptureEngine
+
+# Formatos de gravação: PCM de 16 bits, em WAV ou comprimido sem perdas em FLAC
+RECORDING_FORMATS = {
+    "wav": {"format": "WAV", "extension": ".wav", "filter": "WAV Files (*.wav)"},
+    "flac": {"format": "FLAC", "extension": ".flac", "filter": "FLAC Files (*.flac)"},
+}
+DEFAULT_RECORDING_FORMAT = "wav"
+RECORDING_SUBTYPE = "PCM_16"
+
+# Captura quente (WarmInput): S2T_WARM_CAPTURE=1 liga o modo ao abrir a janela
+WARM_CAPTURE_ENV = "S2T_WARM_CAPTURE"
+PREROLL_ENV = "S2T_PREROLL_SECONDS"
+DEFAULT_PREROLL_SECONDS = 2.0
+RECORDING_RING_SECONDS = 10.0   # Folga do buffer circular durante a gravação
+
+
+def format_for_path(path):
+    """Formato de gravação pela extensão do arquivo (WAV se desconhecida)."""
+    ext = os.path.splitext(path)[1].lower()
+    return next((name for name, spec in RECORDING_FORMATS.items() if spec["extension"] == ext),
+                DEFAULT_RECORDING_FORMAT)
+
+
+def open_recording_file(path, samplerate, channels=1, audio_format=None):
+    """Abre o arquivo de saída em 16 bits, para ser escrito bloco a bloco."""
+    spec = RECORDING_FORMATS[audio_format or format_for_path(path)]
+    return sf.SoundFile(path, 'w', samplerate=samplerate, channels=channels,
+                        format=spec["format"], subtype=RECORDING_SUBTYPE)
+
+
+def to_pcm16_range(block):
+    """Limita amostras float a [-1, 1]: acima disso a conversão para 16 bits daria a volta."""
+    if block.dtype.kind == 'f':
+        return np.clip(block, -1.0, 1.0)
+    return block
+
+
+def open_capture_engine(device_idx, device_info, ring_seconds=RECORDING_RING_SECONDS):
+    """
+    Abre a captura com o perfil em cache do dispositivo (16 kHz mono quando
+    aceito). Se o perfil não servir mais, ele é descartado e a captura
+    volta à taxa padrão testando os formatos.
+    """
+    from .device_manager import get_device_profile, invalidate_device_profile
+
+    profile = get_device_profile(device_idx, device_info)
+    try:
+        return CaptureEngine(device_idx, profile["samplerate"], profile["channels"],
+                             ring_seconds).open(profile["dtype"])
+    except Exception as e:
+        if profile["dtype"] is None:
+            raise
+        instrumentation.log(f"Perfil do dispositivo recusado ({e}); testando os formatos")
+        invalidate_device_profile(device_idx, device_info)
+        return CaptureEngine(device_idx, int(device_info['default_samplerate']), ring_seconds=ring_seconds).open()
+
+
+class WarmInput:
+    """
+    Stream de entrada mantido aberto para um microfone (captura quente).
+
+    Abrir o stream (e testar formatos) a cada gravação atrasa o início e corta
+    a primeira sílaba. Aqui o stream fica aberto e, ocioso, o callback só
+    copia cada bloco para um buffer circular de tamanho fixo, sem acordar
+    nenhuma outra thread; a gravação começa na hora, já com os últimos
+    `preroll_seconds` de áudio. O custo ocioso fica em `stats`.
+    """
+
+    def __init__(self, device_idx, device_info, preroll_seconds=None):
+        if preroll_seconds is None:
+            preroll_seconds = float(os.environ.get(PREROLL_ENV, DEFAULT_PREROLL_SECONDS))
+        self.device_idx = device_idx
+        self.preroll_seconds = preroll_seconds
+        # Pré-gravação + a folga normal da gravação (ver CaptureEngine.begin)
+        self.engine = open_capture_engine(device_idx, device_info,
+                                          RECORDING_RING_SECONDS + 2 * preroll_seconds)
+        self.engine.idle = True
+        self.engine.start()
+        self.opened_at = time.perf_counter()
+        instrumentation.log(f"Captura quente aberta no device {device_idx}",
+                            samplerate=self.engine.samplerate, preroll_seconds=preroll_seconds,
+                            buffer_kb=round(self.engine._ring.nbytes / 1024))
+
+    def recording(self):
+        """Contexto de uma gravação, começando pela pré-gravação."""
+        return self.engine.recording(self.preroll_seconds)
+
+    def stats(self):
+        """Memória do buffer e fração de CPU gasta no callback desde a abertura."""
+        elapsed = time.perf_counter() - self.opened_at
+        return {
+            "buffer_bytes": self.engine._ring.nbytes if self.engine._ring is not None else 0,
+            "cpu_fraction": self.engine.callback_seconds / elapsed if elapsed > 0 else 0.0,
+            "seconds_open": elapsed,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        text = (f"Microfone aberto: pré-gravação de {self.preroll_seconds:g} s | "
+                f"buffer {stats['buffer_bytes'] / 2**20:.1f} MB")
+        # Logo após abrir, a fração de CPU ainda não diz nada
+        if stats["seconds_open"] >= 5:
+            text += f" | CPU do callback {stats['cpu_fraction']:.2%}"
+        return text
+
+    def close(self):
+        stats = self.stats()
+        self.engine.stop()
+        self.engine.close()
+        instrumentation.log("Captura quente fechada", device=self.device_idx,
+                            seconds_open=round(stats["seconds_open"], 1),
+                            cpu_fraction=round(stats["cpu_fraction"], 5))
+
+
+def new_spool_path():
+    """Arquivo temporário para a gravação na taxa do dispositivo (ver RecordingThread)."""
+    fd, path = tempfile.mkstemp(prefix="speechtotext-", suffix=".wav")
+    os.close(fd)
+    return path
+
+
+class SampleBuffer:
+    """
+    Amostras float32 acumuladas num arquivo temporário (PCM cru, no mesmo
+    diretório da gravação temporária), não na memória: uma reunião de 3 h
+    ocuparia quase 700 MB em 16 kHz. `take` entrega as amostras como um
+    `np.memmap` do arquivo, lido sob demanda pelo sistema; o arquivo já sai
+    apagado (ou é apagado quando o mapeamento fecha, no Windows).
+    """
+
+    def __init__(self):
+        self._file = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, samples):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="speechtotext-", suffix=".f32")
+        self._file.write(np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+        self._size += len(samples)
+
+    def take(self):
+        """Entrega as amostras (um memmap do arquivo) e esvazia o buffer."""
+        file, self._file = self._file, None
+        size, self._size = self._size, 0
+        if size == 0:
+            if file is not None:
+                file.close()
+            return np.empty(0, dtype=np.float32)
+        file.flush()
+        # "c": cópia na escrita, para que o torch aceite o array sem copiá-lo
+        data = np.memmap(file, dtype=np.float32, mode="c", shape=(size,))
+        # O mapeamento mantém o arquivo (já sem nome) vivo depois do close
+        file.close()
+        return data
+
+
 class RecordingThread(QThread):
-    """Thread para gravação de áudio."""
-    recording_finished = Signal(str, bool)
+    """
+    Thread para gravação de áudio.
+
+    Além de gravar o arquivo, a thread reamostra o áudio para 16 kHz mono
+    float32 durante a captura e entrega esse áudio direto ao transcritor, sem
+    o ffmpeg. Ele vai para um arquivo temporário e chega ao transcritor como
+    um memmap (ver SampleBuffer), então a memória não cresce com a duração;
+    o áudio na taxa do dispositivo vai para o arquivo escolhido ou, sem ele,
+    para um arquivo temporário (`spool_path`), usado pelo botão "Salvar Áudio".
+
+    O arquivo é codificado durante a captura (PCM de 16 bits em WAV ou FLAC,
+    ver RECORDING_FORMATS), então parar a gravação não depende do tamanho dela.
+
+    Com `warm_input` (WarmInput do mesmo dispositivo), a gravação usa o stream
+    já aberto e começa pela pré-gravação, em vez de abrir um stream novo.
+    """
+    recording_finished = Signal(object, str, bool)  # (áudio 16 kHz, arquivo ou "", manter áudio)
     recording_error = Signal(str)
     recording_update = Signal(int)
+    recording_overflow = Signal(int)  # Total de overflows de captura até o momento
     
-    def __init__(self, device_idx, output_path, devices, keep_audio=False):
+    def __init__(self, device_idx, output_path, devices, keep_audio=False, audio_queue=None,
+                 audio_format=None, warm_input=None):
         super().__init__()
         self.device_idx = device_idx
+        self.warm_input = warm_input
+        # Se None, a gravação vai para um arquivo temporário (spool_path)
         self.output_path = output_path
+        self.spool_path = None
+        # Se None, o formato vem da extensão do arquivo
+        self.audio_format = audio_format
         self.devices = devices
         self.should_stop = False
         self.keep_audio = keep_audio
+        # Fila opcional que recebe (bloco, taxa) em tempo real para a transcrição ao vivo
+        self.audio_queue = audio_queue
+        self.overflow_count = 0
+        self.dropped_frames = 0
+        self._resampler = None
+        self._audio_16k = SampleBuffer()
+        self.metrics = None     # Trabalho medido a partir do "Parar" (ver instrumentation)
         
     def stop_recording(self):
         """Para a gravação."""
         self.should_stop = True
         
     def run(self):
+        out_file = None
         try:
-            print(f"Iniciando gravação no device {self.device_idx}")
-            
-            # Obtém informações do dispositivo
-            device_info = self.devices[self.device_idx]
-            samplerate = int(device_info['default_samplerate'])
-            channels = 1
-            
-            print(f"Gravando: {samplerate}Hz, {channels} canal(is)")
-            
-            # Lista para armazenar chunks de áudio
-            audio_chunks = []
-            chunk_duration = 0.1  # 100ms por chunk
-            chunk_samples = int(chunk_duration * samplerate)
-            
-            # Tenta diferentes formatos de dados até encontrar um compatível
-            dtypes_to_try = ['float32', 'int16', 'int32', 'float64']
-            stream = None
+            instrumentation.log(f"Iniciando gravação no device {self.device_idx}")
             
-            for dtype in dtypes_to_try:
-                try:
-                    print(f"Tentando formato: {dtype}")
-                    stream = sd.InputStream(
-                        device=self.device_idx,
-                        channels=channels,
-                        samplerate=samplerate,
-                        dtype=dtype
-                    )
-                    print(f"Formato {dtype} aceito!")
-                    break
-                except Exception as e:
-                    print(f"Formato {dtype} falhou: {e}")
-                    if stream:
-                        stream.close()
-                    stream = None
-            
-            if stream is None:
-                raise Exception("Nenhum formato de áudio compatível encontrado para este dispositivo")
-            
-            with stream:
-                elapsed_seconds = 0
-                
+            if self.warm_input is not None:
+                engine = self.warm_input.engine
+                capture = self.warm_input.recording()
+            else:
+                engine = open_capture_engine(self.device_idx, self.devices[self.device_idx])
+                capture = engine
+            samplerate = engine.samplerate
+            channels = engine.channels
+
+            instrumentation.log(f"Gravando: {samplerate}Hz, {channels} canal(is)",
+                                samplerate=samplerate, channels=channels)
+
+            # O callback grava num buffer circular; aqui só esvaziamos o buffer,
+            # reamostramos para 16 kHz (se o dispositivo não capturar nessa
+            # taxa) e, se pedido, gravamos direto no arquivo.
+            self._resampler = StreamingResampler(samplerate, WHISPER_SAMPLE_RATE)
+            if self.output_path:
+                out_file = open_recording_file(self.output_path, samplerate, channels, self.audio_format)
+            else:
+                self.spool_path = new_spool_path()
+                out_file = open_recording_file(self.spool_path, samplerate, channels, "wav")
+            frames_written = 0
+            last_update = 0
+            # O stream quente acumula contadores de gravações anteriores
+            base_overflows = engine.overflow_count
+            base_dropped = engine.dropped_frames
+            last_overflows = 0
+
+            with capture:
                 while not self.should_stop:
-                    # Lê um chunk de áudio
-                    audio_chunk, overflowed = stream.read(chunk_samples)
-                    
-                    if overflowed:
-                        print("Buffer overflow detectado")
-                    
-                    # Converte para float64 para consistência no processamento
-                    if audio_chunk.dtype != np.float64:
-                        audio_chunk = audio_chunk.astype(np.float64)
-                    
-                    audio_chunks.append(audio_chunk.copy())
-                    
-                    # Atualiza tempo a cada segundo aproximadamente
-                    elapsed_seconds += chunk_duration
-                    if elapsed_seconds >= 1.0:
-                        self.recording_update.emit(int(len(audio_chunks) * chunk_duration))
-                        elapsed_seconds = 0
-                    
-                    # Pequena pausa para não sobrecarregar
-                    time.sleep(0.01)
-            
-            print("Gravação interrompida, processando áudio...")
-            
-            # Concatena todos os chunks
-            if audio_chunks:
-                recording = np.concatenate(audio_chunks, axis=0)
-                
-                # Normaliza o áudio se necessário
-                if recording.dtype != np.float64:
-                    recording = recording.astype(np.float64)
-                
-                # Salva o arquivo
-                sf.write(self.output_path, recording, samplerate)
-                print(f"Arquivo salvo: {self.output_path}")
-                
+                    engine.wait_for_data(0.2)
+                    frames_written += self._handle_block(engine.read_available(), out_file)
+
+                    # Overflows são contados pelo engine e repassados à interface
+                    overflows = engine.overflow_count - base_overflows
+                    if overflows != last_overflows:
+                        instrumentation.count("capture_overflows", overflows - last_overflows)
+                        last_overflows = overflows
+                        self.recording_overflow.emit(last_overflows)
+
+                    # Atualiza tempo a cada segundo
+                    seconds = frames_written // samplerate
+                    if seconds != last_update:
+                        last_update = seconds
+                        self.recording_update.emit(seconds)
+
+                # O stream quente continua aberto: o que chegou até aqui é o fim da gravação
+                frames_written += self._handle_block(engine.read_available(), out_file)
+
+            # Stream parado: processa o que ainda restou no buffer, já dentro do
+            # trabalho medido (que começa no "Parar")
+            instrumentation.bind_job(self.metrics)
+            frames_written += self._handle_block(engine.read_available(), out_file)
+            self._append_16k(self._resampler.flush())
+            if out_file is not None:
+                out_file.close()
+                out_file = None
+
+            self.overflow_count = engine.overflow_count - base_overflows
+            self.dropped_frames = engine.dropped_frames - base_dropped
+            instrumentation.count("capture_overflows", self.overflow_count - last_overflows)
+            instrumentation.count("capture_dropped_frames", self.dropped_frames)
+            instrumentation.log(f"Gravação interrompida: {frames_written / samplerate:.1f}s",
+                                seconds=round(frames_written / samplerate, 2),
+                                overflows=self.overflow_count, dropped_frames=self.dropped_frames)
+
+            if frames_written > 0:
+                audio = self._audio_16k.take()
+                if self.output_path:
+                    instrumentation.log(f"Arquivo salvo: {self.output_path}")
                 # Emite sinal de sucesso
-                self.recording_finished.emit(self.output_path, self.keep_audio)
+                self.recording_finished.emit(audio, self.output_path or "", self.keep_audio)
             else:
+                if self.output_path and os.path.exists(self.output_path):
+                    os.remove(self.output_path)
+                self._remove_spool()
                 self.recording_error.emit("Nenhum áudio foi gravado")
             
         except Exception as e:
-            print(f"Erro na gravação: {e}")
-            self.recording_error.emit(str(e))
\ No newline at end of file
+            instrumentation.log(f"Erro na gravação: {e}")
+            if out_file is not None:
+                out_file.close()
+                out_file = None
+            self._remove_spool()
+            self.recording_error.emit(str(e))
+        finally:
+            if out_file is not None:
+                out_file.close()
+            # Sinaliza o fim do áudio para a transcrição ao vivo
+            if self.audio_queue is not None:
+                self.audio_queue.put(None)
+
+    def _remove_spool(self):
+        if self.spool_path and os.path.exists(self.spool_path):
+            os.remove(self.spool_path)
+        self.spool_path = None
+
+    def _handle_block(self, block, out_file):
+        """Grava um bloco no arquivo (se houver) e guarda sua versão em 16 kHz."""
+        if len(block) == 0:
+            return 0
+        if out_file is not None:
+            out_file.write(to_pcm16_range(block))
+        self._append_16k(self._resampler.process(block))
+        return len(block)
+
+    def _append_16k(self, samples):
+        if len(samples) == 0:
+            return
+        self._audio_16k.append(samples)
+        if self.audio_queue is not None:
+            self.audio_queue.put((samples, WHISPER_SAMPLE_RATE))
+
+
+class AudioSaveThread(QThread):
+    """
+    Salva em segundo plano a gravação temporária (`spool_path` da
+    RecordingThread), na taxa do dispositivo (botão "Salvar Áudio"). Em WAV o
+    arquivo só é movido; em FLAC, é convertido bloco a bloco.
+    """
+    save_finished = Signal(str)
+    save_error = Signal(str)
+
+    BLOCK_FRAMES = 65536
+
+    def __init__(self, source_path, output_path, audio_format=None):
+        super().__init__()
+        self.source_path = source_path
+        self.output_path = output_path
+        self.audio_format = audio_format or format_for_path(output_path)
+
+    def run(self):
+        try:
+            with instrumentation.span("audio_save"):
+                if RECORDING_FORMATS[self.audio_format]["format"] == "WAV":
+                    shutil.move(self.source_path, self.output_path)
+                else:
+                    with sf.SoundFile(self.source_path) as source, \
+                            open_recording_file(self.output_path, source.samplerate, source.channels,
+                                                self.audio_format) as out_file:
+                        for block in source.blocks(self.BLOCK_FRAMES):
+                            out_file.write(block)
+                    os.remove(self.source_path)
+            instrumentation.log(f"Arquivo salvo: {self.output_path}")
+            self.save_finished.emit(self.output_path)
+        except Exception as e:
+            instrumentation.log(f"Erro ao salvar áudio: {e}")
+            self.save_error.emit(str(e))
\ No newline at end of file
@@ -0,0 +1,157 @@
+import numpy as np
+
+# Taxa de amostragem esperada pelo Whisper
+WHISPER_SAMPLE_RATE = 16000
+
+
+def to_mono_float32(chunk):
+    """Converte um bloco de áudio (qualquer dtype, 1 ou N canais) para mono float32 em [-1, 1]."""
+    chunk = np.asarray(chunk)
+    if chunk.dtype == np.int16:
+        chunk = chunk.astype(np.float32) / 32768.0
+    elif chunk.dtype == np.int32:
+        chunk = chunk.astype(np.float32) / 2147483648.0
+    elif chunk.dtype != np.float32:
+        chunk = chunk.astype(np.float32)
+
+    if chunk.ndim == 2:
+        if chunk.shape[1] == 1:
+            return chunk[:, 0]
+        # Soma coluna a coluna: bem mais rápido que mean(axis=1) em arrays (N, 2)
+        mono = chunk[:, 0].copy()
+        for c in range(1, chunk.shape[1]):
+            mono += chunk[:, c]
+        mono *= np.float32(1.0 / chunk.shape[1])
+        return mono
+    return chunk
+
+
+def _lowpass_kernel(step, taps):
+    """Filtro passa-baixa (sinc janelado) para evitar aliasing ao reduzir a taxa."""
+    cutoff = 0.5 / step * 0.95
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+class StreamingResampler:
+    """
+    Reamostrador incremental: recebe blocos de áudio em qualquer taxa e devolve
+    blocos mono float32 na taxa de saída, mantendo o estado entre blocos (sem
+    emendas audíveis entre um bloco e outro).
+    """
+
+    def __init__(self, in_rate, out_rate=WHISPER_SAMPLE_RATE, taps=63):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.step = self.in_rate / self.out_rate
+        self._kernel = _lowpass_kernel(self.step, taps) if self.in_rate > self.out_rate else None
+        self._fir_state = np.zeros(taps - 1 if self._kernel is not None else 0, dtype=np.float32)
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._pos = 0.0
+        # Redução por fator inteiro (ex.: 48 kHz -> 16 kHz): o filtro só é
+        # calculado nas amostras que vão para a saída
+        self._decimate = int(self.step) if self._kernel is not None and self.step.is_integer() else 0
+        self._phase = 0
+
+    def process(self, chunk):
+        """Reamostra um bloco e retorna as amostras de saída já disponíveis."""
+        x = to_mono_float32(chunk)
+        if self.in_rate == self.out_rate:
+            return x
+        if self._decimate:
+            return self._process_decimate(x)
+
+        if self._kernel is not None:
+            buf = np.concatenate([self._fir_state, x])
+            x = np.convolve(buf, self._kernel, mode="valid").astype(np.float32)
+            self._fir_state = buf[len(buf) - len(self._fir_state):]
+
+        y = np.concatenate([self._tail, x]) if len(self._tail) else x
+        if len(y) == 0 or self._pos > len(y) - 1:
+            self._tail = y
+            return np.zeros(0, dtype=np.float32)
+
+        n_out = int((len(y) - 1 - self._pos) // self.step) + 1
+        positions = self._pos + np.arange(n_out) * self.step
+        out = np.interp(positions, np.arange(len(y)), y).astype(np.float32)
+
+        # Mantém a última amostra para interpolar com o próximo bloco
+        next_pos = self._pos + n_out * self.step
+        drop = min(int(next_pos), len(y) - 1)
+        self._tail = y[drop:]
+        self._pos = next_pos - drop
+        return out
+
+    def _process_decimate(self, x):
+        """Filtra e pega uma a cada `step` amostras, sem calcular as descartadas."""
+        buf = np.concatenate([self._fir_state, x])
+        self._fir_state = buf[len(buf) - len(self._fir_state):]
+        n_filtered = len(x)
+        if self._phase >= n_filtered:
+            self._phase -= n_filtered
+            return np.zeros(0, dtype=np.float32)
+
+        windows = np.lib.stride_tricks.sliding_window_view(buf, len(self._kernel))
+        picked = windows[self._phase:n_filtered:self._decimate]
+        # O núcleo é simétrico: correlação e convolução coincidem
+        out = (picked @ self._kernel).astype(np.float32)
+        self._phase += len(out) * self._decimate - n_filtered
+        return out
+
+    def flush(self):
+        """Esvazia o atraso do filtro ao final do fluxo."""
+        if self._kernel is None:
+            return np.zeros(0, dtype=np.float32)
+        return self.process(np.zeros(len(self._kernel) // 2, dtype=np.float32))
+
+
+def resample_to_16k(audio, samplerate):
+    """Converte um array completo para mono float32 a 16 kHz (formato de entrada do Whisper)."""
+    resampler = StreamingResampler(samplerate, WHISPER_SAMPLE_RATE)
+    out = resampler.process(audio)
+    tail = resampler.flush()
+    return np.concatenate([out, tail]) if len(tail) else out
+
+
+def frame_rms(audio, frame_size):
+    """Energia RMS por quadro (vetorizado); quadros incompletos no final são ignorados."""
+    n_frames = len(audio) // frame_size
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_size].reshape(n_frames, frame_size)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+
+
+# Quadros lidos por vez ao decodificar um arquivo (~1,4 s a 48 kHz)
+DECODE_BLOCK_FRAMES = 65536
+
+
+def read_audio_file(file, block_frames=DECODE_BLOCK_FRAMES):
+    """
+    Decodifica um arquivo (caminho ou objeto de arquivo) com o libsndfile,
+    em blocos, para mono float32 a 16 kHz. A saída é pré-alocada pela duração
+    declarada no arquivo, então só ela e um bloco ficam na memória (sem cópia
+    do áudio original inteiro). Levanta `soundfile.SoundFileError` para
+    formatos que o libsndfile não lê.
+    """
+    import soundfile as sf
+
+    with sf.SoundFile(file) as f:
+        resampler = StreamingResampler(f.samplerate, WHISPER_SAMPLE_RATE)
+        # Folga para o arredondamento da reamostragem e o atraso do filtro
+        capacity = int(max(f.frames, 0) * WHISPER_SAMPLE_RATE / f.samplerate) + 256
+        out = np.empty(capacity, dtype=np.float32)
+        size = 0
+
+        def append(samples):
+            nonlocal out, size
+            if size + len(samples) > len(out):
+                out = np.resize(out, max(2 * len(out), size + len(samples)))
+            out[size:size + len(samples)] = samples
+            size += len(samples)
+
+        for block in f.blocks(blocksize=block_frames, dtype="float32", always_2d=True):
+            append(resampler.process(block))
+        append(resampler.flush())
+    return out[:size]
@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from . import instrumentation
+
+
+class CaptureEngine:
+    """
+    Captura de áudio orientada a callback.
+
+    O callback do sounddevice (thread de áudio do PortAudio) apenas copia cada
+    bloco para um buffer circular pré-alocado no dtype nativo do dispositivo.
+    A thread de gravação esvazia esse buffer periodicamente com `read_available`
+    e grava os blocos no destino (arquivo, fila ao vivo...), então a memória
+    usada não cresce com a duração da gravação.
+
+    Fora de uma gravação (`idle`, ver WarmInput), o stream continua aberto e o
+    callback sobrescreve os quadros mais antigos: o buffer guarda sempre os
+    últimos segundos, e `begin` começa a gravação a partir deles.
+    """
+
+    DTYPES_TO_TRY = ('float32', 'int16', 'int32', 'float64')
+
+    def __init__(self, device_idx, samplerate, channels=1, ring_seconds=10.0):
+        self.device_idx = device_idx
+        self.samplerate = int(samplerate)
+        self.channels = channels
+        self.ring_frames = int(ring_seconds * self.samplerate)
+        self.dtype = None
+        self.stream = None
+        self._ring = None
+
+        # Contadores monotônicos de quadros escritos (callback) e lidos (thread de gravação)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._data_ready = threading.Event()
+
+        # Estatísticas expostas para a interface
+        self.overflow_count = 0     # Overflows reportados pelo PortAudio
+        self.dropped_frames = 0     # Quadros descartados por buffer circular cheio
+        self.frames_captured = 0
+        self.callback_seconds = 0.0 # Tempo gasto no callback (custo da captura)
+        self.idle = False
+
+    def allocate(self, dtype):
+        """Pré-aloca o buffer circular (feito por `open`; útil para simular entrada)."""
+        self._ring = np.zeros((self.ring_frames, self.channels), dtype=dtype)
+        self._write_pos = 0
+        self._read_pos = 0
+
+    def open(self, dtype=None):
+        """
+        Abre o stream com `dtype` (ex.: do perfil do dispositivo) ou, sem ele,
+        com o primeiro dtype aceito pelo dispositivo.
+        """
+        import sounddevice as sd
+
+        with instrumentation.span("stream_open"):
+            for dtype in ([dtype] if dtype else self.DTYPES_TO_TRY):
+                try:
+                    self.allocate(dtype)
+                    self.stream = sd.InputStream(
+                        device=self.device_idx,
+                        channels=self.channels,
+                        samplerate=self.samplerate,
+                        dtype=dtype,
+                        callback=self._callback,
+                    )
+                    self.dtype = dtype
+                    instrumentation.log(f"Formato {dtype} aceito!", device=self.device_idx)
+                    return self
+                except Exception as e:
+                    instrumentation.log(f"Formato {dtype} falhou: {e}", device=self.device_idx)
+                    self.stream = None
+
+        self._ring = None
+        raise Exception("Nenhum formato de áudio compatível encontrado para este dispositivo")
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None and self.stream.active:
+            self.stream.stop()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def __enter__(self):
+        if self.stream is None:
+            self.open()
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        self.close()
+
+    def begin(self, preroll_seconds=0.0):
+        """
+        Começa uma gravação no stream já aberto, a partir dos últimos
+        `preroll_seconds` guardados enquanto ele estava ocioso.
+        """
+        write_pos = self._write_pos
+        # Metade do buffer no máximo: o resto é a folga da gravação
+        preroll = min(int(preroll_seconds * self.samplerate), self.ring_frames // 2, write_pos)
+        self._read_pos = write_pos - preroll
+        self.idle = False
+        if preroll:
+            self._data_ready.set()
+
+    def end(self):
+        """Termina a gravação; o stream continua aberto, guardando a pré-gravação."""
+        self.idle = True
+        self._read_pos = self._write_pos
+
+    @contextmanager
+    def recording(self, preroll_seconds=0.0):
+        self.begin(preroll_seconds)
+        try:
+            yield self
+        finally:
+            self.end()
+
+    def _callback(self, indata, frames, time_info, status):
+        """Executado na thread de áudio: só copia os dados, sem alocar nem bloquear."""
+        started = time.perf_counter()
+        if status.input_overflow:
+            self.overflow_count += 1
+
+        if self.idle:
+            # Ninguém lê: mantém só os quadros mais recentes
+            frames = min(frames, self.ring_frames)
+            indata = indata[len(indata) - frames:]
+            free = frames
+        else:
+            free = self.ring_frames - (self._write_pos - self._read_pos)
+        if frames > free:
+            # O leitor ficou para trás: descarta o excesso em vez de sobrescrever
+            self.dropped_frames += frames - free
+            frames = free
+        if frames <= 0:
+            return
+
+        start = self._write_pos % self.ring_frames
+        first = min(frames, self.ring_frames - start)
+        self._ring[start:start + first] = indata[:first]
+        if first < frames:
+            self._ring[:frames - first] = indata[first:frames]
+
+        self._write_pos += frames
+        self.frames_captured += frames
+        if not self.idle:
+            self._data_ready.set()
+        self.callback_seconds += time.perf_counter() - started
+
+    def wait_for_data(self, timeout):
+        """Bloqueia até haver dados novos no buffer (ou até o timeout)."""
+        self._data_ready.wait(timeout)
+        self._data_ready.clear()
+
+    def read_available(self):
+        """Retorna (cópia de) todos os quadros ainda não lidos do buffer circular."""
+        write_pos = self._write_pos
+        frames = write_pos - self._read_pos
+        if frames <= 0 or self.idle:
+            return self._ring[:0].copy()
+
+        start = self._read_pos % self.ring_frames
+        first = min(frames, self.ring_frames - start)
+        if first == frames:
+            block = self._ring[start:start + frames].copy()
+        else:
+            block = np.concatenate([self._ring[start:], self._ring[:frames - first]])
+
+        self._read_pos = write_pos
+        return block
@@ -1,18 +1,138 @@
+"""
+Dispositivos de entrada e perfis de captura em cache.
+
+O perfil de um dispositivo (dtype e taxa de amostragem aceitos) é descoberto
+uma única vez com `sd.check_input_settings`, sem abrir streams, e guardado em
+~/.cache/speechtotext/devices.json. A captura pede 16 kHz mono direto ao
+dispositivo quando ele aceita (o Whisper usa 16 kHz), e só cai para a taxa
+padrão do dispositivo, reamostrada durante a captura, quando não aceita.
+
+O cache inteiro é descartado quando a lista de dispositivos muda (microfone
+conectado ou removido, driver atualizado...).
+"""
+
+import hashlib
+import json
+import os
+import threading
+
 import sounddevice as sd
 
+from . import instrumentation
+from .audio_utils import WHISPER_SAMPLE_RATE
+from .capture_engine import CaptureEngine
+from .result_cache import DEFAULT_CACHE_DIR
+
+PROFILES_PATH = os.path.join(DEFAULT_CACHE_DIR, "devices.json")
+
+_profiles = None        # {"signature": ..., "profiles": {chave do dispositivo: perfil}}
+_profiles_lock = threading.Lock()
+
+
 def get_audio_devices():
     """Consulta e retorna uma lista de dispositivos de entrada de áudio."""
     try:
-        all_devices = sd.query_devices()
+        with instrumentation.span("device_probe"):
+            all_devices = sd.query_devices()
         input_devices = []
-        
-        print("Dispositivos de áudio disponíveis:")
+
         for idx, dev in enumerate(all_devices):
             if dev['max_input_channels'] > 0:
                 input_devices.append((idx, dev))
-                print(f"  {idx}: {dev['name']} - {dev['max_input_channels']} canais - {dev['default_samplerate']}Hz")
-        
+
+        # Os nomes só vão para o log quando a lista muda desde a última execução
+        if _load_profiles(all_devices):
+            instrumentation.log(f"{len(input_devices)} dispositivo(s) de entrada encontrado(s)",
+                                devices=[dev['name'] for _, dev in input_devices])
+        else:
+            instrumentation.log(f"{len(input_devices)} dispositivo(s) de entrada encontrado(s)")
+
         return input_devices, all_devices
     except Exception as e:
-        print(f"Erro ao listar microfones: {e}")
-        return [], None
\ No newline at end of file
+        instrumentation.log(f"Erro ao listar microfones: {e}")
+        return [], None
+
+
+def devices_signature(all_devices):
+    """Hash da lista de dispositivos; muda quando algum é conectado, removido ou alterado."""
+    described = [(dev['name'], dev['hostapi'], dev['max_input_channels'], dev['default_samplerate'])
+                 for dev in all_devices]
+    return hashlib.sha256(json.dumps(described).encode("utf-8")).hexdigest()[:16]
+
+
+def _device_key(device_idx, device_info):
+    # O índice sozinho muda quando outro dispositivo é conectado
+    return f"{device_idx}:{device_info['hostapi']}:{device_info['name']}"
+
+
+def _load_profiles(all_devices):
+    """Carrega o cache de perfis; retorna True se a lista de dispositivos mudou."""
+    global _profiles
+    signature = devices_signature(all_devices)
+    with _profiles_lock:
+        try:
+            with open(PROFILES_PATH, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        changed = stored.get("signature") != signature
+        _profiles = {"signature": signature, "profiles": {} if changed else stored.get("profiles", {})}
+        if changed:
+            _save_profiles()
+        return changed
+
+
+def _save_profiles():
+    try:
+        os.makedirs(os.path.dirname(PROFILES_PATH), exist_ok=True)
+        tmp_path = PROFILES_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_profiles, f, indent=2)
+        os.replace(tmp_path, PROFILES_PATH)
+    except OSError as e:
+        instrumentation.log(f"Não foi possível salvar os perfis de dispositivo: {e}")
+
+
+def get_device_profile(device_idx, device_info):
+    """
+    Retorna o perfil de captura do dispositivo: {"samplerate", "dtype",
+    "channels"}. Usa o cache ou, na primeira vez, testa as combinações
+    (16 kHz antes da taxa padrão) sem abrir nenhum stream.
+    """
+    key = _device_key(device_idx, device_info)
+    with _profiles_lock:
+        if _profiles is not None and key in _profiles["profiles"]:
+            return dict(_profiles["profiles"][key])
+
+    with instrumentation.span("device_profile"):
+        profile = _probe_device(device_idx, device_info)
+    instrumentation.log(f"Perfil do dispositivo: {profile['samplerate']}Hz, {profile['dtype']}",
+                        device=device_idx, **profile)
+
+    with _profiles_lock:
+        if _profiles is not None:
+            _profiles["profiles"][key] = profile
+            _save_profiles()
+    return dict(profile)
+
+
+def invalidate_device_profile(device_idx, device_info):
+    """Remove o perfil em cache (ex.: o stream não abriu com ele)."""
+    with _profiles_lock:
+        if _profiles is not None and _profiles["profiles"].pop(_device_key(device_idx, device_info), None):
+            _save_profiles()
+
+
+def _probe_device(device_idx, device_info):
+    default_rate = int(device_info['default_samplerate'])
+    rates = [WHISPER_SAMPLE_RATE] + ([default_rate] if default_rate != WHISPER_SAMPLE_RATE else [])
+    for samplerate in rates:
+        for dtype in CaptureEngine.DTYPES_TO_TRY:
+            try:
+                sd.check_input_settings(device=device_idx, channels=1, dtype=dtype,
+                                        samplerate=samplerate)
+                return {"samplerate": samplerate, "dtype": dtype, "channels": 1}
+            except Exception:
+                continue
+    # Nada confirmado: a captura testa os formatos ao abrir o stream, como antes
+    return {"samplerate": default_rate, "dtype": None, "channels": 1}
@@ -0,0 +1,325 @@
+"""
+Cache dos espectrogramas mel e das saídas do encoder do Whisper.
+
+O encoder é a parte mais cara para os modelos maiores e não depende das
+opções de decodificação: repetir um arquivo com outro idioma, feixe ou
+prompt (ou o fallback de temperatura do próprio Whisper, que decodifica a
+mesma janela várias vezes) recalculava tudo. Cada janela de 30 s que entra
+no encoder é identificada pelo hash do seu mel e pelo nome do modelo; os
+espectrogramas de até uma janela, pelo hash do áudio. O mel de um áudio mais
+longo não é guardado: o Whisper o normaliza pelo máximo do áudio inteiro,
+então o de cada janela depende do resto do arquivo, e guardá-lo inteiro
+(~57 MB por hora) tiraria do LRU as saídas do encoder.
+
+A memória é limitada por S2T_ENCODER_CACHE_MB (LRU; 0 desliga o cache). Com
+S2T_ENCODER_CACHE_DIR, as saídas do encoder também vão para o disco nesse
+diretório (arquivos .npy, os menos usados removidos acima de
+S2T_ENCODER_CACHE_DISK_MB) e valem entre execuções e processos.
+"""
+
+import hashlib
+import importlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from . import instrumentation
+
+MEMORY_ENV = "S2T_ENCODER_CACHE_MB"
+DISK_DIR_ENV = "S2T_ENCODER_CACHE_DIR"
+DISK_BUDGET_ENV = "S2T_ENCODER_CACHE_DISK_MB"
+DEFAULT_MEMORY_MB = 256
+DEFAULT_DISK_MB = 2048
+
+
+def _tensor_hash(tensor, *parts):
+    """SHA-256 dos bytes do tensor (qualquer dtype) e das partes extras."""
+    import torch
+
+    digest = hashlib.sha256()
+    for part in parts + (tensor.dtype, tuple(tensor.shape)):
+        digest.update(str(part).encode("utf-8"))
+    digest.update(tensor.detach().contiguous().view(torch.uint8).cpu().numpy())
+    return digest.hexdigest()
+
+
+def _nbytes(tensor):
+    return tensor.numel() * tensor.element_size()
+
+
+class EncoderCache:
+    """LRU em memória (mel e encoder) com uma camada opcional em disco (só encoder)."""
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_MB * 2**20, disk_dir=None,
+                 max_disk_bytes=DEFAULT_DISK_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # chave -> tensor; o último é o mais recente
+        self._bytes = 0
+        self._disk_bytes = None         # Calculado na primeira escrita
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    def _get_memory(self, key):
+        with self._lock:
+            tensor = self._entries.get(key)
+            if tensor is not None:
+                self._entries.move_to_end(key)
+            return tensor
+
+    def _put_memory(self, key, tensor):
+        size = _nbytes(tensor)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= _nbytes(previous)
+            self._entries[key] = tensor
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".npy")
+
+    def get(self, key, device):
+        """Saída do encoder guardada para `key` (no `device`), ou None."""
+        tensor = self._get_memory(key)
+        if tensor is None and self.disk_dir:
+            tensor = self._read_disk(key)
+            if tensor is not None:
+                tensor = tensor.to(device)
+                self._put_memory(key, tensor)
+                with self._lock:
+                    self.disk_hits += 1
+        with self._lock:
+            if tensor is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return tensor.to(device)
+
+    def put(self, key, tensor):
+        """Guarda a saída do encoder de uma janela."""
+        self._put_memory(key, tensor)
+        if self.disk_dir:
+            self._write_disk(key, tensor)
+
+    def _read_disk(self, key):
+        import numpy as np
+        import torch
+
+        path = self._disk_path(key)
+        try:
+            array = np.load(path)
+            os.utime(path)      # A data de modificação marca o último uso
+        except (OSError, ValueError):
+            return None
+        return torch.from_numpy(array)
+
+    def _write_disk(self, key, tensor):
+        import numpy as np
+
+        try:
+            array = tensor.detach().cpu().numpy()
+        except TypeError:       # bfloat16 não tem equivalente no numpy
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            instrumentation.log(f"Não foi possível gravar a saída do encoder no disco: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += array.nbytes
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_files(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".npy"):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict_disk(self):
+        # Outros processos podem ter gravado no mesmo diretório: recalcula pelo disco
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        self._disk_bytes = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+    def get_mel(self, key):
+        return self._get_memory(key)
+
+    def put_mel(self, key, mel):
+        self._put_memory(key, mel)
+
+    def clear(self):
+        """Esvazia a memória (o disco, se houver, é mantido)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_encoder_cache():
+    """Instância compartilhada, configurada pelas variáveis de ambiente."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EncoderCache(
+                max_bytes=int(os.environ.get(MEMORY_ENV, DEFAULT_MEMORY_MB)) * 2**20,
+                disk_dir=os.environ.get(DISK_DIR_ENV) or None,
+                max_disk_bytes=int(os.environ.get(DISK_BUDGET_ENV, DEFAULT_DISK_MB)) * 2**20,
+            )
+        return _default_cache
+
+
+def set_encoder_cache(cache):
+    """Troca a instância compartilhada (ex.: EncoderCache(0) desliga o cache)."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
+
+
+@contextmanager
+def disabled():
+    """Desliga o cache compartilhado durante o bloco (medições de desempenho)."""
+    global _default_cache
+    with _default_cache_lock:
+        previous, _default_cache = _default_cache, EncoderCache(0)
+    try:
+        yield
+    finally:
+        with _default_cache_lock:
+            _default_cache = previous
+
+
+def log_mel_spectrogram(audio, n_mels=80, padding=0, device=None):
+    """
+    `whisper.log_mel_spectrogram` com o resultado guardado pelo hash do áudio,
+    para áudios de até uma janela de 30 s (os mais longos só são calculados).
+    """
+    import numpy as np
+    import torch
+    import whisper
+
+    cache = get_encoder_cache()
+    if isinstance(audio, str) or cache.max_bytes <= 0 or len(audio) > whisper.audio.N_SAMPLES:
+        return whisper.audio.log_mel_spectrogram(audio, n_mels, padding, device)
+    tensor = torch.from_numpy(np.ascontiguousarray(audio)) if isinstance(audio, np.ndarray) else audio
+    key = "mel-" + _tensor_hash(tensor, n_mels, padding, device)
+    mel = cache.get_mel(key)
+    if mel is None:
+        mel = whisper.audio.log_mel_spectrogram(tensor, n_mels, padding, device)
+        cache.put_mel(key, mel)
+    return mel
+
+
+_transcribe_mels_lock = threading.Lock()
+_transcribe_mels_users = 0
+_original_log_mel_spectrogram = None
+
+
+@contextmanager
+def transcribe_mels():
+    """
+    Durante o bloco, `whisper.transcribe` calcula o mel por
+    `log_mel_spectrogram` daqui. A troca vale para o módulo inteiro, então é
+    contada: o original volta quando o último bloco aberto (em qualquer
+    thread) termina.
+    """
+    global _transcribe_mels_users, _original_log_mel_spectrogram
+    # `whisper.transcribe` é também o nome da função exportada pelo pacote
+    whisper_transcribe = importlib.import_module("whisper.transcribe")
+    with _transcribe_mels_lock:
+        if _transcribe_mels_users == 0:
+            _original_log_mel_spectrogram = whisper_transcribe.log_mel_spectrogram
+            whisper_transcribe.log_mel_spectrogram = log_mel_spectrogram
+        _transcribe_mels_users += 1
+    try:
+        yield
+    finally:
+        with _transcribe_mels_lock:
+            _transcribe_mels_users -= 1
+            if _transcribe_mels_users == 0:
+                whisper_transcribe.log_mel_spectrogram = _original_log_mel_spectrogram
+
+
+def install(model):
+    """
+    Faz o encoder de `model` consultar o cache antes de calcular cada janela
+    (também dentro de lotes: só as janelas ausentes passam pelo encoder).
+    Modelos sem `model_name` não usam o cache.
+    """
+    if getattr(model, "_encoder_cache_installed", False) or getattr(model, "model_name", None) is None:
+        return model
+    encoder = model.encoder
+    compute = encoder.forward
+    model_name = model.model_name
+
+    def forward(x):
+        import torch
+
+        cache = get_encoder_cache()
+        if not cache.enabled:
+            return compute(x)
+        keys = [_tensor_hash(window, model_name) for window in x]
+        outputs = [cache.get(key, x.device) for key in keys]
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        instrumentation.count("encoder_cache_hits", len(keys) - len(missing))
+        if not missing:
+            return torch.stack(outputs)
+        instrumentation.count("encoder_cache_misses", len(missing))
+
+        computed = compute(x if len(missing) == len(x) else x[missing])
+        if len(x) == 1:
+            cache.put(keys[0], computed[0])
+            return computed
+        for i, output in zip(missing, computed):
+            # Cópia: uma fatia manteria o lote inteiro na memória
+            outputs[i] = output.clone()
+            cache.put(keys[i], outputs[i])
+        return torch.stack(outputs)
+
+    encoder.forward = forward
+    model._encoder_cache_installed = True
+    return model
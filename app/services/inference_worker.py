@@ -0,0 +1,490 @@
+"""
+Processos de trabalho para a inferência da interface.
+
+O torch roda fora do processo da janela: o código Python da decodificação não
+disputa o GIL com o loop de eventos do Qt, e um trabalho pode ser cancelado
+na hora, encerrando o processo (uma thread em `run` não pode ser interrompida).
+
+Cada processo é persistente e mantém seus modelos carregados (o conjunto de
+modelos residentes dele, ver model_pool) entre os trabalhos. Os comandos vão
+por um pipe e os eventos (progresso, segmentos, resultado) voltam por outro.
+O áudio gravado vai por memória compartilhada, sem ser serializado no pipe;
+arquivos são lidos pelo próprio processo. Na transcrição ao vivo, os blocos
+da gravação vão pelo pipe de comandos conforme chegam. Dentro dele, as mesmas threads de
+transcrição da interface (transcriber.py) rodam de forma síncrona.
+
+Os tempos medidos no processo (carga do modelo, decodificação, encoder...)
+voltam como um evento "metrics" antes de cada resultado e são somados ao
+trabalho medido pela interface (ver instrumentation.merge).
+
+Cada processo tem seu próprio conjunto de modelos residentes, então o
+orçamento de RAM dos modelos (S2T_MODEL_BUDGET_MB) é dividido entre eles.
+
+Um processo encerrado por cancelamento é substituído por outro, que já
+recarrega os mesmos modelos. S2T_INFERENCE_WORKER=0 mantém a inferência no
+processo da interface; S2T_INFERENCE_WORKERS define quantos processos podem
+rodar ao mesmo tempo (padrão: 2, a concorrência da fila de trabalhos).
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from contextlib import contextmanager
+
+from . import instrumentation
+
+ENABLED_ENV = "S2T_INFERENCE_WORKER"
+WORKERS_ENV = "S2T_INFERENCE_WORKERS"
+DEFAULT_WORKERS = 2
+STOP_TIMEOUT = 2.0      # Segundos para um processo sair sozinho antes de ser morto
+WORKER_NICE = 10        # Prioridade mais baixa que a da interface, que não pode perder quadros
+
+
+def enabled():
+    """Se a inferência da interface roda em processos de trabalho (padrão: sim)."""
+    return os.environ.get(ENABLED_ENV, "1") != "0"
+
+
+class WorkerDied(Exception):
+    """O processo de trabalho terminou (cancelado ou falhou) antes de responder."""
+
+
+class InferenceWorker:
+    """Um processo de trabalho e os pipes de comandos e de eventos."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, models=(), model_budget_mb=None):
+        ctx = multiprocessing.get_context("spawn")
+        commands_in, self._commands = ctx.Pipe(duplex=False)
+        self._events, events_out = ctx.Pipe(duplex=False)
+        self.id = next(self._ids)
+        self.models = set()         # Modelos carregados (confirmados pelo processo)
+        self.loading = set()        # Modelos pedidos e ainda não confirmados
+        # Não é daemon: o modo paralelo cria processos a partir dele
+        self.process = ctx.Process(target=_worker_main, args=(commands_in, events_out, model_budget_mb),
+                                   name=f"speechtotext-worker-{self.id}")
+        self.process.start()
+        # As pontas do processo filho fecham aqui para que a morte dele apareça como EOF
+        commands_in.close()
+        events_out.close()
+        self.load(models)
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def send(self, message):
+        try:
+            self._commands.send(message)
+        except (OSError, ValueError) as e:
+            raise WorkerDied(str(e)) from None
+
+    def load(self, models):
+        """Pede a carga dos modelos que o processo ainda não tem (sem esperar)."""
+        missing = [name for name in models if name not in self.models and name not in self.loading]
+        if missing:
+            self.send(("load", missing))
+            self.loading.update(missing)
+
+    def receive(self):
+        """Próximo evento do processo; levanta WorkerDied se ele terminou."""
+        try:
+            event = self._events.recv()
+        except (EOFError, OSError):
+            raise WorkerDied("processo de transcrição encerrado") from None
+        if event[0] == "loaded":
+            self.loading.discard(event[1])
+            if event[2] is None:
+                self.models.add(event[1])
+        return event
+
+    def kill(self):
+        """
+        Encerra o processo na hora (cancelamento), junto com os processos que
+        ele criou (modo paralelo). Os pipes ficam abertos: quem está lendo
+        recebe o fim do processo e os fecha ao devolvê-lo (release).
+        """
+        if hasattr(os, "killpg"):
+            # O processo é líder do próprio grupo (ver _worker_main); os filhos
+            # continuam no grupo mesmo depois de o processo ter saído
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        # Windows, ou processo que ainda não criou o grupo: os filhos do modo
+        # paralelo saem sozinhos ao ver o pai morto (ver parallel._init_worker)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+    def stop(self):
+        """Pede para o processo sair e o mata se não sair a tempo."""
+        try:
+            self._commands.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.kill()
+        self.close()
+
+    def close(self):
+        self._commands.close()
+        self._events.close()
+
+
+class WorkerPool:
+    """
+    Processos de trabalho ociosos e ocupados. `acquire` entrega um processo
+    exclusivo, de preferência um que já tenha (ou esteja carregando) os
+    modelos pedidos; os demais modelos são pedidos a ele na hora.
+    """
+
+    def __init__(self, max_workers=None):
+        if max_workers is None:
+            max_workers = int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS))
+        self.max_workers = max(1, max_workers)
+        from .model_pool import BUDGET_ENV, DEFAULT_BUDGET_MB
+
+        # A parte de cada processo no orçamento dos modelos residentes
+        self.model_budget_mb = int(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB)) // self.max_workers
+        self._idle = []             # O último é o usado mais recentemente
+        self._busy = set()
+        self._starting = 0          # Substitutos sendo criados (ver recycle)
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def acquire(self, models):
+        """Processo exclusivo para `models` (nomes); espera se todos estiverem ocupados."""
+        models = [name for name in models if name]
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise WorkerDied("processos de transcrição encerrados")
+                self._idle = [worker for worker in self._idle if worker.alive]
+                worker = self._pick_idle(models)
+                if worker is not None:
+                    self._idle.remove(worker)
+                    break
+                if len(self._busy) + len(self._idle) + self._starting < self.max_workers:
+                    break
+                if self._idle:
+                    # Sem vaga para outro processo: usa o ocioso mais recente,
+                    # cujo conjunto de modelos descarta os antigos se precisar
+                    worker = self._idle.pop()
+                    break
+                self._condition.wait()
+            if worker is None:
+                worker = InferenceWorker(model_budget_mb=self.model_budget_mb)
+            self._busy.add(worker)
+        worker.load(models)
+        return worker
+
+    def _pick_idle(self, models):
+        known = lambda worker, name: name in worker.models or name in worker.loading
+        for worker in reversed(self._idle):
+            if all(known(worker, name) for name in models):
+                return worker
+        for worker in reversed(self._idle):
+            if any(known(worker, name) for name in models):
+                return worker
+        return None
+
+    def release(self, worker):
+        with self._condition:
+            self._busy.discard(worker)
+            reuse = worker.alive and not self._closed
+            if reuse:
+                self._idle.append(worker)
+            self._condition.notify_all()
+        if not reuse:
+            worker.kill()
+            worker.close()
+
+    def recycle(self, worker):
+        """
+        Mata o processo (cancelamento imediato). Um substituto, que já carrega
+        os mesmos modelos, é criado em segundo plano.
+        """
+        models = worker.models | worker.loading
+        worker.kill()
+        instrumentation.count("inference_worker_recycled")
+        with self._condition:
+            self._busy.discard(worker)
+            if self._closed:
+                return
+            self._starting += 1
+
+        def replace():
+            replacement = None
+            try:
+                replacement = InferenceWorker(models, self.model_budget_mb)
+            except Exception as e:
+                instrumentation.log(f"Erro ao recriar o processo de transcrição: {e}")
+            with self._condition:
+                self._starting -= 1
+                if replacement is not None:
+                    if self._closed:
+                        replacement.kill()
+                        replacement.close()
+                    else:
+                        self._idle.append(replacement)
+                self._condition.notify_all()
+
+        threading.Thread(target=replace, name="worker-recycle", daemon=True).start()
+
+    def preload(self, models):
+        """Carrega `models` num processo e espera a confirmação (levanta RuntimeError se falhar)."""
+        worker = self.acquire(models)
+        try:
+            while not all(name in worker.models for name in models):
+                event = worker.receive()
+                if event[0] == "loaded" and event[2] is not None and event[1] in models:
+                    raise RuntimeError(event[2])
+        finally:
+            self.release(worker)
+
+    def prefetch(self, models):
+        """Carrega `models` em segundo plano, sem bloquear quem chamou."""
+        def run():
+            try:
+                self.preload(models)
+            except Exception as e:
+                instrumentation.log(f"Erro ao pré-carregar {', '.join(models)}: {e}")
+
+        thread = threading.Thread(target=run, name="worker-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def is_resident(self, model_name):
+        with self._condition:
+            return any(model_name in worker.models for worker in self._idle + list(self._busy))
+
+    def format_stats(self):
+        """Resumo curto para a interface (processos e os modelos de cada um)."""
+        with self._condition:
+            workers = self._idle + list(self._busy)
+        names = ", ".join(sorted({name for worker in workers for name in worker.models})) or "nenhum"
+        return f"Processos de transcrição: {len(workers)} | Modelos carregados neles: {names}"
+
+    def shutdown(self, kill=False):
+        """
+        Encerra todos os processos: os ocupados na hora (com os processos do
+        modo paralelo que eles tenham criado), os ociosos pedindo para sair.
+        """
+        with self._condition:
+            self._closed = True
+            idle, busy = self._idle, list(self._busy)
+            self._idle = []
+            self._condition.notify_all()
+        for worker in busy:
+            worker.kill()
+        for worker in idle:
+            if kill:
+                worker.kill()
+                worker.close()
+            else:
+                worker.stop()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Conjunto de processos compartilhado pela interface."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WorkerPool()
+            atexit.register(_default_pool.shutdown, True)
+        return _default_pool
+
+
+def shutdown_worker_pool():
+    """Encerra os processos do conjunto compartilhado, se ele tiver sido criado."""
+    with _default_pool_lock:
+        pool = _default_pool
+    if pool is not None:
+        pool.shutdown()
+
+
+_job_ids = itertools.count(1)
+
+
+def new_job_id():
+    return next(_job_ids)
+
+
+@contextmanager
+def shared_audio(audio):
+    """
+    Copia `audio` (float32) para um bloco de memória compartilhada e entrega
+    (nome, amostras); o bloco é liberado ao sair. Sem áudio, entrega (None, 0).
+    """
+    if audio is None:
+        yield None, 0
+        return
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    audio = np.asarray(audio, dtype=np.float32)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+    try:
+        np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+        yield shm.name, len(audio)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _read_shared_audio(name, length):
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    # Sem rastreamento: quem criou o bloco é que o remove
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: o rastreador de recursos é o mesmo da interface, e o
+        # registro repetido não muda nada
+        shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Cópia local: o bloco pode ser liberado assim que a interface quiser
+        return np.ndarray((length,), dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def _worker_main(commands, events, model_budget_mb=None):
+    """Laço do processo de trabalho: um comando por vez; cancelamentos de itens chegam a qualquer hora."""
+    from .model_pool import BUDGET_ENV, get_model_pool
+    from .transcriber import BatchTranscriptionThread, StreamingTranscriptionThread, TranscriptionThread
+
+    if model_budget_mb is not None:
+        # Antes de o conjunto de modelos existir; vale também para o modo paralelo
+        os.environ[BUDGET_ENV] = str(model_budget_mb)
+    if hasattr(os, "setpgrp"):
+        # Grupo próprio: `kill` encerra também os processos do modo paralelo
+        os.setpgrp()
+    if hasattr(os, "nice"):
+        # Herdada pelos processos do modo paralelo
+        os.nice(WORKER_NICE)
+
+    pending = queue.Queue()
+    running = {}        # id do trabalho -> thread de transcrição (rodando de forma síncrona)
+    early_cancels = {}  # id do trabalho -> itens cancelados antes de o lote começar
+    streams = {}        # id do trabalho ao vivo -> fila de blocos de áudio
+    running_lock = threading.Lock()
+
+    def listen():
+        while True:
+            try:
+                message = commands.recv()
+            except (EOFError, OSError):
+                # A interface fechou (ou morreu): nada mais a fazer
+                os._exit(0)
+            if message[0] == "stream":
+                # A fila existe antes de o trabalho começar: o áudio já vem atrás do pedido
+                with running_lock:
+                    streams[message[1]] = queue.Queue()
+                pending.put(message)
+            elif message[0] in ("stream_audio", "stream_end"):
+                with running_lock:
+                    audio_queue = streams.get(message[1])
+                if audio_queue is not None:
+                    audio_queue.put(message[2:] if message[0] == "stream_audio" else None)
+            elif message[0] == "cancel_item":
+                with running_lock:
+                    thread = running.get(message[1])
+                    if thread is None:
+                        early_cancels.setdefault(message[1], set()).add(message[2])
+                if thread is not None:
+                    thread.cancel(message[2])
+            else:
+                pending.put(message)
+
+    threading.Thread(target=listen, name="worker-commands", daemon=True).start()
+    send = events.send
+    measured = [instrumentation.snapshot()]
+
+    def send_result(event):
+        # Os tempos do trabalho vão antes do resultado, que pode encerrar a medição na interface
+        spans, counters = instrumentation.totals_since(measured[0])
+        measured[0] = instrumentation.snapshot()
+        if spans or counters:
+            send(("metrics", event[1], spans, counters))
+        send(event)
+
+    while True:
+        message = pending.get()
+        kind = message[0]
+        if kind == "stop":
+            return
+        if kind == "load":
+            for name in message[1]:
+                try:
+                    get_model_pool().get(name)
+                    send(("loaded", name, None))
+                except Exception as e:
+                    instrumentation.log(f"Erro ao carregar o modelo: {e}")
+                    send(("loaded", name, str(e)))
+        elif kind == "transcribe":
+            _, job_id, request = message
+            audio = None
+            if request.get("audio_shm"):
+                audio = _read_shared_audio(request["audio_shm"], request["audio_length"])
+            thread = TranscriptionThread(request["model"], request["file_path"], audio=audio,
+                                         vad=request["vad"], parallel=request["parallel"],
+                                         draft=request["draft"])
+            thread.progress.connect(lambda fraction: send(("progress", job_id, fraction)))
+            thread.segment_ready.connect(lambda start, end, text: send(("segment", job_id, start, end, text)))
+            thread.transcription_finished.connect(lambda text, *_: send_result(("done", job_id, {
+                "text": text, "vad": thread.vad_stats, "parallel": thread.parallel_stats,
+                "speculative": thread.speculative_stats,
+            })))
+            thread.transcription_error.connect(lambda error: send_result(("error", job_id, error)))
+            thread.transcription_cancelled.connect(lambda: send_result(("cancelled", job_id)))
+            measured[0] = instrumentation.snapshot()
+            thread.run()
+            send(("end", job_id))
+        elif kind == "stream":
+            _, job_id, request = message
+            with running_lock:
+                audio_queue = streams[job_id]
+            thread = StreamingTranscriptionThread(request["model"], audio_queue, request["language"])
+            # Os tempos vão junto de cada texto: a interface decide em que trabalho entram
+            thread.partial_text.connect(lambda text: send_result(("partial", job_id, text)))
+            thread.segment_finalized.connect(lambda text: send_result(("segment", job_id, text)))
+            thread.streaming_finished.connect(lambda text: send_result(("done", job_id, text)))
+            thread.transcription_error.connect(lambda error: send_result(("error", job_id, error)))
+            measured[0] = instrumentation.snapshot()
+            try:
+                thread.run()
+            finally:
+                with running_lock:
+                    streams.pop(job_id, None)
+            send(("end", job_id))
+        elif kind == "batch":
+            _, job_id, request = message
+            thread = BatchTranscriptionThread(request["model"], request["file_paths"], vad=request["vad"])
+            with running_lock:
+                running[job_id] = thread
+                for index in early_cancels.pop(job_id, ()):
+                    thread.cancel(index)
+            thread.progress.connect(lambda fraction: send(("progress", job_id, fraction)))
+            thread.item_finished.connect(lambda index, text: send_result(("item_finished", job_id, index, text)))
+            thread.item_error.connect(lambda index, error: send_result(("item_error", job_id, index, error)))
+            thread.item_cancelled.connect(lambda index: send_result(("item_cancelled", job_id, index)))
+            measured[0] = instrumentation.snapshot()
+            try:
+                thread.run()
+            finally:
+                with running_lock:
+                    running.pop(job_id, None)
+            send(("end", job_id))
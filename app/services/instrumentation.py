@@ -0,0 +1,270 @@
+"""
+Instrumentação de tempos do pipeline (substitui os print() de diagnóstico).
+
+- `span("nome")`: mede um trecho (context manager); os tempos entram no total
+  do trecho e no detalhamento do trabalho atual.
+- `count("nome", n)`: contadores (ex.: overflows de captura).
+- `log("mensagem", **campos)`: mensagem no console e no log JSON.
+- `begin_job()` / `end_job()`: delimitam um trabalho (gravação ou arquivo até
+  o texto na tela); ao final, o detalhamento fica em `last_job()` e os
+  arquivos de exportação são atualizados:
+    ~/.cache/speechtotext/metrics.jsonl  (um evento JSON por linha, com rotação)
+    ~/.cache/speechtotext/metrics.prom   (formato texto do Prometheus)
+
+O trabalho atual é de cada thread: `begin_job()` vale para a thread que o
+chamou, e as threads que trabalham para ele o assumem com `bind_job(job)` (ou
+só num trecho, com `job_scope(job)`). Assim
+dois trabalhos simultâneos não misturam seus tempos.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .result_cache import DEFAULT_CACHE_DIR
+
+JSON_LOG_PATH = os.path.join(DEFAULT_CACHE_DIR, "metrics.jsonl")
+PROMETHEUS_PATH = os.path.join(DEFAULT_CACHE_DIR, "metrics.prom")
+METRIC_PREFIX = "speechtotext"
+JSON_LOG_MAX_BYTES = 10 * 1024 * 1024   # Acima disso o log é rotacionado
+JSON_LOG_BACKUPS = 2                    # metrics.jsonl.1, metrics.jsonl.2
+
+
+class Instrumentation:
+    """Registro de spans e contadores, seguro para várias threads."""
+
+    def __init__(self, json_log_path=JSON_LOG_PATH, prometheus_path=PROMETHEUS_PATH,
+                 max_log_bytes=JSON_LOG_MAX_BYTES, log_backups=JSON_LOG_BACKUPS):
+        self.json_log_path = json_log_path
+        self.prometheus_path = prometheus_path
+        self.max_log_bytes = max_log_bytes
+        self.log_backups = log_backups
+        self._lock = threading.Lock()
+        self.span_totals = {}       # nome -> [soma dos segundos, quantidade]
+        self.counters = {}
+        self._local = threading.local()     # Trabalho atual de cada thread
+        self._last_job = None
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, **labels)
+
+    def record(self, name, seconds, emit=True, **labels):
+        """
+        Registra um tempo medido fora de um `span`. Com `emit=False` o tempo
+        entra só nos totais (hooks chamados a cada token não vão para o log).
+        """
+        with self._lock:
+            total = self.span_totals.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+            job = self.current_job()
+            if job is not None:
+                job["spans"][name] = job["spans"].get(name, 0.0) + seconds
+        if emit:
+            self._write_event({"type": "span", "name": name, "seconds": round(seconds, 6), **labels})
+
+    def count(self, name, value=1):
+        if not value:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            job = self.current_job()
+            if job is not None:
+                job["counters"][name] = job["counters"].get(name, 0) + value
+
+    def snapshot(self):
+        """Cópia dos totais de spans e contadores, para medir um trecho por diferença."""
+        with self._lock:
+            return {name: list(total) for name, total in self.span_totals.items()}, dict(self.counters)
+
+    def totals_since(self, snapshot):
+        """Spans ({nome: [segundos, quantidade]}) e contadores acumulados desde `snapshot`."""
+        spans_before, counters_before = snapshot
+        with self._lock:
+            spans = {}
+            for name, (seconds, n) in self.span_totals.items():
+                before = spans_before.get(name, (0.0, 0))
+                if n > before[1]:
+                    spans[name] = [seconds - before[0], n - before[1]]
+            counters = {name: value - counters_before.get(name, 0) for name, value in self.counters.items()
+                        if value != counters_before.get(name, 0)}
+        return spans, counters
+
+    def merge(self, spans, counters):
+        """
+        Soma aos totais e ao trabalho atual tempos medidos em outro processo
+        (ver inference_worker); os eventos já foram para o log por lá.
+        """
+        with self._lock:
+            job = self.current_job()
+            for name, (seconds, n) in spans.items():
+                total = self.span_totals.setdefault(name, [0.0, 0])
+                total[0] += seconds
+                total[1] += n
+                if job is not None:
+                    job["spans"][name] = job["spans"].get(name, 0.0) + seconds
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+                if job is not None:
+                    job["counters"][name] = job["counters"].get(name, 0) + value
+
+    def log(self, message, **fields):
+        print(message)
+        self._write_event({"type": "log", "message": message, **fields})
+
+    def current_job(self):
+        """Trabalho medido pela thread atual, ou None."""
+        return getattr(self._local, "job", None)
+
+    def begin_job(self, kind):
+        """Abre um trabalho, que passa a ser o atual desta thread, e o retorna."""
+        job = {"kind": kind, "started": time.perf_counter(), "spans": {}, "counters": {}}
+        self._local.job = job
+        return job
+
+    def bind_job(self, job):
+        """Faz de `job` o trabalho atual desta thread (threads que trabalham para um só)."""
+        self._local.job = job
+
+    @contextmanager
+    def job_scope(self, job):
+        """Mede o trecho dentro de `job` (de outra thread); com None, fora de qualquer trabalho."""
+        previous = self.current_job()
+        self._local.job = job
+        try:
+            yield job
+        finally:
+            self._local.job = previous
+
+    def end_job(self, job=None):
+        """
+        Fecha `job` (ou o trabalho atual desta thread), guarda o detalhamento
+        e atualiza as exportações.
+        """
+        if job is None:
+            job = self.current_job()
+        if job is not None and self.current_job() is job:
+            self._local.job = None
+        with self._lock:
+            if job is None or "started" not in job:
+                return None     # Já fechado
+            job["total"] = time.perf_counter() - job.pop("started")
+            self._last_job = job
+        self._write_event({"type": "job", **job})
+        self.write_prometheus()
+        return job
+
+    def last_job(self):
+        return self._last_job
+
+    def format_last_job(self):
+        """Texto do detalhamento de latência do último trabalho, para a interface."""
+        job = self._last_job
+        if job is None:
+            return "Nenhum trabalho concluído ainda."
+        lines = [f"{job['kind']}: {job['total']:.2f}s no total"]
+        for name, seconds in sorted(job["spans"].items(), key=lambda item: -item[1]):
+            lines.append(f"  {name}: {seconds:.3f}s")
+        for name, value in sorted(job["counters"].items()):
+            lines.append(f"  {name}: {value}")
+        return "\n".join(lines)
+
+    def write_prometheus(self):
+        """Grava os totais no formato texto do Prometheus (substituição atômica)."""
+        with self._lock:
+            spans = {k: list(v) for k, v in self.span_totals.items()}
+            counters = dict(self.counters)
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_seconds Tempo gasto em cada etapa do pipeline.",
+            f"# TYPE {METRIC_PREFIX}_span_seconds summary",
+        ]
+        for name, (total, n) in sorted(spans.items()):
+            lines.append(f'{METRIC_PREFIX}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_span_seconds_count{{span="{name}"}} {n}')
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+
+        try:
+            os.makedirs(os.path.dirname(self.prometheus_path), exist_ok=True)
+            tmp_path = self.prometheus_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            print(f"Erro ao gravar métricas: {e}")
+
+    def _write_event(self, event):
+        event = {"ts": round(time.time(), 3), "pid": os.getpid(), **event}
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.json_log_path), exist_ok=True)
+                with open(self.json_log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                    size = f.tell()
+                if size > self.max_log_bytes:
+                    self._rotate_log()
+        except OSError:
+            pass
+
+    def _rotate_log(self):
+        """metrics.jsonl -> .1 -> .2 ...; o mais antigo é descartado."""
+        path = self.json_log_path
+        if self.log_backups <= 0:
+            os.remove(path)
+            return
+        for i in range(self.log_backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+
+def instrument_model(model):
+    """Mede o tempo do encoder e do decoder do Whisper com hooks de forward."""
+    if getattr(model, "_instrumented", False):
+        return model
+
+    def install(module, name):
+        starts = threading.local()
+
+        def pre_hook(_module, _inputs):
+            starts.value = time.perf_counter()
+
+        def post_hook(_module, _inputs, _output):
+            start = getattr(starts, "value", None)
+            if start is not None:
+                _default.record(name, time.perf_counter() - start, emit=False)
+
+        module.register_forward_pre_hook(pre_hook)
+        module.register_forward_hook(post_hook)
+
+    install(model.encoder, "encoder")
+    install(model.decoder, "decoder")
+    model._instrumented = True
+    return model
+
+
+_default = Instrumentation()
+
+span = _default.span
+record = _default.record
+count = _default.count
+log = _default.log
+current_job = _default.current_job
+begin_job = _default.begin_job
+bind_job = _default.bind_job
+job_scope = _default.job_scope
+end_job = _default.end_job
+last_job = _default.last_job
+format_last_job = _default.format_last_job
+snapshot = _default.snapshot
+totals_since = _default.totals_since
+merge = _default.merge
@@ -0,0 +1,297 @@
+"""
+Fila de trabalhos de transcrição da interface.
+
+Gravações e arquivos selecionados entram na fila com uma prioridade (gravações
+antes de arquivos em lote) e rodam com concorrência limitada. Com a inferência
+na própria interface, trabalhos do mesmo modelo não rodam ao mesmo tempo (as
+decodificações de um modelo são serializadas, ver whisper_service), então
+ocupar uma vaga com eles só atrasaria trabalhos de outros modelos; em
+processos de trabalho, cada um tem sua cópia do modelo e eles rodam juntos.
+Qualquer trabalho pode ser cancelado.
+
+Os trabalhos rodam em processos de trabalho (ver inference_worker), onde o
+cancelamento é imediato; com S2T_INFERENCE_WORKER=0, em threads da própria
+interface, onde ele só vale na próxima janela decodificada.
+
+Arquivos na fila para o mesmo modelo rodam juntos numa só thread (até
+BATCH_JOBS por vez), para que os curtos sejam decodificados em lote.
+"""
+
+import heapq
+import itertools
+import os
+from contextlib import contextmanager
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from . import inference_worker
+from .transcriber import (BatchTranscriptionThread, TranscriptionThread, WorkerBatchTranscriptionThread,
+                          WorkerTranscriptionThread)
+from .whisper_service import DEFAULT_BATCH_SIZE
+
+PRIORITY_RECORDING = 0
+PRIORITY_FILE = 10
+
+BATCH_JOBS = DEFAULT_BATCH_SIZE
+
+QUEUED = "na fila"
+RUNNING = "transcrevendo"
+DONE = "concluído"
+FAILED = "erro"
+CANCELLED = "cancelado"
+
+
+class TranscriptionJob:
+    """Um áudio a transcrever e o estado do seu trabalho."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, model_name, file_path=None, audio=None, keep_audio=False,
+                 vad=False, parallel=False, priority=PRIORITY_FILE, draft=None, metrics=None):
+        self.id = next(self._ids)
+        self.model_name = model_name
+        self.file_path = file_path
+        self.audio = audio
+        self.keep_audio = keep_audio
+        self.vad = vad
+        self.parallel = parallel
+        self.priority = priority
+        self.draft = draft          # Modelo de rascunho da decodificação especulativa
+        self.metrics = metrics      # Trabalho medido pela instrumentação, se houver
+        self.status = QUEUED
+        self.progress = 0.0
+        self.segments = []      # (início, fim, texto) entregues durante a transcrição
+        self.text = None
+        self.error = None
+        self.thread = None
+        self.batch_index = None     # Posição no lote, se rodar numa BatchTranscriptionThread
+
+    @property
+    def batchable(self):
+        """Arquivos sem modo paralelo nem rascunho podem ser decodificados em lote com outros."""
+        return (self.audio is None and self.file_path is not None and not self.parallel
+                and self.draft is None)
+
+    @property
+    def label(self):
+        if self.file_path and self.priority != PRIORITY_RECORDING:
+            return os.path.basename(self.file_path)
+        return "Gravação"
+
+    @property
+    def partial_text(self):
+        """Texto dos segmentos entregues até agora."""
+        return " ".join(text for _, _, text in self.segments if text)
+
+    @property
+    def is_active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def describe(self):
+        """Linha mostrada na lista de trabalhos."""
+        if self.status == RUNNING:
+            return f"{self.label} — {self.status} ({self.progress:.0%})"
+        return f"{self.label} — {self.status}"
+
+
+class JobScheduler(QObject):
+    """Agenda os trabalhos por prioridade (e ordem de chegada) com concorrência limitada."""
+
+    job_added = Signal(object)
+    job_started = Signal(object)
+    job_progress = Signal(object)
+    job_segment = Signal(object, float, float, str)     # Trabalho, início, fim, texto
+    job_finished = Signal(object)       # Concluído, com erro ou cancelado (ver job.status)
+
+    def __init__(self, max_concurrent=2, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self._queue = []                # heap de (prioridade, ordem, trabalho)
+        self._order = itertools.count()
+        self.running = []
+        self._held = 0
+
+    def submit(self, job):
+        heapq.heappush(self._queue, (job.priority, next(self._order), job))
+        self.job_added.emit(job)
+        self._schedule()
+        return job
+
+    @contextmanager
+    def holding(self):
+        """Adia o agendamento enquanto vários trabalhos entram na fila, para que formem lotes."""
+        self._held += 1
+        try:
+            yield
+        finally:
+            self._held -= 1
+            self._schedule()
+
+    def cancel(self, job):
+        """Cancela um trabalho na fila ou em andamento (ver o início do módulo)."""
+        if job.status == QUEUED:
+            self._queue = [entry for entry in self._queue if entry[2] is not job]
+            heapq.heapify(self._queue)
+            job.status = CANCELLED
+            self.job_finished.emit(job)
+        elif job.status == RUNNING:
+            if job.batch_index is None:
+                job.thread.cancel()
+            else:
+                job.thread.cancel(job.batch_index)
+
+    def pending(self):
+        return [job for _, _, job in sorted(self._queue)]
+
+    def _schedule(self):
+        """Inicia os próximos trabalhos cujo modelo esteja livre, respeitando o limite."""
+        if self._held:
+            return
+        # Em processos de trabalho, cada trabalho decodifica com a cópia do modelo do seu processo
+        exclusive = not inference_worker.enabled()
+        busy_models = {job.model_name for job in self.running} if exclusive else set()
+        deferred = []
+        while self._queue and self._running_threads() < self.max_concurrent:
+            entry = heapq.heappop(self._queue)
+            job = entry[2]
+            if job.model_name in busy_models:
+                deferred.append(entry)
+                continue
+            if exclusive:
+                busy_models.add(job.model_name)
+            batch = [job] + self._take_batch(job) if job.batchable else [job]
+            if len(batch) > 1:
+                self._start_batch(batch)
+            else:
+                self._start(job)
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+
+    def _running_threads(self):
+        # Os trabalhos de um lote ocupam uma única vaga
+        return len({id(job.thread) for job in self.running})
+
+    def _take_batch(self, first):
+        """Retira da fila (em ordem) os arquivos que podem rodar no mesmo lote que `first`."""
+        taken = []
+        for entry in sorted(self._queue):
+            job = entry[2]
+            if len(taken) + 1 >= BATCH_JOBS:
+                break
+            if job.batchable and job.model_name == first.model_name and job.vad == first.vad:
+                taken.append(job)
+        if taken:
+            self._queue = [entry for entry in self._queue if entry[2] not in taken]
+            heapq.heapify(self._queue)
+        return taken
+
+    def _start(self, job):
+        job.status = RUNNING
+        thread_class = WorkerTranscriptionThread if inference_worker.enabled() else TranscriptionThread
+        job.thread = thread_class(job.model_name, job.file_path, job.keep_audio, job.audio,
+                                  vad=job.vad, parallel=job.parallel, draft=job.draft)
+        job.thread.metrics = job.metrics
+        # Slots deste objeto (thread da interface): os sinais da thread de
+        # transcrição chegam enfileirados; o trabalho é achado pelo sender()
+        job.thread.progress.connect(self._on_progress)
+        job.thread.segment_ready.connect(self._on_segment)
+        job.thread.transcription_finished.connect(self._on_finished)
+        job.thread.transcription_error.connect(self._on_error)
+        job.thread.transcription_cancelled.connect(self._on_cancelled)
+        self.running.append(job)
+        job.thread.start()
+        self.job_started.emit(job)
+
+    def _start_batch(self, jobs):
+        thread_class = WorkerBatchTranscriptionThread if inference_worker.enabled() else BatchTranscriptionThread
+        thread = thread_class(jobs[0].model_name, [job.file_path for job in jobs], vad=jobs[0].vad)
+        # Num lote, os tempos vão para o trabalho medido que estiver nele
+        thread.metrics = next((job.metrics for job in jobs if job.metrics is not None), None)
+        thread.progress.connect(self._on_progress)
+        thread.item_finished.connect(self._on_item_finished)
+        thread.item_error.connect(self._on_item_error)
+        thread.item_cancelled.connect(self._on_item_cancelled)
+        for index, job in enumerate(jobs):
+            job.status = RUNNING
+            job.thread = thread
+            job.batch_index = index
+            self.running.append(job)
+        thread.start()
+        for job in jobs:
+            self.job_started.emit(job)
+
+    def _job_for_sender(self):
+        thread = self.sender()
+        return next((job for job in self.running if job.thread is thread), None)
+
+    def _batch_job(self, index):
+        thread = self.sender()
+        return next((job for job in self.running
+                     if job.thread is thread and job.batch_index == index), None)
+
+    @Slot(float)
+    def _on_progress(self, fraction):
+        # Num lote, todos os trabalhos ainda em andamento avançam juntos
+        thread = self.sender()
+        for job in [job for job in self.running if job.thread is thread]:
+            job.progress = fraction
+            self.job_progress.emit(job)
+
+    @Slot(float, float, str)
+    def _on_segment(self, start, end, text):
+        job = self._job_for_sender()
+        if job is not None:
+            job.segments.append((start, end, text))
+            self.job_segment.emit(job, start, end, text)
+
+    @Slot(str, str, bool)
+    def _on_finished(self, text, _file_path, _keep_audio):
+        self._finish(self._job_for_sender(), DONE, text=text)
+
+    @Slot(str)
+    def _on_error(self, error):
+        self._finish(self._job_for_sender(), FAILED, error=error)
+
+    @Slot()
+    def _on_cancelled(self):
+        self._finish(self._job_for_sender(), CANCELLED)
+
+    @Slot(int, str)
+    def _on_item_finished(self, index, text):
+        self._finish(self._batch_job(index), DONE, text=text)
+
+    @Slot(int, str)
+    def _on_item_error(self, index, error):
+        self._finish(self._batch_job(index), FAILED, error=error)
+
+    @Slot(int)
+    def _on_item_cancelled(self, index):
+        self._finish(self._batch_job(index), CANCELLED)
+
+    def _finish(self, job, status, text=None, error=None):
+        if job is None:
+            return
+        job.status = status
+        job.text = text
+        job.error = error
+        if status == DONE:
+            job.progress = 1.0
+        # A lista de trabalhos da janela guarda o trabalho: o áudio gravado não
+        # precisa ficar na memória depois da transcrição
+        job.audio = None
+        if job.thread is not None and hasattr(job.thread, "audio"):
+            job.thread.audio = None
+        self.running.remove(job)
+        self.job_finished.emit(job)
+        self._schedule()
+
+    def shutdown(self):
+        """Cancela tudo e espera as threads em andamento (fechamento da janela)."""
+        for _, _, job in self._queue:
+            job.status = CANCELLED
+        self._queue = []
+        threads = {id(job.thread): job.thread for job in self.running}.values()
+        for thread in threads:
+            thread.cancel()
+        for thread in threads:
+            thread.wait()
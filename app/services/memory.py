@@ -0,0 +1,63 @@
+"""Medição de memória residente (RSS) do processo atual, sem dependências extras."""
+
+import os
+import sys
+
+
+def _windows_memory_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+    return counters
+
+
+def _proc_status_bytes(field):
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def get_rss_bytes():
+    """Memória residente atual do processo, em bytes (None se indisponível)."""
+    try:
+        if sys.platform == "win32":
+            return _windows_memory_counters().WorkingSetSize
+        if os.path.exists("/proc/self/status"):
+            return _proc_status_bytes("VmRSS")
+        # macOS e outros: só há o pico disponível sem dependências extras
+        return get_peak_rss_bytes()
+    except Exception:
+        return None
+
+
+def get_peak_rss_bytes():
+    """Pico de memória residente do processo, em bytes (None se indisponível)."""
+    try:
+        if sys.platform == "win32":
+            return _windows_memory_counters().PeakWorkingSetSize
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KiB, macOS em bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
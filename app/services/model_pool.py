@@ -0,0 +1,154 @@
+"""
+Conjunto de modelos residentes, compartilhado pelas threads da interface.
+
+Os modelos carregados ficam na memória para trocas instantâneas (ex.: "tiny"
+para notas rápidas e "large-v3" para chamadas importantes). Quando a soma dos
+pesos passa do orçamento de RAM, os usados há mais tempo são descartados.
+
+O orçamento pode ser configurado pela variável de ambiente
+S2T_MODEL_BUDGET_MB (padrão: 8192).
+"""
+
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+from . import instrumentation, whisper_service
+from .memory import get_rss_bytes
+
+BUDGET_ENV = "S2T_MODEL_BUDGET_MB"
+DEFAULT_BUDGET_MB = 8192
+
+
+def model_bytes(model):
+    """Tamanho dos pesos e buffers do modelo, em bytes."""
+    import torch
+
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        # Lineares quantizados em int8: os pesos ficam empacotados, fora de parameters()
+        if isinstance(module, torch.ao.nn.quantized.modules.linear.LinearPackedParams):
+            tensors.extend(t for t in module._weight_bias() if t is not None)
+    return sum(t.numel() * t.element_size() for t in tensors if not t.is_sparse)
+
+
+class ModelPool:
+    """Modelos carregados por (nome, dispositivo), com descarte LRU sob um orçamento."""
+
+    def __init__(self, budget_bytes=None, loader=whisper_service.load_model):
+        if budget_bytes is None:
+            budget_bytes = int(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB)) * 2**20
+        self.budget_bytes = budget_bytes
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._models = OrderedDict()    # (nome, dispositivo) -> (modelo, bytes); o último é o mais recente
+        self._loading = {}              # (nome, dispositivo) -> Event de uma carga em andamento
+
+    def get(self, model_name, device=None, recent=True):
+        """
+        Retorna o modelo, carregando-o se não estiver residente. Com
+        `recent=False` (pré-carga) o modelo entra como o menos recente, então é
+        o primeiro a sair se não couber no orçamento junto dos que estão em uso.
+        """
+        if device is None:
+            device = whisper_service.get_device()
+        key = (model_name, device)
+
+        while True:
+            with self._lock:
+                if key in self._models:
+                    if recent:
+                        self._models.move_to_end(key)
+                    instrumentation.count("model_pool_hits")
+                    return self._models[key][0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Outra thread já está carregando o mesmo modelo (ex.: pré-carga);
+            # se aquela carga falhar, a próxima volta tenta de novo nesta thread.
+            loading.wait()
+
+        instrumentation.count("model_pool_misses")
+        try:
+            model = self._loader(model_name, device=device)
+            with self._lock:
+                self._models[key] = (model, model_bytes(model))
+                if not recent:
+                    self._models.move_to_end(key, last=False)
+                self._evict()
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def prefetch(self, model_name, device=None):
+        """Carrega o modelo em segundo plano, sem bloquear quem chamou."""
+        def run():
+            try:
+                self.get(model_name, device, recent=False)
+            except Exception as e:
+                instrumentation.log(f"Erro ao pré-carregar o modelo '{model_name}': {e}")
+
+        thread = threading.Thread(target=run, name=f"prefetch-{model_name}", daemon=True)
+        thread.start()
+        return thread
+
+    def is_resident(self, model_name, device=None):
+        with self._lock:
+            return any(name == model_name and (device is None or dev == device)
+                       for name, dev in self._models)
+
+    def _evict(self):
+        """Descarta os modelos menos usados até caber no orçamento (mantém o mais recente)."""
+        evicted = []
+        while len(self._models) > 1 and self._total_bytes() > self.budget_bytes:
+            (name, device), _ = self._models.popitem(last=False)
+            evicted.append(name)
+        if evicted:
+            # Só libera de fato quando ninguém mais usa o modelo (ex.: transcrição em andamento)
+            gc.collect()
+            instrumentation.count("model_pool_evictions", len(evicted))
+            instrumentation.log(f"Modelos descartados da memória: {', '.join(evicted)}")
+
+    def _total_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+
+    def stats(self):
+        with self._lock:
+            models = [{"name": name, "device": device, "bytes": size}
+                      for (name, device), (_, size) in self._models.items()]
+        return {
+            "models": models,
+            "model_bytes": sum(m["bytes"] for m in models),
+            "budget_bytes": self.budget_bytes,
+            "rss_bytes": get_rss_bytes(),
+        }
+
+    def format_stats(self):
+        """Resumo curto para a interface (modelos residentes e memória do processo)."""
+        stats = self.stats()
+        names = ", ".join(m["name"] for m in reversed(stats["models"])) or "nenhum"
+        rss = stats["rss_bytes"]
+        rss_text = f"{rss / 2**30:.1f} GB" if rss else "?"
+        return f"Modelos na memória: {names} | RAM do processo: {rss_text}"
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool():
+    """Conjunto de modelos compartilhado pelo processo (criado no primeiro uso)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+        return _pool
@@ -0,0 +1,127 @@
+"""
+Checkpoints do Whisper convertidos para carga com memória mapeada (mmap).
+
+O `.pt` original do Whisper é lido e desserializado inteiro a cada
+`whisper.load_model`. Aqui ele é convertido uma única vez para um checkpoint
+do torch em formato zip, já em float32 (o tipo final dos pesos), e as cargas
+seguintes usam `torch.load(mmap=True)`: os tensores apontam direto para as
+páginas do arquivo, que só são lidas do disco no primeiro uso e ficam no cache
+de páginas do sistema, compartilhadas entre processos (lote, servidor...).
+
+    ~/.cache/speechtotext/models/<modelo>.v1.pt
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from . import instrumentation
+from .result_cache import DEFAULT_CACHE_DIR
+
+MODELS_DIR = os.path.join(DEFAULT_CACHE_DIR, "models")
+FORMAT_VERSION = 1
+
+_meta_lock = threading.Lock()   # Ver _parameters_on_meta
+
+
+def converted_path(model_name):
+    # Para checkpoints passados por caminho, só o nome do arquivo
+    return os.path.join(MODELS_DIR, f"{os.path.basename(model_name)}.v{FORMAT_VERSION}.pt")
+
+
+def is_converted(model_name):
+    return os.path.exists(converted_path(model_name))
+
+
+def convert_checkpoint(model_name, download_root=None):
+    """
+    Converte o checkpoint de `model_name` (nome oficial ou caminho de um `.pt`)
+    para o formato mapeável, baixando o original se preciso. Não faz nada se a
+    conversão já existir. Retorna o caminho do arquivo convertido.
+    """
+    import torch
+    import whisper
+
+    path = converted_path(model_name)
+    if os.path.exists(path):
+        return path
+
+    if model_name in whisper._MODELS:
+        root = download_root or os.path.join(os.path.expanduser("~"), ".cache", "whisper")
+        source = whisper._download(whisper._MODELS[model_name], root, False)
+        alignment_heads = whisper._ALIGNMENT_HEADS[model_name].decode("ascii")
+    elif os.path.isfile(model_name):
+        source, alignment_heads = model_name, None
+    else:
+        raise RuntimeError(f"Modelo {model_name} não encontrado; disponíveis: {whisper.available_models()}")
+
+    with instrumentation.span("model_convert", model=model_name):
+        checkpoint = torch.load(source, map_location="cpu", weights_only=True)
+        # Os pesos publicados são float16, mas o Whisper os guarda em float32
+        # depois de carregar; convertendo aqui, a carga não precisa copiar nada.
+        state = {name: tensor.float().contiguous() if tensor.is_floating_point() else tensor.contiguous()
+                 for name, tensor in checkpoint["model_state_dict"].items()}
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.save({"dims": checkpoint["dims"], "model_state_dict": state,
+                    "alignment_heads": alignment_heads}, tmp_path)
+        os.replace(tmp_path, path)
+
+    instrumentation.log(f"Modelo '{model_name}' convertido para carga mapeada: {path}")
+    return path
+
+
+def load_model(model_name, device="cpu", download_root=None):
+    """
+    Carrega o modelo a partir do checkpoint convertido (convertendo na primeira
+    vez). Os pesos ficam mapeados do arquivo; em GPU são copiados para o
+    dispositivo normalmente.
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    path = convert_checkpoint(model_name, download_root)
+    with instrumentation.span("model_mmap", model=model_name):
+        checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+
+        # Parâmetros criados no dispositivo "meta": nada é alocado nem
+        # inicializado à toa; `assign=True` adota os tensores mapeados.
+        dims = ModelDimensions(**checkpoint["dims"])
+        with _parameters_on_meta():
+            model = Whisper(dims)
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+
+        if checkpoint.get("alignment_heads"):
+            model.set_alignment_heads(checkpoint["alignment_heads"].encode("ascii"))
+    return model.to(device)
+
+
+@contextmanager
+def _parameters_on_meta():
+    """
+    Move para o dispositivo "meta" cada parâmetro registrado, antes da
+    inicialização aleatória. Os buffers (máscara causal, cabeças de
+    alinhamento) continuam na CPU, como no construtor original.
+
+    O `torch.device("meta")` não serve: o construtor do Whisper chama
+    `to_sparse()`, que não existe para tensores "meta". Por isso o
+    `register_parameter` é trocado, o que vale para o processo todo: a troca
+    é serializada pelo lock, e só a thread que a fez tem os parâmetros
+    movidos (módulos criados ao mesmo tempo em outras threads não mudam).
+    """
+    import torch
+
+    owner = threading.get_ident()
+    with _meta_lock:
+        original = torch.nn.Module.register_parameter
+
+        def register_parameter(module, name, param):
+            if param is not None and threading.get_ident() == owner:
+                param = torch.nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)
+            original(module, name, param)
+
+        torch.nn.Module.register_parameter = register_parameter
+        try:
+            yield
+        finally:
+            torch.nn.Module.register_parameter = original
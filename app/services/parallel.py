@@ -0,0 +1,313 @@
+"""
+Transcrição paralela de arquivos longos.
+
+O áudio é dividido em blocos nas pausas da fala (com uma pequena sobreposição),
+os blocos são transcritos ao mesmo tempo por processos de trabalho (cada um com
+seu modelo e um limite de threads do torch) e os resultados são costurados na
+ordem, descartando o texto repetido nas sobreposições.
+
+Cada processo carrega uma cópia inteira do modelo: sem `workers`, o número de
+processos é o orçamento de RAM dos modelos (S2T_MODEL_BUDGET_MB, ver
+model_pool) dividido pelo tamanho do modelo, ou DEFAULT_WORKERS se o tamanho
+não for conhecido.
+
+Uso pela linha de comando:
+    python -m app.services.parallel arquivo.wav --model small --workers 4 --compare
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from . import instrumentation, result_cache, whisper_service
+from .audio_utils import WHISPER_SAMPLE_RATE
+from .vad import speech_mask, strip_silence
+
+DEFAULT_WORKERS = 2
+DEFAULT_CHUNK_SECONDS = 120.0
+DEFAULT_OVERLAP_SECONDS = 2.0
+SEARCH_SECONDS = 15.0   # Janela em volta do corte ideal onde procuramos uma pausa
+PROGRESS_POLL_SECONDS = 0.5     # Intervalo máximo entre chamadas de `progress` (ver transcribe_parallel)
+
+# Modelo de cada processo de trabalho
+_worker_model = None
+
+
+def split_at_silence(audio, sr=WHISPER_SAMPLE_RATE, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                     overlap_seconds=DEFAULT_OVERLAP_SECONDS, strict=False):
+    """
+    Divide o áudio em blocos de ~`chunk_seconds`, cortando na pausa mais longa
+    perto de cada corte ideal. Com `strict`, `chunk_seconds` é um máximo: a
+    pausa só é procurada antes do corte ideal, e nenhum bloco (sem contar a
+    sobreposição) passa dele, como a janela de 30 s do Whisper exige.
+
+    Retorna (cortes, blocos): `cortes` são as fronteiras "oficiais" entre blocos
+    e `blocos` os intervalos (início, fim) em amostras já com a sobreposição.
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sr)
+    if total <= chunk:
+        return [0, total], [(0, total)]
+
+    mask, frame_size = speech_mask(audio, sr)
+    silent = ~mask
+    # A busca nunca passa de meio bloco, para que cada corte avance
+    search = int(min(SEARCH_SECONDS * sr, chunk / 2)) // frame_size
+
+    cuts = [0]
+    while total - cuts[-1] > chunk:
+        ideal = (cuts[-1] + chunk) // frame_size
+        lo, hi = ideal - search, min(len(silent), ideal if strict else ideal + search)
+        cut = ideal * frame_size
+        if hi > lo and silent[lo:hi].any():
+            # Centro da sequência de silêncio mais longa dentro da janela de busca
+            window = np.concatenate([[False], silent[lo:hi], [False]])
+            changes = np.flatnonzero(window[1:] != window[:-1])
+            starts, ends = changes[0::2], changes[1::2]
+            best = np.argmax(ends - starts)
+            cut = (lo + (starts[best] + ends[best]) // 2) * frame_size
+        elif hi > lo:
+            # Nenhuma pausa clara (ex.: ruído de fundo alto): o quadro mais baixo
+            # da janela, em vez de cortar no ponto exato, quase sempre no meio de uma palavra
+            frames = audio[lo * frame_size:hi * frame_size].reshape(hi - lo, frame_size)
+            quietest = int(np.argmin(np.mean(np.square(frames, dtype=np.float32), axis=1)))
+            cut = (lo + quietest) * frame_size + frame_size // 2
+        cuts.append(int(cut))
+    cuts.append(total)
+
+    overlap = int(overlap_seconds * sr)
+    chunks = [(max(0, cuts[i] - overlap), min(total, cuts[i + 1] + overlap)) for i in range(len(cuts) - 1)]
+    return cuts, chunks
+
+
+def _init_worker(model_name, device, threads):
+    """Inicializador dos processos: limita as threads do torch e carrega o modelo uma vez."""
+    global _worker_model
+    import torch
+
+    # Se quem criou o pool morrer (ex.: processo de trabalho da interface
+    # morto num cancelamento), o processo sai em vez de esperar para sempre
+    # na fila de chamadas com um modelo inteiro na memória
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=_exit_with_parent, args=(parent,), name="parent-watchdog", daemon=True).start()
+
+    if threads:
+        torch.set_num_threads(threads)
+    _worker_model = whisper_service.load_model(model_name, device)
+
+
+def _exit_with_parent(parent):
+    parent.join()
+    os._exit(1)
+
+
+def default_workers(model_size=None, cpu_count=None):
+    """Processos que cabem no orçamento de RAM dos modelos (um modelo inteiro em cada)."""
+    from .model_pool import BUDGET_ENV, DEFAULT_BUDGET_MB
+
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if not model_size:
+        return min(DEFAULT_WORKERS, cpu_count)
+    budget = int(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB)) * 2**20
+    return max(1, min(cpu_count, budget // model_size))
+
+
+def _terminate_pool(pool):
+    """Descarta os blocos na fila e encerra os processos do pool, mesmo no meio de um bloco."""
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _transcribe_chunk(index, offset_seconds, audio, language, options=None):
+    """Executado nos processos de trabalho: transcreve um bloco e desloca os tempos."""
+    start = time.perf_counter()
+    result = whisper_service.transcribe(_worker_model, audio, language=language, **(options or {}))
+    segments = [
+        {"start": s["start"] + offset_seconds, "end": s["end"] + offset_seconds, "text": s["text"].strip()}
+        for s in result.get("segments", [])
+    ]
+    return index, segments, time.perf_counter() - start
+
+
+def _dedupe_words(previous_text, text, max_words=12):
+    """Remove do início de `text` as palavras que repetem o final de `previous_text`."""
+    prev_words = previous_text.split()[-max_words:]
+    words = text.split()
+    normalize = lambda w: w.lower().strip(".,!?;:")
+    for n in range(min(len(prev_words), len(words)), 0, -1):
+        if [normalize(w) for w in prev_words[-n:]] == [normalize(w) for w in words[:n]]:
+            return " ".join(words[n:])
+    return text
+
+
+def stitch_segments(chunk_segments, cuts):
+    """
+    Junta os segmentos dos blocos na ordem. Cada segmento fica com o bloco
+    "dono" do seu ponto médio (pelos cortes), e repetições de palavras na
+    emenda são removidas.
+    """
+    merged = []
+    for i, segments in enumerate(chunk_segments):
+        lo, hi = cuts[i] / WHISPER_SAMPLE_RATE, cuts[i + 1] / WHISPER_SAMPLE_RATE
+        owned = [s for s in segments if lo <= (s["start"] + s["end"]) / 2 < hi or
+                 (i == len(chunk_segments) - 1 and (s["start"] + s["end"]) / 2 >= hi)]
+        if merged and owned:
+            owned[0] = dict(owned[0], text=_dedupe_words(merged[-1]["text"], owned[0]["text"]))
+        merged.extend(s for s in owned if s["text"])
+    return merged
+
+
+def transcribe_parallel(source, model_name, workers=None, threads_per_worker=None,
+                        language=whisper_service.DEFAULT_LANGUAGE, device=None,
+                        chunk_seconds=DEFAULT_CHUNK_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                        progress=None, options=None, vad=False, cache=None, model_size=None):
+    """
+    Transcreve um áudio longo em paralelo.
+
+    `progress(fração)`, se dado, é chamado com a fração do áudio já
+    transcrita a cada bloco concluído e, entre um e outro, a cada
+    PROGRESS_POLL_SECONDS; uma exceção levantada por ele (ex.: cancelamento)
+    encerra na hora os processos, inclusive os que estão no meio de um bloco.
+
+    `options` (opções de decodificação, ex.: do perfil da máquina), `vad` e
+    `cache` (ResultCache) valem como em whisper_service.transcribe; com `vad`,
+    os silêncios saem antes da divisão em blocos. `model_size` (bytes) limita
+    os processos ao orçamento de RAM quando `workers` não é dado.
+
+    Retorna um resultado no formato do Whisper (text, segments, language) com a
+    chave extra "parallel": blocos, processos, tempo total e o ganho estimado
+    sobre a soma dos tempos dos blocos.
+    """
+    audio = whisper_service.load_audio(source) if isinstance(source, str) else source
+    options = dict(options or {})
+    if cache is not None:
+        key = result_cache.make_key(audio, model_name, language, dict(options, vad=vad, parallel=True))
+        result = cache.get(key)
+        if result is not None:
+            instrumentation.count("result_cache_hits")
+            instrumentation.log(f"Resultado encontrado no cache ({cache.hits} acerto(s), {cache.misses} falha(s))")
+            return result
+
+    time_map = vad_stats = None
+    if vad:
+        with instrumentation.span("vad"):
+            audio, time_map, vad_stats = strip_silence(audio)
+
+    cpu_count = os.cpu_count() or 1
+    cuts, chunks = split_at_silence(audio, WHISPER_SAMPLE_RATE, chunk_seconds, overlap_seconds)
+    workers = min(workers or default_workers(model_size, cpu_count), len(chunks))
+    threads_per_worker = threads_per_worker or max(1, cpu_count // workers)
+    device = device or whisper_service.get_device()
+
+    instrumentation.log(f"Transcrição paralela: {len(chunks)} bloco(s), {workers} processo(s), "
+                        f"{threads_per_worker} thread(s) cada",
+                        chunks=len(chunks), workers=workers, threads_per_worker=threads_per_worker)
+
+    start = time.perf_counter()
+    chunk_segments = [None] * len(chunks)
+    chunk_times = [0.0] * len(chunks)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(model_name, device, threads_per_worker)) as pool:
+        futures = [
+            pool.submit(_transcribe_chunk, i, s / WHISPER_SAMPLE_RATE, audio[s:e], language, options)
+            for i, (s, e) in enumerate(chunks)
+        ]
+        done_samples, total_samples = 0, sum(e - s for s, e in chunks)
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, segments, elapsed = future.result()
+                    chunk_segments[index] = segments
+                    chunk_times[index] = elapsed
+                    done_samples += chunks[index][1] - chunks[index][0]
+                if progress is not None:
+                    progress(done_samples / total_samples)
+        except BaseException:
+            # Sem isto, sair do `with` esperaria os blocos em andamento (minutos cada)
+            _terminate_pool(pool)
+            raise
+    wall = time.perf_counter() - start
+
+    segments = stitch_segments(chunk_segments, cuts)
+    stats = {
+        "chunks": len(chunks),
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "wall_seconds": round(wall, 2),
+        "chunk_seconds_total": round(sum(chunk_times), 2),
+        # Soma dos tempos dos blocos / tempo real (inclui a carga dos modelos)
+        "estimated_speedup": round(sum(chunk_times) / wall, 2) if wall else None,
+    }
+    instrumentation.log(f"Transcrição paralela concluída em {wall:.1f}s "
+                        f"(ganho estimado: {stats['estimated_speedup']}x)", **stats)
+    result = {
+        "text": " ".join(s["text"] for s in segments),
+        "segments": segments,
+        "language": language,
+        "parallel": stats,
+    }
+    if time_map is not None:
+        result = time_map.remap_result(result)
+        result["vad"] = vad_stats
+    if cache is not None:
+        instrumentation.count("result_cache_misses")
+        cache.put(key, result)
+    return result
+
+
+def compare_with_sequential(source, model_name, workers=None, language=whisper_service.DEFAULT_LANGUAGE):
+    """Roda os caminhos sequencial e paralelo no mesmo áudio e mede o ganho real."""
+    audio = whisper_service.load_audio(source) if isinstance(source, str) else source
+
+    model = whisper_service.load_model(model_name)
+    start = time.perf_counter()
+    whisper_service.transcribe(model, audio, language=language)
+    sequential = time.perf_counter() - start
+    del model
+
+    result = transcribe_parallel(audio, model_name, workers, language=language)
+    parallel = result["parallel"]["wall_seconds"]
+    result["parallel"]["sequential_seconds"] = round(sequential, 2)
+    result["parallel"]["speedup"] = round(sequential / parallel, 2) if parallel else None
+    instrumentation.log(f"Sequencial: {sequential:.1f}s, paralelo: {parallel:.1f}s "
+                        f"(ganho: {result['parallel']['speedup']}x)",
+                        sequential_seconds=round(sequential, 2), parallel_seconds=parallel)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcrição paralela de um arquivo longo.")
+    parser.add_argument("file", help="Arquivo de áudio")
+    parser.add_argument("-m", "--model", default="small", help="Modelo do Whisper")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help=f"Processos (padrão: {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-seconds", type=float, default=DEFAULT_CHUNK_SECONDS)
+    parser.add_argument("--language", default=whisper_service.DEFAULT_LANGUAGE)
+    parser.add_argument("--compare", action="store_true", help="Mede também o caminho sequencial")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        result = compare_with_sequential(args.file, args.model, args.workers, args.language)
+    else:
+        result = transcribe_parallel(args.file, args.model, args.workers, language=args.language,
+                                     chunk_seconds=args.chunk_seconds)
+    print(result["text"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Modelos quantizados em int8 para CPU (quantização dinâmica do torch).
+
+Um nome com o sufixo "-int8" (ex.: "medium-int8") carrega o modelo base com
+as camadas lineares (atenção e MLP, quase todos os pesos) quantizadas para
+int8: os pesos ocupam 1/4 da memória e as multiplicações usam as instruções
+inteiras da CPU. As ativações continuam em float32, quantizadas a cada
+passada. O nome com sufixo vale em todo lugar que recebe um nome de modelo
+(interface, conjunto de modelos, lote, servidor, python -m app.tune).
+
+O modelo quantizado é guardado já pronto em ~/.cache/speechtotext/models,
+para não precisar ler os pesos float32 e quantizar de novo a cada carga:
+as dimensões e o state_dict (carregados com `weights_only=True`), num
+arquivo por versão do torch, já que o formato dos pesos empacotados é dele.
+"""
+
+import os
+import time
+from importlib import metadata
+
+from . import instrumentation, model_store
+
+QUANTIZED_SUFFIX = "-int8"
+FORMAT_VERSION = 2
+
+
+def is_quantized(model_name):
+    return model_name.endswith(QUANTIZED_SUFFIX)
+
+
+def base_model_name(model_name):
+    """Nome do modelo float32 correspondente ("medium-int8" -> "medium")."""
+    return model_name[:-len(QUANTIZED_SUFFIX)] if is_quantized(model_name) else model_name
+
+
+def quantized_path(model_name):
+    base = os.path.basename(base_model_name(model_name))
+    # Sem importar o torch (a interface só verifica se o arquivo existe)
+    torch_version = metadata.version("torch").replace("+", "-")
+    return os.path.join(model_store.MODELS_DIR, f"{base}.int8.v{FORMAT_VERSION}.torch{torch_version}.pt")
+
+
+def quantize_model(model):
+    """
+    Quantiza em int8 (no lugar) as camadas lineares de um modelo do Whisper em
+    CPU. Camadas com pesos no dispositivo "meta" (ver
+    model_store._parameters_on_meta) viram camadas int8 vazias, à espera de
+    `load_state_dict`.
+    """
+    import torch
+
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, torch.nn.Linear) and child.weight.is_meta:
+                setattr(module, name, torch.ao.nn.quantized.dynamic.Linear(
+                    child.in_features, child.out_features, bias_=child.bias is not None, dtype=torch.qint8))
+            # A quantização dinâmica só troca o nn.Linear exato; o Linear do Whisper
+            # é uma subclasse (que só converte o dtype dos pesos, inútil em float32)
+            elif isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.Linear(child.in_features, child.out_features,
+                                         bias=child.bias is not None, device="meta")
+                linear.weight, linear.bias = child.weight, child.bias
+                setattr(module, name, linear)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8,
+                                                  inplace=True)
+
+
+def load_model(model_name, cache=True):
+    """
+    Carrega o modelo quantizado (sempre em CPU). Com `cache`, usa o arquivo
+    já quantizado ou o cria a partir do checkpoint mapeado (ver model_store).
+    """
+    import torch
+
+    base = base_model_name(model_name)
+    path = quantized_path(base)
+    if cache and os.path.exists(path):
+        try:
+            return _load_quantized(path)
+        except Exception as e:
+            instrumentation.log(f"Modelo quantizado em cache inválido ({e}); quantizando de novo")
+
+    model = None
+    if cache:
+        try:
+            model = model_store.load_model(base, device="cpu")
+        except Exception as e:
+            instrumentation.log(f"Carga mapeada indisponível ({e}); usando o checkpoint original")
+    if model is None:
+        import whisper
+        model = whisper.load_model(base, device="cpu")
+    with instrumentation.span("model_quantize", model=base):
+        quantize_model(model)
+
+    if cache:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.save({"dims": vars(model.dims), "model_state_dict": model.state_dict(),
+                    "alignment_heads": model.alignment_heads.to_dense()}, tmp_path)
+        os.replace(tmp_path, path)
+        instrumentation.log(f"Modelo '{base}' quantizado em int8: {path}")
+    return model
+
+
+def _load_quantized(path):
+    """Recria o modelo int8 salvo por `load_model` a partir das dimensões e do state_dict."""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    with model_store._parameters_on_meta():
+        model = quantize_model(Whisper(ModelDimensions(**checkpoint["dims"])))
+    # `assign=True` adota os tensores mapeados das camadas que não são int8
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    model.register_buffer("alignment_heads", checkpoint["alignment_heads"].to_sparse(), persistent=False)
+    return model
+
+
+def compare_with_fp32(model_name, audios, reference=None, language=None):
+    """
+    Transcreve `audios` (arrays 16 kHz) com o modelo float32 e com o int8 e
+    retorna tempo, tamanho dos pesos e WER de cada um. Sem `reference` (texto
+    correto dos áudios, concatenado), a saída do float32 é a referência, e o
+    WER do int8 mede só o quanto a quantização mudou o texto.
+    """
+    from . import encoder_cache, whisper_service
+    from .model_pool import model_bytes
+    from .tuning import word_error_rate
+
+    base = base_model_name(model_name)
+    language = language or whisper_service.DEFAULT_LANGUAGE
+    results = {}
+    for name in (base, base + QUANTIZED_SUFFIX):
+        model = whisper_service.load_model(name, device="cpu")
+        # Sem o cache do encoder: o aquecimento usa o mesmo áudio da medida
+        with encoder_cache.disabled():
+            whisper_service.transcribe(model, audios[0], language, temperature=0.0)
+            start = time.perf_counter()
+            text = " ".join(whisper_service.transcribe(model, audio, language, temperature=0.0)
+                            .get("text", "").strip() for audio in audios)
+            seconds = time.perf_counter() - start
+        if reference is None:
+            reference = text
+        results[name] = {"seconds": round(seconds, 3), "weights_mb": round(model_bytes(model) / 2**20, 1),
+                         "wer": round(word_error_rate(reference, text), 4)}
+        del model
+
+    fp32, int8 = results[base], results[base + QUANTIZED_SUFFIX]
+    return {
+        "fp32": fp32,
+        "int8": int8,
+        "wer_delta": round(int8["wer"] - fp32["wer"], 4),
+        "speedup": round(fp32["seconds"] / int8["seconds"], 2) if int8["seconds"] else None,
+        "compared_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
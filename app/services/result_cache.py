@@ -0,0 +1,136 @@
+"""
+Cache persistente de resultados de transcrição (SQLite).
+
+A chave é o hash do PCM decodificado (16 kHz mono float32) combinado com o
+modelo, o idioma e as opções de decodificação; o valor é o resultado completo
+do Whisper (texto e segmentos). Entradas antigas ou acima do limite de tamanho
+são removidas (as menos usadas primeiro).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "speechtotext")
+DEFAULT_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "results.sqlite3")
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 90
+HASH_BLOCK_SAMPLES = 2**20
+
+
+def audio_hash(audio):
+    """Hash SHA-256 do PCM (array float32)."""
+    import numpy as np
+    # Em pedaços: a gravação pode ser um memmap de horas, que não deve ser copiado inteiro
+    digest = hashlib.sha256()
+    for start in range(0, len(audio), HASH_BLOCK_SAMPLES):
+        digest.update(np.ascontiguousarray(audio[start:start + HASH_BLOCK_SAMPLES], dtype=np.float32))
+    return digest.hexdigest()
+
+
+def make_key(audio, model_name, language, options):
+    """Chave do cache: PCM + modelo + idioma + opções de decodificação."""
+    params = json.dumps({"model": model_name, "language": language, "options": options},
+                        sort_keys=True, default=str)
+    return hashlib.sha256((audio_hash(audio) + params).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Cache de resultados em SQLite, seguro para várias threads e processos."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        """
+        Conexão de uma operação, numa transação, e fechada ao sair (o `with`
+        de uma conexão do sqlite3 só faz commit, não fecha o arquivo). Cada
+        trabalho roda numa thread nova, então não vale guardar uma por thread.
+        """
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def get(self, key):
+        """Retorna o resultado salvo para `key`, ou None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Salva um resultado e aplica a política de remoção."""
+        value = json.dumps(result, ensure_ascii=False, default=float)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM results WHERE accessed < ?", (now - self.max_age,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Remove as menos usadas até voltar ao limite
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+    def stats(self):
+        """Contadores de acertos/falhas desta sessão e ocupação do cache."""
+        with self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Instância compartilhada do cache no caminho padrão."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
@@ -0,0 +1,330 @@
+"""
+Decodificação especulativa: um modelo pequeno (rascunho, ex.: "tiny") propõe
+alguns tokens e o modelo escolhido (ex.: "large-v3") confere todos numa só
+passada do decoder.
+
+Cada proposta é aceita enquanto coincide com o token que o modelo grande
+escolheria (busca gulosa, com os mesmos filtros do Whisper); no primeiro
+desacordo fica o token do modelo grande. O texto sai, portanto, igual ao da
+decodificação gulosa do modelo grande, só que com menos passadas dele: o
+ganho depende de quantas propostas são aceitas.
+
+O decoder do Whisper só aceita vários tokens de uma vez na primeira passada
+(a máscara causal não considera o cache), então aqui ele é reimplementado
+com os mesmos pesos e um cache de chaves/valores que pode ser rebobinado.
+"""
+
+from contextlib import nullcontext
+
+from . import encoder_cache, instrumentation
+from .audio_utils import WHISPER_SAMPLE_RATE
+
+DEFAULT_DRAFT_MODEL = "tiny"
+DRAFT_TOKENS = 5        # Tokens propostos pelo rascunho a cada passada do modelo grande
+
+# Mesmos limiares usados pelo whisper_service para refazer uma janela com fallback
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class SpeculativeStats:
+    """Contadores de uma transcrição especulativa."""
+
+    def __init__(self, draft_name=None):
+        self.draft = draft_name
+        self.proposed = 0       # Tokens propostos pelo rascunho
+        self.accepted = 0       # Propostas confirmadas pelo modelo grande
+        self.tokens = 0         # Tokens gerados no total
+        self.target_passes = 0  # Passadas do decoder do modelo grande
+        self.fallbacks = 0      # Janelas refeitas pelo transcribe normal
+
+    def as_dict(self):
+        return {
+            "draft": self.draft,
+            "proposed": self.proposed,
+            "accepted": self.accepted,
+            "accept_rate": round(self.accepted / self.proposed, 3) if self.proposed else 0.0,
+            "tokens": self.tokens,
+            "target_passes": self.target_passes,
+            # Sem rascunho seria uma passada por token: é o ganho no decoder
+            "tokens_per_pass": round(self.tokens / self.target_passes, 2) if self.target_passes else 0.0,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def check_compatible(model, draft):
+    """Levanta ValueError se o rascunho não puder propor tokens para o modelo."""
+    if model.is_multilingual != draft.is_multilingual:
+        raise ValueError("O modelo de rascunho precisa ter o mesmo vocabulário (multilíngue ou só inglês)")
+
+
+class _CachedDecoder:
+    """
+    Decoder do Whisper com cache próprio de chaves/valores: aceita vários
+    tokens por passada (com a máscara causal deslocada pelo cache) e pode
+    voltar a um comprimento anterior, descartando tokens rejeitados.
+    """
+
+    def __init__(self, model, audio_features):
+        self.decoder = model.decoder
+        self.length = 0
+        self._self_kv = [None] * len(self.decoder.blocks)
+        self._cross_kv = [(block.cross_attn.key(audio_features), block.cross_attn.value(audio_features))
+                          for block in self.decoder.blocks]
+        self._dtype = audio_features.dtype
+
+    def feed(self, tokens):
+        """Processa `tokens` (lista de ids) e retorna os logits de cada posição (n, vocabulário)."""
+        import torch
+
+        decoder = self.decoder
+        n = len(tokens)
+        device = decoder.token_embedding.weight.device
+        x = decoder.token_embedding(torch.tensor([tokens], device=device))
+        x = (x + decoder.positional_embedding[self.length:self.length + n]).to(self._dtype)
+
+        # A posição i enxerga todo o cache e os novos tokens até ela mesma
+        mask = None
+        if n > 1:
+            mask = torch.ones(n, self.length + n, dtype=torch.bool, device=device).tril(self.length)
+
+        for i, block in enumerate(decoder.blocks):
+            h = block.attn_ln(x)
+            k, v = block.attn.key(h), block.attn.value(h)
+            if self._self_kv[i] is not None:
+                k = torch.cat([self._self_kv[i][0], k], dim=1)
+                v = torch.cat([self._self_kv[i][1], v], dim=1)
+            self._self_kv[i] = (k, v)
+            x = x + block.attn.out(_attention(block.attn.query(h), k, v, block.attn.n_head, mask))
+
+            h = block.cross_attn_ln(x)
+            k, v = self._cross_kv[i]
+            x = x + block.cross_attn.out(_attention(block.cross_attn.query(h), k, v, block.cross_attn.n_head))
+            x = x + block.mlp(block.mlp_ln(x))
+
+        x = decoder.ln(x)
+        self.length += n
+        return (x @ decoder.token_embedding.weight.to(x.dtype).T).float()[0]
+
+    def truncate(self, length):
+        """Volta o cache para os primeiros `length` tokens."""
+        if length < self.length:
+            self._self_kv = [(k[:, :length], v[:, :length]) for k, v in self._self_kv]
+            self.length = length
+
+
+def _attention(q, k, v, n_head, mask=None):
+    import torch.nn.functional as F
+
+    batch, n_ctx, n_state = q.shape
+    q = q.view(batch, n_ctx, n_head, -1).transpose(1, 2)
+    k = k.view(batch, k.shape[1], n_head, -1).transpose(1, 2)
+    v = v.view(batch, v.shape[1], n_head, -1).transpose(1, 2)
+    out = F.scaled_dot_product_attention(q, k, v, attn_mask=mask)
+    return out.transpose(1, 2).reshape(batch, n_ctx, n_state)
+
+
+class _TokenMap:
+    """
+    Converte ids de um tokenizador para outro. O texto usa os mesmos ids; os
+    tokens especiais podem estar deslocados (o large-v3 tem um idioma a mais).
+    """
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self._special = {}
+
+    def __call__(self, token):
+        if token < self.source.eot:
+            return token
+        if token >= self.source.timestamp_begin:
+            return token - self.source.timestamp_begin + self.target.timestamp_begin
+        if token not in self._special:
+            name = self.source.encoding.decode_single_token_bytes(token)
+            self._special[token] = self.target.encoding.encode_single_token(name)
+        return self._special[token]
+
+
+def _greedy_token(logits, prefix, filters):
+    """Aplica os filtros do Whisper aos logits de uma posição e escolhe o token (e seu logprob)."""
+    import torch
+    import torch.nn.functional as F
+
+    logits = logits.clone()[None]
+    tokens = torch.tensor([prefix], device=logits.device)
+    for logit_filter in filters:
+        logit_filter.apply(logits, tokens)
+    token = int(logits[0].argmax())
+    return token, float(F.log_softmax(logits[0], dim=-1)[token])
+
+
+def decode_window(model, draft, audio, language, prompt=None, draft_tokens=DRAFT_TOKENS, stats=None,
+                  fp16=False):
+    """
+    Decodifica até 30 s de áudio (16 kHz) com o rascunho propondo tokens.
+    Retorna um `DecodingResult` com os mesmos tokens da decodificação gulosa
+    (temperatura 0) de `model` para a mesma janela e o mesmo prompt.
+    """
+    import torch
+    import whisper
+    from whisper.decoding import DecodingResult, DecodingTask
+    from whisper.utils import compression_ratio
+
+    stats = stats if stats is not None else SpeculativeStats()
+    options = whisper.DecodingOptions(task="transcribe", language=language, temperature=0.0,
+                                      prompt=prompt, fp16=fp16)
+    task = DecodingTask(model, options)
+    draft_task = DecodingTask(draft, options)
+    tokenizer, draft_tokenizer = task.tokenizer, draft_task.tokenizer
+    to_draft = _TokenMap(tokenizer, draft_tokenizer)
+    to_target = _TokenMap(draft_tokenizer, tokenizer)
+
+    with torch.no_grad():
+        padded = whisper.pad_or_trim(torch.from_numpy(audio))
+        dtype = torch.float16 if fp16 else torch.float32
+        features = model.encoder(encoder_cache.log_mel_spectrogram(padded, model.dims.n_mels)
+                                 .to(model.device, dtype)[None])
+        draft_features = draft.encoder(encoder_cache.log_mel_spectrogram(padded, draft.dims.n_mels)
+                                       .to(draft.device, dtype)[None])
+        target = _CachedDecoder(model, features)
+        proposer = _CachedDecoder(draft, draft_features)
+
+        tokens = list(task.initial_tokens)
+        draft_seq = list(draft_task.initial_tokens)
+        pending = list(tokens)            # Tokens ainda não processados pelo modelo grande
+        sample_begin = len(tokens)
+        sum_logprob = 0.0
+        no_speech_prob = float("nan")
+        finished = False
+
+        while not finished:
+            sampled = len(tokens) - sample_begin
+            n_propose = min(draft_tokens, task.sample_len - sampled - 1, task.n_ctx - len(tokens) - 1)
+
+            # Rascunho: propõe até `n_propose` tokens, um por passada (barata)
+            proposals = []
+            draft_pending = draft_seq[proposer.length:]
+            for _ in range(max(0, n_propose)):
+                logits = proposer.feed(draft_pending)[-1]
+                token, _ = _greedy_token(logits, draft_seq, draft_task.logit_filters)
+                draft_seq.append(token)
+                proposals.append(token)
+                draft_pending = [token]
+                if token == draft_tokenizer.eot:
+                    break
+
+            # Modelo grande: confere todas as propostas numa passada
+            proposed = [to_target(t) for t in proposals]
+            fed_before = target.length
+            logits = target.feed(pending + proposed)
+            stats.target_passes += 1
+            if fed_before == 0 and tokenizer.no_speech is not None:
+                no_speech_prob = float(logits[task.sot_index].softmax(-1)[tokenizer.no_speech])
+            logits = logits[len(pending) - 1:]
+
+            accepted = 0
+            for i in range(len(proposed) + 1):
+                token, logprob = _greedy_token(logits[i], tokens, task.logit_filters)
+                tokens.append(token)
+                sum_logprob += logprob
+                if token == tokenizer.eot or len(tokens) - sample_begin >= task.sample_len:
+                    finished = True
+                if finished or i == len(proposed) or token != proposed[i]:
+                    break
+                accepted += 1
+
+            stats.proposed += len(proposed)
+            stats.accepted += accepted
+            # Descarta do cache o que veio depois da última proposta aceita
+            target.truncate(fed_before + len(pending) + accepted)
+            pending = [tokens[-1]]
+            draft_seq = draft_seq[:len(draft_seq) - len(proposals)] + [to_draft(t) for t in tokens[-accepted - 1:]]
+            proposer.truncate(min(proposer.length, len(draft_seq) - 1))
+
+    sampled_tokens = tokens[sample_begin:]
+    if sampled_tokens and sampled_tokens[-1] == tokenizer.eot:
+        sampled_tokens = sampled_tokens[:-1]
+    stats.tokens += len(sampled_tokens) + 1
+    text = tokenizer.decode(sampled_tokens).strip()
+    return DecodingResult(
+        audio_features=features[0], language=language, tokens=sampled_tokens, text=text,
+        avg_logprob=sum_logprob / (len(sampled_tokens) + 1), no_speech_prob=no_speech_prob,
+        temperature=0.0, compression_ratio=compression_ratio(text),
+    )
+
+
+def transcribe(model, draft, audio, language, options, on_segment=None, progress=None):
+    """
+    Transcreve `audio` (16 kHz) em janelas de até 30 s cortadas nas pausas,
+    cada uma com decode_window. O fim do texto anterior vai como prompt da
+    janela seguinte. Janelas que falhariam nos limiares do Whisper (texto
+    repetitivo ou pouco provável) são refeitas pelo `transcribe` normal.
+
+    Retorna o resultado no formato do Whisper, com a chave "speculative"
+    (ver SpeculativeStats.as_dict).
+    """
+    import whisper
+
+    from .parallel import split_at_silence
+    from .whisper_service import PROMPT_CHARS, _segments_from_tokens, progress_callback
+
+    check_compatible(model, draft)
+    stats = SpeculativeStats(getattr(draft, "model_name", None))
+    tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                                language=language, task="transcribe")
+    options = dict(options)
+    user_prompt = options.pop("initial_prompt", None) or ""
+    fp16 = options.get("fp16", False)
+    # No máximo 30 s por trecho: decode_window decodifica uma janela só (pad_or_trim)
+    _, pieces = split_at_silence(audio, WHISPER_SAMPLE_RATE, 30.0, 0.0, strict=True)
+    segments = []
+
+    # O rascunho também pode estar em uso por outra thread (com os hooks de
+    # cache do Whisper instalados); o modelo grande já é travado por quem chama
+    draft_lock = getattr(draft, "decode_lock", None) if draft is not model else None
+    with draft_lock or nullcontext():
+        with instrumentation.span("speculative_decode", draft=stats.draft):
+            for start, end in pieces:
+                piece = audio[start:end]
+                offset = start / WHISPER_SAMPLE_RATE
+                previous_text = "".join(s["text"] for s in segments)
+                prompt = (user_prompt + previous_text)[-PROMPT_CHARS:].strip() or None
+
+                result = decode_window(model, draft, piece, language, prompt, stats=stats, fp16=fp16)
+                if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    piece_segments = []
+                elif (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                      or result.avg_logprob < LOGPROB_THRESHOLD):
+                    stats.fallbacks += 1
+                    # O progresso do transcribe normal é relativo à janela
+                    piece_progress = None
+                    if progress is not None:
+                        piece_progress = lambda f, start=start, end=end: progress((start + f * (end - start)) / len(audio))
+                    with progress_callback(piece_progress):
+                        piece_segments = model.transcribe(piece, language=language, initial_prompt=prompt,
+                                                          **options)["segments"]
+                else:
+                    piece_segments = _segments_from_tokens(result, tokenizer, len(piece) / WHISPER_SAMPLE_RATE)
+
+                for segment in piece_segments:
+                    segment = dict(segment, id=len(segments), start=segment["start"] + offset,
+                                   end=segment["end"] + offset)
+                    segments.append(segment)
+                    if on_segment is not None:
+                        on_segment(segment)
+                if progress is not None:
+                    progress(end / len(audio))
+
+    summary = stats.as_dict()
+    instrumentation.count("speculative_proposed", stats.proposed)
+    instrumentation.count("speculative_accepted", stats.accepted)
+    instrumentation.log(f"Decodificação especulativa: {summary['accept_rate']:.0%} das propostas aceitas, "
+                        f"{summary['tokens_per_pass']} tokens por passada do modelo", **summary)
+    return {
+        "text": "".join(s["text"] for s in segments),
+        "segments": segments,
+        "language": language,
+        "speculative": summary,
+    }
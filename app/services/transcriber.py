@@ -1,33 +1,654 @@
-import whisper
+import queue
+import threading
+import time
+
+import numpy as np
 from PySide6.QtCore import QThread, Signal
 
-# Carrega o modelo globalmente para evitar recarregamentos
-MODEL = whisper.load_model("medium")
+from . import inference_worker, instrumentation, tuning, whisper_service
+from .inference_worker import WorkerDied, get_worker_pool
+from .model_pool import get_model_pool, model_bytes
+from .parallel import transcribe_parallel
+from .result_cache import get_result_cache
+from .audio_utils import WHISPER_SAMPLE_RATE, StreamingResampler, frame_rms
+
+# O modelo não é mais carregado na importação: o ModelLoaderThread carrega
+# o modelo escolhido no conjunto de modelos residentes (model_pool), de onde
+# esta thread o obtém pelo nome.
+
+class TranscriptionCancelled(Exception):
+    """Levantada dentro da decodificação quando o trabalho é cancelado."""
+
+
+def _tuned_options(model):
+    """Aplica o perfil da máquina (python -m app.tune); retorna as opções de decodificação."""
+    name = getattr(model, "model_name", None)
+    tuning.apply_threads(name, model.device.type)
+    return tuning.decode_options(name, model.device.type)
 
-def get_model():
-    """Retorna a instância do modelo Whisper carregado."""
-    return MODEL
 
 class TranscriptionThread(QThread):
-    """Thread para transcrição de áudio."""
+    """
+    Thread para transcrição de áudio.
+
+    Aceita um caminho de arquivo ou, via `audio`, um array já em 16 kHz mono
+    float32 (gravações), que vai direto para o modelo sem decodificação.
+
+    `model` é o nome de um modelo (obtido do conjunto de modelos residentes)
+    ou o próprio modelo já carregado. Com `draft` (nome ou modelo), um modelo
+    pequeno propõe os tokens e `model` os confere (decodificação especulativa).
+    """
     transcription_finished = Signal(str, str, bool)
     transcription_error = Signal(str)
+    transcription_cancelled = Signal()
+    progress = Signal(float)            # Fração do áudio já transcrita (0 a 1)
+    segment_ready = Signal(float, float, str)   # Início (s), fim (s) e texto de cada segmento
+
+    # No modo paralelo, só áudios a partir desta duração são divididos em blocos
+    PARALLEL_MIN_SECONDS = 300
     
-    def __init__(self, model, file_path, keep_audio=False):
+    def __init__(self, model, file_path, keep_audio=False, audio=None, vad=False, parallel=False,
+                 draft=None):
         super().__init__()
         self.model = model
+        self.draft = draft
+        self.speculative_stats = None
         self.file_path = file_path
         self.keep_audio = keep_audio
+        self.audio = audio
+        self.vad = vad
+        self.vad_stats = None
+        self.parallel = parallel
+        self.parallel_stats = None
+        self.finished_at = None
+        self.metrics = None         # Trabalho medido (instrumentation.begin_job) ao qual esta thread serve
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Pede o cancelamento; a transcrição para na próxima janela decodificada."""
+        self._cancelled.set()
+
+    def _report_progress(self, fraction):
+        if self._cancelled.is_set():
+            raise TranscriptionCancelled()
+        self.progress.emit(fraction)
         
+    def _emit_segment(self, segment):
+        self.segment_ready.emit(segment["start"], segment["end"], segment["text"].strip())
+
     def run(self):
+        instrumentation.bind_job(self.metrics)
         try:
-            print(f"Iniciando transcrição de: {self.file_path}")
-            result = self.model.transcribe(self.file_path, language="pt")
+            model = get_model_pool().get(self.model) if isinstance(self.model, str) else self.model
+            options = _tuned_options(model)
+            draft = get_model_pool().get(self.draft) if isinstance(self.draft, str) else self.draft
+            self._report_progress(0.0)
+            if self.audio is not None:
+                instrumentation.log(f"Iniciando transcrição do áudio gravado ({len(self.audio) / WHISPER_SAMPLE_RATE:.1f}s)")
+                source = self.audio
+            else:
+                instrumentation.log(f"Iniciando transcrição de: {self.file_path}")
+                source = self.file_path
+            if self.parallel:
+                source = whisper_service.load_audio(source) if isinstance(source, str) else source
+
+            if self.parallel and len(source) >= self.PARALLEL_MIN_SECONDS * WHISPER_SAMPLE_RATE:
+                # Arquivo longo: blocos transcritos em processos separados, quantos
+                # couberem no orçamento de RAM dos modelos
+                result = transcribe_parallel(source, model.model_name,
+                                             device=model.device.type,
+                                             progress=self._report_progress,
+                                             options=options, vad=self.vad, cache=get_result_cache(),
+                                             model_size=model_bytes(model))
+                self.parallel_stats = result.get("parallel")
+            else:
+                # Consulta o cache de resultados antes de rodar o modelo; os
+                # segmentos saem pelo sinal `segment_ready` conforme ficam prontos
+                with whisper_service.progress_callback(self._report_progress):
+                    result = whisper_service.transcribe(model, source, cache=get_result_cache(),
+                                                        vad=self.vad, on_segment=self._emit_segment,
+                                                        draft=draft, **options)
+            self.vad_stats = result.get("vad")
+            self.speculative_stats = result.get("speculative")
             text = result.get("text", "").strip()
-            print(f"Transcrição concluída: {len(text)} caracteres")
+            instrumentation.log(f"Transcrição concluída: {len(text)} caracteres")
             
+            # Marca a entrega: a janela mede quanto o sinal leva até o texto aparecer
+            self.finished_at = time.perf_counter()
             self.transcription_finished.emit(text, self.file_path, self.keep_audio)
-            
+
+        except TranscriptionCancelled:
+            instrumentation.log("Transcrição cancelada")
+            self.transcription_cancelled.emit()
+        except Exception as e:
+            instrumentation.log(f"Erro na transcrição: {e}")
+            self.transcription_error.emit(str(e))
+
+class BatchTranscriptionThread(QThread):
+    """
+    Thread que transcreve vários arquivos do mesmo modelo juntos: os curtos
+    são decodificados em lote, numa passada do modelo (ver transcribe_batch).
+    Cada arquivo é identificado pelo seu índice em `file_paths`.
+    """
+    item_finished = Signal(int, str)    # Índice e texto
+    item_error = Signal(int, str)
+    item_cancelled = Signal(int)
+    progress = Signal(float)            # Fração dos arquivos já transcritos (0 a 1)
+
+    def __init__(self, model, file_paths, vad=False):
+        super().__init__()
+        self.model = model
+        self.file_paths = list(file_paths)
+        self.vad = vad
+        self.vad_stats = None
+        self.parallel_stats = None
+        self.finished_at = None
+        self.metrics = None
+        self._cancelled = set()
+        self._cancel_all = threading.Event()
+        self._delivered = set()
+        self.options = {}
+
+    def cancel(self, index=None):
+        """Cancela um arquivo (o resultado dele é descartado) ou, sem índice, o lote todo."""
+        if index is None:
+            self._cancel_all.set()
+        else:
+            self._cancelled.add(index)
+
+    def _all_cancelled(self):
+        if self._cancel_all.is_set():
+            return True
+        return all(i in self._cancelled or i in self._delivered for i in range(len(self.file_paths)))
+
+    def _on_result(self, index, result):
+        self._delivered.add(index)
+        if index in self._cancelled:
+            self.item_cancelled.emit(index)
+        else:
+            self.finished_at = time.perf_counter()
+            self.item_finished.emit(index, result.get("text", "").strip())
+        self.progress.emit(len(self._delivered) / len(self.file_paths))
+        # Os demais já foram cancelados: não decodifica o resto do lote
+        if self._all_cancelled() and len(self._delivered) < len(self.file_paths):
+            raise TranscriptionCancelled()
+
+    def _transcribe_remaining(self, model):
+        try:
+            for i, path in enumerate(self.file_paths):
+                if i in self._delivered or i in self._cancelled or self._cancel_all.is_set():
+                    continue
+                try:
+                    result = whisper_service.transcribe(model, path, cache=get_result_cache(), vad=self.vad,
+                                                        **self.options)
+                except Exception as e:
+                    self._delivered.add(i)
+                    self.item_error.emit(i, str(e))
+                    continue
+                self._on_result(i, result)
+        except TranscriptionCancelled:
+            pass
+
+    def run(self):
+        instrumentation.bind_job(self.metrics)
+        model = None
+        try:
+            model = get_model_pool().get(self.model) if isinstance(self.model, str) else self.model
+            self.options = _tuned_options(model)
+            self.progress.emit(0.0)
+            instrumentation.log(f"Iniciando transcrição em lote de {len(self.file_paths)} arquivos")
+            whisper_service.transcribe_batch(model, self.file_paths, cache=get_result_cache(),
+                                             vad=self.vad, batch_size=len(self.file_paths),
+                                             on_result=self._on_result, **self.options)
+            instrumentation.log("Transcrição em lote concluída")
+        except TranscriptionCancelled:
+            instrumentation.log("Transcrição em lote cancelada")
         except Exception as e:
-            print(f"Erro na transcrição: {e}")
-            self.transcription_error.emit(str(e))
\ No newline at end of file
+            # Ex.: um arquivo ilegível; os que faltam são refeitos um a um para isolar o erro
+            instrumentation.log(f"Erro na transcrição em lote: {e}")
+            if model is not None:
+                self._transcribe_remaining(model)
+            else:
+                for i in range(len(self.file_paths)):
+                    self._delivered.add(i)
+                    self.item_error.emit(i, str(e))
+        for i in range(len(self.file_paths)):
+            if i not in self._delivered:
+                self.item_cancelled.emit(i)
+
+
+class _WorkerJobThread(QThread):
+    """
+    Base das threads que só acompanham um trabalho rodando num processo de
+    trabalho (ver inference_worker): enviam o pedido e repassam os eventos
+    do processo como sinais. Quase não usam o GIL: ficam bloqueadas no pipe.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._worker = None
+        self._job_id = None
+        self._worker_lock = threading.Lock()
+        self._killed = threading.Event()
+        self.metrics = None
+
+    def _kill(self):
+        """Cancelamento imediato: o processo é morto (e substituído por outro)."""
+        self._killed.set()
+        with self._worker_lock:
+            if self._worker is not None:
+                get_worker_pool().recycle(self._worker)
+
+    def _run_job(self, models, kind, request):
+        """Executa o pedido num processo e repassa os eventos até o fim do trabalho."""
+        pool = get_worker_pool()
+        worker = pool.acquire(models)
+        try:
+            with self._worker_lock:
+                if self._killed.is_set():
+                    raise WorkerDied("cancelado antes de começar")
+                self._worker = worker
+                self._job_id = inference_worker.new_job_id()
+                worker.send((kind, self._job_id, request))
+            self._on_job_sent(worker)
+            while True:
+                event = worker.receive()
+                if len(event) < 2 or event[1] != self._job_id:
+                    continue    # Ex.: confirmação de carga de modelo
+                if event[0] == "end":
+                    return
+                if event[0] == "metrics":
+                    # Tempos medidos no processo: entram no trabalho desta thread
+                    # (lido agora: a transcrição ao vivo só ganha um no "Parar")
+                    with instrumentation.job_scope(self.metrics):
+                        instrumentation.merge(*event[2:])
+                    continue
+                self._handle_event(event[0], *event[2:])
+        finally:
+            with self._worker_lock:
+                self._worker = None
+            pool.release(worker)
+
+    def _on_job_sent(self, worker):
+        pass
+
+    def _handle_event(self, kind, *args):
+        """Repassa um evento do processo como sinal; eventos desconhecidos são ignorados."""
+
+
+class WorkerTranscriptionThread(_WorkerJobThread):
+    """
+    Mesma interface da TranscriptionThread, com a transcrição num processo de
+    trabalho. O áudio gravado vai por memória compartilhada. `model` e
+    `draft` são nomes de modelos; o cancelamento encerra o processo na hora.
+    """
+    transcription_finished = Signal(str, str, bool)
+    transcription_error = Signal(str)
+    transcription_cancelled = Signal()
+    progress = Signal(float)
+    segment_ready = Signal(float, float, str)
+
+    def __init__(self, model, file_path, keep_audio=False, audio=None, vad=False, parallel=False,
+                 draft=None):
+        super().__init__()
+        self.model = model
+        self.draft = draft
+        self.file_path = file_path
+        self.keep_audio = keep_audio
+        self.audio = audio
+        self.vad = vad
+        self.vad_stats = None
+        self.parallel = parallel
+        self.parallel_stats = None
+        self.speculative_stats = None
+        self.finished_at = None
+        self._answered = False
+
+    def cancel(self):
+        self._kill()
+
+    def _handle_event(self, kind, *args):
+        if kind == "progress":
+            self.progress.emit(args[0])
+        elif kind == "segment":
+            self.segment_ready.emit(*args)
+        elif kind == "done":
+            result = args[0]
+            self.vad_stats = result["vad"]
+            self.parallel_stats = result["parallel"]
+            self.speculative_stats = result["speculative"]
+            self._answered = True
+            self.finished_at = time.perf_counter()
+            self.transcription_finished.emit(result["text"], self.file_path, self.keep_audio)
+        elif kind == "error":
+            self._answered = True
+            self.transcription_error.emit(args[0])
+        elif kind == "cancelled":
+            self._answered = True
+            self.transcription_cancelled.emit()
+
+    def run(self):
+        instrumentation.bind_job(self.metrics)
+        try:
+            with inference_worker.shared_audio(self.audio) as (shm_name, length):
+                self._run_job([self.model, self.draft], "transcribe", {
+                    "model": self.model, "draft": self.draft, "file_path": self.file_path,
+                    "audio_shm": shm_name, "audio_length": length,
+                    "vad": self.vad, "parallel": self.parallel,
+                })
+            if not self._answered:
+                raise WorkerDied("o processo de transcrição não respondeu")
+        except WorkerDied as e:
+            if self._killed.is_set():
+                instrumentation.log("Transcrição cancelada (processo encerrado)")
+                self.transcription_cancelled.emit()
+            else:
+                instrumentation.log(f"Erro na transcrição: {e}")
+                self.transcription_error.emit(str(e))
+        except Exception as e:
+            instrumentation.log(f"Erro na transcrição: {e}")
+            self.transcription_error.emit(str(e))
+
+
+class WorkerBatchTranscriptionThread(_WorkerJobThread):
+    """
+    Mesma interface da BatchTranscriptionThread, com o lote num processo de
+    trabalho. Cancelar um arquivo só descarta o resultado dele; cancelar o
+    lote todo encerra o processo.
+    """
+    item_finished = Signal(int, str)
+    item_error = Signal(int, str)
+    item_cancelled = Signal(int)
+    progress = Signal(float)
+
+    def __init__(self, model, file_paths, vad=False):
+        super().__init__()
+        self.model = model
+        self.file_paths = list(file_paths)
+        self.vad = vad
+        self.vad_stats = None
+        self.parallel_stats = None
+        self.finished_at = None
+        self._cancelled = set()
+        self._delivered = set()
+
+    def cancel(self, index=None):
+        if index is None:
+            self._kill()
+            return
+        with self._worker_lock:
+            self._cancelled.add(index)
+            if self._worker is not None:
+                try:
+                    self._worker.send(("cancel_item", self._job_id, index))
+                except WorkerDied:
+                    pass
+
+    def _on_job_sent(self, worker):
+        # Cancelamentos pedidos antes do lote chegar ao processo
+        with self._worker_lock:
+            for index in self._cancelled:
+                worker.send(("cancel_item", self._job_id, index))
+
+    def _handle_event(self, kind, *args):
+        if kind == "progress":
+            self.progress.emit(args[0])
+        elif kind == "item_finished":
+            self._delivered.add(args[0])
+            if args[0] in self._cancelled:
+                # Cancelado aqui enquanto o resultado já vinha do processo
+                self.item_cancelled.emit(args[0])
+                return
+            self.finished_at = time.perf_counter()
+            self.item_finished.emit(*args)
+        elif kind == "item_error":
+            self._delivered.add(args[0])
+            self.item_error.emit(*args)
+        elif kind == "item_cancelled":
+            self._delivered.add(args[0])
+            self.item_cancelled.emit(args[0])
+
+    def run(self):
+        instrumentation.bind_job(self.metrics)
+        error = None
+        try:
+            self._run_job([self.model], "batch", {
+                "model": self.model, "file_paths": self.file_paths, "vad": self.vad,
+            })
+        except WorkerDied as e:
+            if not self._killed.is_set():
+                error = str(e)
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            instrumentation.log(f"Erro na transcrição em lote: {error}")
+        for i in range(len(self.file_paths)):
+            if i in self._delivered:
+                continue
+            if error is None:
+                self.item_cancelled.emit(i)
+            else:
+                self.item_error.emit(i, error)
+
+
+class WorkerStreamingTranscriptionThread(_WorkerJobThread):
+    """
+    Mesma interface da StreamingTranscriptionThread, com a transcrição ao vivo
+    num processo de trabalho (que já tem o modelo): os blocos de áudio da
+    fila vão pelo pipe de comandos e os textos voltam como eventos. O processo
+    fica ocupado com a gravação até ela terminar.
+    """
+    partial_text = Signal(str)
+    segment_finalized = Signal(str)
+    streaming_finished = Signal(str)
+    transcription_error = Signal(str)
+
+    def __init__(self, model, audio_queue, language=whisper_service.DEFAULT_LANGUAGE):
+        super().__init__()
+        self.model = model
+        self.audio_queue = audio_queue
+        self.language = language
+        self.finished_at = None
+        self._answered = False
+
+    def _on_job_sent(self, worker):
+        threading.Thread(target=self._feed, args=(worker, self._job_id),
+                         name="stream-feed", daemon=True).start()
+
+    def _feed(self, worker, job_id):
+        """Repassa ao processo os blocos da gravação, juntando os que já estiverem na fila."""
+        while True:
+            item = self.audio_queue.get()
+            blocks = []
+            while item is not None:
+                blocks.append(item[0])
+                try:
+                    item = self.audio_queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if blocks:
+                    worker.send(("stream_audio", job_id, np.concatenate(blocks), WHISPER_SAMPLE_RATE))
+                if item is None:
+                    worker.send(("stream_end", job_id))
+                    return
+            except WorkerDied:
+                return
+
+    def _handle_event(self, kind, *args):
+        if kind == "partial":
+            self.partial_text.emit(args[0])
+        elif kind == "segment":
+            self.segment_finalized.emit(args[0])
+        elif kind == "done":
+            self._answered = True
+            self.finished_at = time.perf_counter()
+            self.streaming_finished.emit(args[0])
+        elif kind == "error":
+            self._answered = True
+            self.transcription_error.emit(args[0])
+
+    def run(self):
+        try:
+            self._run_job([self.model], "stream", {"model": self.model, "language": self.language})
+            if not self._answered:
+                raise WorkerDied("o processo de transcrição não respondeu")
+        except Exception as e:
+            instrumentation.log(f"Erro na transcrição ao vivo: {e}")
+            self.transcription_error.emit(str(e))
+
+
+class StreamingTranscriptionThread(QThread):
+    """
+    Thread de transcrição ao vivo: consome os blocos de áudio produzidos pela
+    gravação (via fila) e transcreve incrementalmente, finalizando trechos nas
+    pausas da fala. O texto parcial do trecho atual é reenviado a cada passo.
+
+    Roda no processo onde é criada (ver WorkerStreamingTranscriptionThread
+    para a interface): `model` pode ser o nome de um modelo, que então é
+    carregado aqui na primeira transcrição ao vivo.
+    """
+    partial_text = Signal(str)          # Hipótese do trecho em andamento (pode mudar)
+    segment_finalized = Signal(str)     # Trecho concluído (não muda mais)
+    streaming_finished = Signal(str)    # Texto completo ao final da gravação
+    transcription_error = Signal(str)
+
+    DECODE_STEP = 2.0       # Segundos de áudio novo entre decodificações
+    MIN_SEGMENT = 3.0       # Duração mínima de um trecho antes de cortar numa pausa
+    MAX_SEGMENT = 25.0      # Corta à força antes da janela de 30 s do Whisper
+    MIN_SILENCE = 0.4       # Duração mínima de uma pausa para servir de corte
+    FRAME = 0.03            # Quadro de análise de energia (30 ms)
+    SILENCE_FLOOR = 0.005   # RMS abaixo disso é sempre silêncio
+
+    def __init__(self, model, audio_queue, language=whisper_service.DEFAULT_LANGUAGE):
+        super().__init__()
+        self.model = model
+        self.audio_queue = audio_queue
+        self.language = language
+        self.finalized = []
+        self._resampler = None
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._pending_since_decode = 0
+        self.finished_at = None
+        self.metrics = None
+
+    def run(self):
+        try:
+            if isinstance(self.model, str):
+                self.model = get_model_pool().get(self.model)
+            instrumentation.log("Iniciando transcrição ao vivo...")
+            finished = False
+            while not finished:
+                finished = self._drain_queue()
+
+                if self._pending_since_decode < self.DECODE_STEP * WHISPER_SAMPLE_RATE and not finished:
+                    continue
+                self._pending_since_decode = 0
+
+                cut = self._find_cut()
+                if cut is not None:
+                    self._finalize(self._buffer[:cut])
+                    self._buffer = self._buffer[cut:]
+                elif not finished and not self._is_silent(self._buffer):
+                    self.partial_text.emit(self._decode(self._buffer))
+
+            # Fim da gravação: o último trecho já conta no trabalho medido
+            instrumentation.bind_job(self.metrics)
+            # Finaliza o que restou no buffer
+            if len(self._buffer) > 0:
+                self._finalize(self._buffer)
+                self._buffer = np.zeros(0, dtype=np.float32)
+
+            text = " ".join(self.finalized).strip()
+            instrumentation.log(f"Transcrição ao vivo concluída: {len(text)} caracteres")
+            self.finished_at = time.perf_counter()
+            self.streaming_finished.emit(text)
+
+        except Exception as e:
+            instrumentation.log(f"Erro na transcrição ao vivo: {e}")
+            self.transcription_error.emit(str(e))
+
+    def _drain_queue(self):
+        """Move os blocos da fila para o buffer (16 kHz). Retorna True ao fim da gravação."""
+        try:
+            item = self.audio_queue.get(timeout=0.2)
+        except queue.Empty:
+            return False
+
+        while True:
+            if item is None:
+                if self._resampler is not None:
+                    self._append(self._resampler.flush())
+                return True
+
+            chunk, samplerate = item
+            if self._resampler is None:
+                self._resampler = StreamingResampler(samplerate, WHISPER_SAMPLE_RATE)
+            self._append(self._resampler.process(chunk))
+
+            try:
+                item = self.audio_queue.get_nowait()
+            except queue.Empty:
+                return False
+
+    def _append(self, samples):
+        if len(samples):
+            self._buffer = np.concatenate([self._buffer, samples])
+            self._pending_since_decode += len(samples)
+
+    def _find_cut(self):
+        """Procura a última pausa do buffer para encerrar um trecho; None se ainda não há."""
+        sr = WHISPER_SAMPLE_RATE
+        if len(self._buffer) >= self.MAX_SEGMENT * sr:
+            # Sem pausa a tempo: corta na pausa mais longa possível ou no limite
+            return self._last_silence(int(self.MAX_SEGMENT * sr)) or int(self.MAX_SEGMENT * sr)
+        if len(self._buffer) < self.MIN_SEGMENT * sr:
+            return None
+        return self._last_silence(len(self._buffer))
+
+    def _last_silence(self, limit):
+        """Índice (no meio da última pausa longa antes de `limit`) ou None."""
+        frame = int(self.FRAME * WHISPER_SAMPLE_RATE)
+        rms = frame_rms(self._buffer[:limit], frame)
+        if len(rms) == 0:
+            return None
+
+        silent = rms < self._silence_threshold(rms)
+
+        min_frames = int(self.MIN_SILENCE / self.FRAME)
+        min_start = int(self.MIN_SEGMENT / self.FRAME)
+        run_end = None
+        for i in range(len(silent) - 1, min_start - 1, -1):
+            if silent[i]:
+                if run_end is None:
+                    run_end = i
+                if run_end - i + 1 >= min_frames:
+                    return (i + run_end + 1) // 2 * frame
+            else:
+                run_end = None
+        return None
+
+    def _silence_threshold(self, rms):
+        # Relativo ao ruído de fundo, limitado pelo pico (trecho todo falado) e com piso absoluto
+        return max(min(np.percentile(rms, 10) * 2.0, rms.max() * 0.25), self.SILENCE_FLOOR)
+
+    def _is_silent(self, audio):
+        rms = frame_rms(audio, int(self.FRAME * WHISPER_SAMPLE_RATE))
+        return len(rms) == 0 or rms.max() < self.SILENCE_FLOOR
+
+    def _finalize(self, audio):
+        # Trechos só de silêncio não são decodificados (evita texto "alucinado")
+        if self._is_silent(audio):
+            return
+        text = self._decode(audio)
+        if text:
+            self.finalized.append(text)
+            self.segment_finalized.emit(text)
+
+    def _decode(self, audio):
+        # O final do texto já confirmado serve de contexto para o próximo trecho
+        prompt = " ".join(self.finalized)[-200:] or None
+        result = whisper_service.transcribe(self.model, audio, language=self.language,
+                                            initial_prompt=prompt,
+                                            condition_on_previous_text=False)
+        return result.get("text", "").strip()
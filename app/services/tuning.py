@@ -0,0 +1,199 @@
+"""
+Perfil de desempenho por máquina (ajuste automático).
+
+`python -m app.tune` mede, para cada modelo, o número de threads do torch e
+as opções de decodificação (feixe, fallback de temperatura) numa amostra de
+áudio da própria máquina, e guarda a combinação mais rápida cuja taxa de
+erro de palavras (WER) fica dentro da tolerância em relação à referência.
+
+O perfil fica em ~/.cache/speechtotext/tuning.json, separado por máquina
+(nome, modelo da CPU e número de núcleos), já que o diretório pode ser
+compartilhado entre computadores diferentes. A carga do modelo aplica as
+threads e as transcrições da interface usam as opções de decodificação.
+
+Só a CPU é ajustada: em GPU as threads do torch quase não influem.
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+
+from . import instrumentation
+from .result_cache import DEFAULT_CACHE_DIR
+
+PROFILE_PATH = os.path.join(DEFAULT_CACHE_DIR, "tuning.json")
+DEFAULT_TOLERANCE = 0.02
+
+# Opções de decodificação testadas, da mais cuidadosa para a mais rápida. A
+# primeira (padrão do Whisper na linha de comando) é a referência quando não
+# há transcrição de referência.
+DECODE_CANDIDATES = [
+    {"beam_size": 5, "best_of": 5},
+    {},
+    {"temperature": 0.0},
+]
+
+_profile = None
+_profile_lock = threading.Lock()
+
+
+def machine_id():
+    """Identifica a máquina: nome, modelo da CPU e número de núcleos."""
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    except OSError:
+        pass
+    return f"{platform.node()}|{cpu}|{os.cpu_count()}"
+
+
+def _load():
+    global _profile
+    with _profile_lock:
+        if _profile is None:
+            try:
+                with open(PROFILE_PATH, encoding="utf-8") as f:
+                    _profile = json.load(f)
+            except (OSError, ValueError):
+                _profile = {}
+        return _profile
+
+
+def get_profile(model_name):
+    """Perfil ajustado do modelo nesta máquina, ou None se não houver."""
+    machine = _load().get("machines", {}).get(machine_id(), {})
+    return machine.get("models", {}).get(model_name)
+
+
+def save_profile(model_name, profile):
+    """Grava o perfil do modelo para esta máquina (mantendo os das outras)."""
+    global _profile
+    data = dict(_load())
+    machines = data.setdefault("machines", {})
+    machine = machines.setdefault(machine_id(), {"models": {}})
+    machine["models"][model_name] = profile
+    os.makedirs(os.path.dirname(PROFILE_PATH), exist_ok=True)
+    tmp_path = PROFILE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, PROFILE_PATH)
+    with _profile_lock:
+        _profile = data
+
+
+def apply_threads(model_name, device):
+    """Ajusta as threads do torch conforme o perfil do modelo (só em CPU)."""
+    profile = get_profile(model_name)
+    if device != "cpu" or not profile or not profile.get("threads"):
+        return
+    import torch
+    if torch.get_num_threads() != profile["threads"]:
+        torch.set_num_threads(profile["threads"])
+        instrumentation.log(f"Perfil ajustado: {profile['threads']} thread(s) para '{model_name}'")
+
+
+def decode_options(model_name, device="cpu"):
+    """Opções de decodificação do perfil do modelo (vazio sem perfil ou fora da CPU)."""
+    profile = get_profile(model_name)
+    if device != "cpu" or not profile:
+        return {}
+    return dict(profile.get("decode", {}))
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    Taxa de erro de palavras: (substituições + inserções + remoções) / palavras
+    da referência, sem diferenciar maiúsculas nem pontuação.
+    """
+    ref = _words(reference)
+    hyp = _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Distância de edição por linha (programação dinâmica)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _words(text):
+    cleaned = "".join(c.lower() if c.isalnum() else " " for c in text)
+    return cleaned.split()
+
+
+def thread_candidates(cpu_count=None):
+    """Potências de 2 até o número de núcleos, mais o próprio número de núcleos."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    candidates = {cpu_count}
+    n = 1
+    while n < cpu_count:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def tune_model(model_name, audios, reference=None, tolerance=DEFAULT_TOLERANCE, threads=None,
+               language=None):
+    """
+    Mede as combinações para `model_name` nos `audios` (arrays 16 kHz) e
+    retorna o perfil escolhido com as medições de cada candidato.
+
+    As threads são escolhidas primeiro, com a decodificação mais simples;
+    depois as opções de decodificação, com essas threads. `reference` é o
+    texto correto dos áudios (concatenado); sem ele, a referência é a saída
+    da primeira opção de DECODE_CANDIDATES.
+    """
+    import torch
+    from . import encoder_cache, whisper_service
+
+    language = language or whisper_service.DEFAULT_LANGUAGE
+    model = whisper_service.load_model(model_name, device="cpu")
+
+    def run(options):
+        # Cada candidato paga o encoder, como numa transcrição nova
+        with encoder_cache.disabled():
+            start = time.perf_counter()
+            texts = [whisper_service.transcribe(model, audio, language, **options).get("text", "").strip()
+                     for audio in audios]
+            return time.perf_counter() - start, " ".join(texts)
+
+    # Aquecimento: a primeira passada paga a leitura dos pesos e alocações
+    run({"temperature": 0.0})
+
+    thread_results = []
+    for n in threads or thread_candidates():
+        torch.set_num_threads(n)
+        seconds, _ = run({"temperature": 0.0})
+        thread_results.append({"threads": n, "seconds": round(seconds, 3)})
+        instrumentation.log(f"[{model_name}] {n} thread(s): {seconds:.2f}s")
+    best_threads = min(thread_results, key=lambda r: r["seconds"])["threads"]
+    torch.set_num_threads(best_threads)
+
+    decode_results = []
+    for options in DECODE_CANDIDATES:
+        seconds, text = run(options)
+        if reference is None:
+            reference = text
+        wer = word_error_rate(reference, text)
+        decode_results.append({"decode": options, "seconds": round(seconds, 3), "wer": round(wer, 4)})
+        instrumentation.log(f"[{model_name}] {options or 'padrão'}: {seconds:.2f}s, WER {wer:.1%}")
+
+    accepted = [r for r in decode_results if r["wer"] <= tolerance] or decode_results[:1]
+    best = min(accepted, key=lambda r: r["seconds"])
+    return {
+        "threads": best_threads,
+        "decode": best["decode"],
+        "seconds": best["seconds"],
+        "wer": best["wer"],
+        "tolerance": tolerance,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "candidates": {"threads": thread_results, "decode": decode_results},
+    }
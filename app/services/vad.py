@@ -0,0 +1,155 @@
+"""
+Detecção de atividade de voz (VAD) por energia e planicidade espectral.
+
+Remove os trechos de silêncio antes da decodificação e guarda um mapa de
+tempos para que os segmentos continuem referindo o áudio original.
+Tudo vetorizado em NumPy, sem modelos extras.
+
+Só é removido o que é silêncio com certeza: um quadro precisa estar abaixo
+de SILENCE_MAX_DB (nível absoluto) para ser descartado. Um áudio sem nenhum
+quadro assim (fala contínua, música, um tom) passa inteiro.
+"""
+
+import numpy as np
+
+from .audio_utils import WHISPER_SAMPLE_RATE
+
+FRAME_MS = 30
+ENERGY_MARGIN_DB = 10.0     # Acima do ruído de fundo = candidato a fala
+ABSOLUTE_FLOOR_DB = -55.0   # Abaixo disso é sempre silêncio
+SILENCE_MAX_DB = -40.0      # Acima disso nunca é silêncio (nível médio do quadro, em dBFS)
+FLATNESS_MAX = 0.6          # Ruído branco tem planicidade ~1; fala é bem menor
+PAD_SECONDS = 0.2           # Margem mantida em volta de cada trecho de fala
+MIN_SILENCE_SECONDS = 0.5   # Pausas menores que isso não são removidas
+MIN_SPEECH_SECONDS = 0.1    # Trechos de "fala" menores que isso são ignorados
+BLOCK_FRAMES = 8192          # Quadros analisados de cada vez (~4 min de áudio)
+
+
+def _frames(audio, frame_size):
+    n_frames = len(audio) // frame_size
+    return audio[:n_frames * frame_size].reshape(n_frames, frame_size)
+
+
+def _runs(mask):
+    """Retorna (início, fim) de cada sequência de True em `mask`."""
+    padded = np.concatenate([[False], mask, [False]])
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return changes[0::2], changes[1::2]
+
+
+def _frame_features(frames, window):
+    """Energia (dB) e planicidade espectral de cada quadro, em float32."""
+    energy_db = 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+    spectrum = np.abs(np.fft.rfft(frames * window, axis=1)) + 1e-10
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+    return energy_db.astype(np.float32), flatness.astype(np.float32)
+
+
+def speech_mask(audio, sr=WHISPER_SAMPLE_RATE, frame_ms=FRAME_MS):
+    """Máscara booleana por quadro: True onde há fala."""
+    frame_size = int(sr * frame_ms / 1000)
+    frames = _frames(np.asarray(audio, dtype=np.float32), frame_size)
+    if len(frames) == 0:
+        return np.zeros(0, dtype=bool), frame_size
+
+    # Em blocos de quadros: a FFT do arquivo inteiro de uma vez custaria
+    # várias vezes o tamanho do áudio; só os valores por quadro ficam
+    window = np.hanning(frame_size).astype(np.float32)
+    energy_db = np.empty(len(frames), dtype=np.float32)
+    flatness = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        block = slice(start, start + BLOCK_FRAMES)
+        energy_db[block], flatness[block] = _frame_features(frames[block], window)
+
+    # O ruído de fundo é relativo (os 10% mais baixos); sozinho, ele chamaria de
+    # silêncio a parte mais baixa de qualquer áudio, mesmo sem pausa nenhuma
+    noise_floor = np.percentile(energy_db, 10)
+    loud = energy_db > max(noise_floor + ENERGY_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+    # Quadros muito altos contam como fala mesmo com espectro plano (consoantes fricativas)
+    voiced = (flatness < FLATNESS_MAX) | (energy_db > noise_floor + 2 * ENERGY_MARGIN_DB)
+    # Só quadros abaixo de SILENCE_MAX_DB podem ser silêncio; entre eles, a
+    # comparação com o ruído de fundo ainda separa a fala baixa
+    mask = (energy_db >= SILENCE_MAX_DB) | (loud & voiced)
+
+    # Remove "fala" curta demais (cliques, estalos)
+    min_speech = max(1, int(MIN_SPEECH_SECONDS * 1000 / frame_ms))
+    starts, ends = _runs(mask)
+    for s, e in zip(starts, ends):
+        if e - s < min_speech:
+            mask[s:e] = False
+    return mask, frame_size
+
+
+def detect_speech(audio, sr=WHISPER_SAMPLE_RATE):
+    """Retorna a lista de intervalos de fala [(início, fim)] em amostras."""
+    mask, frame_size = speech_mask(audio, sr)
+    starts, ends = _runs(mask)
+    if len(starts) == 0:
+        return []
+
+    pad = int(PAD_SECONDS * sr)
+    min_gap = int(MIN_SILENCE_SECONDS * sr)
+    intervals = []
+    for s, e in zip(starts * frame_size, ends * frame_size):
+        s, e = max(0, s - pad), min(len(audio), e + pad)
+        if intervals and s - intervals[-1][1] < min_gap:
+            intervals[-1][1] = e
+        else:
+            intervals.append([s, e])
+    return [(int(s), int(e)) for s, e in intervals]
+
+
+class TimeMap:
+    """Converte tempos do áudio compactado (sem silêncio) para o áudio original."""
+
+    def __init__(self, intervals, sr=WHISPER_SAMPLE_RATE):
+        self.sr = sr
+        lengths = np.array([e - s for s, e in intervals], dtype=np.int64)
+        self.compact_starts = (np.concatenate([[0], np.cumsum(lengths)[:-1]]) / sr) if len(lengths) else np.zeros(0)
+        self.original_starts = np.array([s for s, _ in intervals], dtype=np.float64) / sr
+
+    def to_original(self, t):
+        """Tempo (s) no áudio compactado -> tempo (s) no áudio original."""
+        if len(self.compact_starts) == 0:
+            return t
+        i = max(0, int(np.searchsorted(self.compact_starts, t, side="right")) - 1)
+        return float(self.original_starts[i] + (t - self.compact_starts[i]))
+
+    def remap_segment(self, segment):
+        """Cópia do segmento (e das palavras) com os tempos no áudio original."""
+        segment = dict(segment, start=self.to_original(segment["start"]), end=self.to_original(segment["end"]))
+        if segment.get("words"):
+            segment["words"] = [dict(word, start=self.to_original(word["start"]), end=self.to_original(word["end"]))
+                                for word in segment["words"]]
+        return segment
+
+    def remap_result(self, result):
+        """Ajusta os tempos dos segmentos (e palavras) de um resultado do Whisper."""
+        result["segments"] = [self.remap_segment(s) for s in result.get("segments", [])]
+        return result
+
+
+def strip_silence(audio, sr=WHISPER_SAMPLE_RATE):
+    """
+    Remove os silêncios de `audio`.
+
+    Retorna (áudio compactado, TimeMap, estatísticas em segundos).
+    """
+    intervals = detect_speech(audio, sr)
+    if not intervals and len(audio):
+        # Nenhuma fala reconhecida: o Whisper decide, em vez de um texto vazio
+        intervals = [(0, len(audio))]
+    if intervals:
+        compact = np.concatenate([audio[s:e] for s, e in intervals])
+    else:
+        compact = np.zeros(0, dtype=np.float32)
+
+    total = len(audio) / sr
+    kept = len(compact) / sr
+    stats = {
+        "original_seconds": round(total, 2),
+        "kept_seconds": round(kept, 2),
+        "skipped_seconds": round(total - kept, 2),
+        "skipped_ratio": round((total - kept) / total, 3) if total else 0.0,
+    }
+    return compact, TimeMap(intervals, sr), stats
@@ -0,0 +1,407 @@
+"""
+Serviço de transcrição independente da interface (sem Qt).
+
+Usado pelas threads da interface e pelos modos sem janela (lote, servidor).
+whisper/torch só são importados quando uma função daqui é chamada.
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager, nullcontext
+
+from . import encoder_cache, instrumentation, model_store, quantization, result_cache
+from .audio_utils import WHISPER_SAMPLE_RATE, read_audio_file
+from .vad import strip_silence
+
+DEFAULT_LANGUAGE = "pt"
+PROMPT_CHARS = 200
+# Clipes até o tamanho da janela do Whisper podem ser decodificados em lote
+BATCH_MAX_SECONDS = 30.0
+DEFAULT_BATCH_SIZE = 8
+# Limiares do `whisper.transcribe` para repetir a decodificação com temperatura
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+_progress = threading.local()
+_progress_hook_lock = threading.Lock()
+
+
+def get_device():
+    """Retorna "cuda" se houver GPU disponível, senão "cpu"."""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_model(model_name, device=None, mmap=True):
+    """
+    Carrega um modelo do Whisper no dispositivo indicado (ou no melhor disponível).
+
+    Com `mmap=True` (padrão) os pesos vêm do checkpoint convertido e mapeado
+    em memória (ver model_store); se a conversão falhar, usa a carga normal.
+    Nomes com o sufixo "-int8" carregam o modelo quantizado, sempre em CPU
+    (ver quantization).
+    """
+    import whisper
+
+    if device is None:
+        device = get_device()
+    if quantization.is_quantized(model_name):
+        # A quantização dinâmica do torch só roda em CPU
+        device = "cpu"
+    instrumentation.log(f"Carregando modelo '{model_name}' no dispositivo: {device}...")
+    with instrumentation.span("model_load", model=model_name, mmap=mmap):
+        model = None
+        if quantization.is_quantized(model_name):
+            model = quantization.load_model(model_name, cache=mmap)
+        elif mmap:
+            try:
+                model = model_store.load_model(model_name, device=device)
+            except Exception as e:
+                instrumentation.log(f"Carga mapeada indisponível ({e}); usando o checkpoint original")
+        if model is None:
+            model = whisper.load_model(model_name, device=device)
+    # Nome guardado no próprio modelo: faz parte das chaves de cache
+    model.model_name = model_name
+    # O Whisper instala hooks de cache no modelo durante cada transcrição;
+    # duas transcrições simultâneas no mesmo modelo misturariam os caches.
+    model.decode_lock = threading.Lock()
+    # Mel e saídas do encoder reaproveitados entre decodificações do mesmo áudio
+    encoder_cache.install(model)
+    return instrumentation.instrument_model(model)
+
+
+def load_audio(path):
+    """
+    Decodifica um arquivo para um array 16 kHz mono float32.
+
+    Formatos lidos pelo libsndfile (wav, flac, ogg, mp3...) são decodificados
+    no próprio processo, em blocos; os demais (m4a, vídeo...) passam pelo
+    ffmpeg, como no `whisper.load_audio`.
+    """
+    import soundfile as sf
+
+    start = time.perf_counter()
+    with instrumentation.span("audio_load"):
+        try:
+            audio = read_audio_file(path)
+            decoder = "soundfile"
+        except sf.SoundFileError:
+            if not os.path.exists(path):
+                raise
+            import whisper
+            instrumentation.count("audio_load_ffmpeg")
+            audio = whisper.load_audio(path)
+            decoder = "ffmpeg"
+    elapsed = time.perf_counter() - start
+    instrumentation.log(f"Áudio carregado em {elapsed:.2f}s ({decoder}, {len(audio) / WHISPER_SAMPLE_RATE:.1f}s de áudio)",
+                        path=path, decoder=decoder, seconds=round(elapsed, 3))
+    return audio
+
+
+def transcribe(model, source, language=DEFAULT_LANGUAGE, cache=None, vad=False, on_segment=None,
+               draft=None, **options):
+    """
+    Transcreve `source` (caminho de arquivo ou array 16 kHz mono float32).
+
+    Com `cache` (ResultCache), o resultado é procurado pelo hash do áudio
+    decodificado antes de rodar o modelo e salvo depois.
+
+    Com `vad=True`, os silêncios são removidos antes da decodificação; os
+    tempos dos segmentos continuam referindo o áudio original e o resultado
+    ganha a chave "vad" com quanto áudio foi ignorado.
+
+    Com `on_segment`, cada segmento (dicionário do Whisper, com start/end no
+    áudio original) é entregue assim que decodificado, em vez de só no final.
+
+    Com `draft` (um modelo pequeno já carregado, ex.: "tiny"), a decodificação
+    é especulativa: o rascunho propõe tokens e `model` os confere (ver
+    speculative.py). O texto é o da decodificação gulosa de `model`, e o
+    resultado ganha a chave "speculative" com a taxa de aceitação.
+
+    Retorna o dicionário de resultado do Whisper (text, segments, language).
+    """
+    options.setdefault("fp16", model.device.type == "cuda")
+    audio = load_audio(source) if isinstance(source, str) else source
+    if cache is None and not vad and on_segment is None:
+        return _decode(model, audio, language, options, draft=draft)
+
+    if cache is not None:
+        key_options = dict(options, vad=vad)
+        if draft is not None:
+            key_options["draft"] = getattr(draft, "model_name", None)
+        key = result_cache.make_key(audio, getattr(model, "model_name", None), language, key_options)
+        result = cache.get(key)
+        if result is not None:
+            instrumentation.count("result_cache_hits")
+            instrumentation.log(f"Resultado encontrado no cache ({cache.hits} acerto(s), {cache.misses} falha(s))")
+            for segment in result.get("segments", []) if on_segment else ():
+                on_segment(segment)
+            return result
+
+    if vad:
+        result = _transcribe_speech_only(model, audio, language, options, on_segment, draft)
+    else:
+        result = _decode(model, audio, language, options, on_segment, draft)
+
+    if cache is not None:
+        instrumentation.count("result_cache_misses")
+        cache.put(key, result)
+    return result
+
+
+def transcribe_batch(model, sources, language=DEFAULT_LANGUAGE, cache=None, vad=False,
+                     batch_size=DEFAULT_BATCH_SIZE, on_result=None, **options):
+    """
+    Transcreve vários áudios curtos com uma passada do encoder e do decoder
+    por lote, em vez de um por vez.
+
+    Cada `source` é um caminho ou um array 16 kHz mono float32. Os clipes de
+    até BATCH_MAX_SECONDS (depois do VAD, se ligado) vão em lotes de
+    `batch_size`; os mais longos passam pelo `transcribe` normal. Clipes cuja
+    decodificação em lote falharia nos limiares do Whisper (texto repetitivo
+    ou pouco provável) são refeitos sozinhos, com o fallback de temperatura.
+
+    `on_result(índice, resultado)` é chamado assim que cada resultado fica
+    pronto. Retorna a lista de resultados na ordem de `sources`.
+    """
+    options.setdefault("fp16", model.device.type == "cuda")
+    results = [None] * len(sources)
+    pending = []    # (índice, clipe, chave do cache, TimeMap, estatísticas do VAD)
+
+    def deliver(index, result, key=None):
+        if cache is not None and key is not None:
+            instrumentation.count("result_cache_misses")
+            cache.put(key, result)
+        results[index] = result
+        if on_result is not None:
+            on_result(index, result)
+
+    def flush():
+        decoded = _decode_batch(model, [clip for _, clip, _, _, _ in pending], language, options)
+        for (index, _, key, time_map, stats), result in zip(pending, decoded):
+            if time_map is not None:
+                result = time_map.remap_result(result)
+                result["vad"] = stats
+            deliver(index, result, key)
+        pending.clear()
+
+    for index, source in enumerate(sources):
+        audio = load_audio(source) if isinstance(source, str) else source
+        key = None
+        if cache is not None:
+            key = result_cache.make_key(audio, getattr(model, "model_name", None), language,
+                                        dict(options, vad=vad))
+            result = cache.get(key)
+            if result is not None:
+                instrumentation.count("result_cache_hits")
+                deliver(index, result)
+                continue
+
+        clip, time_map, stats = audio, None, None
+        if vad:
+            with instrumentation.span("vad"):
+                clip, time_map, stats = strip_silence(audio)
+            if len(clip) == 0:
+                deliver(index, {"text": "", "segments": [], "language": language, "vad": stats}, key)
+                continue
+
+        if len(clip) > BATCH_MAX_SECONDS * WHISPER_SAMPLE_RATE:
+            deliver(index, transcribe(model, audio, language, vad=vad, **options), key)
+            continue
+
+        pending.append((index, clip, key, time_map, stats))
+        if len(pending) == batch_size:
+            flush()
+    if pending:
+        flush()
+    return results
+
+
+def _decode_batch(model, clips, language, options):
+    """Decodifica até 30 s por clipe, todos numa passada do encoder e do decoder."""
+    import torch
+    import whisper
+
+    task = options.get("task", "transcribe")
+    decode_options = whisper.DecodingOptions(
+        task=task, language=language, temperature=0.0, fp16=options["fp16"],
+        beam_size=options.get("beam_size"), patience=options.get("patience"),
+    )
+    tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                                language=language, task=task)
+
+    with getattr(model, "decode_lock", nullcontext()):
+        with instrumentation.span("decode_batch", model=getattr(model, "model_name", None), size=len(clips)):
+            mel = torch.stack([
+                encoder_cache.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(clip)), model.dims.n_mels)
+                for clip in clips
+            ]).to(model.device)
+            decoded = model.decode(mel, decode_options)
+
+            results = []
+            for clip, result in zip(clips, decoded):
+                if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    results.append({"text": "", "segments": [], "language": language})
+                elif (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                      or result.avg_logprob < LOGPROB_THRESHOLD):
+                    instrumentation.count("batch_fallbacks")
+                    results.append(model.transcribe(clip, language=language, **options))
+                else:
+                    segments = _segments_from_tokens(result, tokenizer, len(clip) / WHISPER_SAMPLE_RATE)
+                    results.append({"text": "".join(s["text"] for s in segments),
+                                    "segments": segments, "language": language})
+    return results
+
+
+def _segments_from_tokens(result, tokenizer, duration):
+    """Separa os tokens de um DecodingResult em segmentos pelos pares de timestamps."""
+    segments = []
+    start, text_tokens = None, []
+
+    def close(end):
+        segments.append({
+            "id": len(segments), "seek": 0, "start": start or 0.0, "end": min(end, duration),
+            "text": tokenizer.decode(text_tokens), "tokens": list(text_tokens),
+            "temperature": result.temperature, "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio, "no_speech_prob": result.no_speech_prob,
+        })
+
+    for token in result.tokens:
+        if token >= tokenizer.timestamp_begin:
+            seconds = (token - tokenizer.timestamp_begin) * 0.02
+            if start is not None and text_tokens:
+                close(seconds)
+                start, text_tokens = None, []
+            else:
+                start = seconds
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        close(duration)
+    return segments
+
+
+def _transcribe_speech_only(model, audio, language, options, on_segment=None, draft=None):
+    """Transcreve só os trechos com fala e devolve os tempos no áudio original."""
+    with instrumentation.span("vad"):
+        compact, time_map, stats = strip_silence(audio)
+    instrumentation.log(f"VAD: {stats['skipped_seconds']:.1f}s de {stats['original_seconds']:.1f}s ignorados "
+                        f"({stats['skipped_ratio']:.0%} de silêncio)", **stats)
+
+    if len(compact) == 0:
+        result = {"text": "", "segments": [], "language": language}
+    else:
+        remapped_callback = None
+        if on_segment is not None:
+            remapped_callback = lambda segment: on_segment(time_map.remap_segment(segment))
+        result = time_map.remap_result(_decode(model, compact, language, options, remapped_callback, draft))
+    result["vad"] = stats
+    return result
+
+
+def _decode(model, audio, language, options, on_segment=None, draft=None):
+    """Chamada ao Whisper, medida como "decode" (encoder/decoder medidos por hooks)."""
+    with getattr(model, "decode_lock", nullcontext()), encoder_cache.transcribe_mels():
+        with instrumentation.span("decode", model=getattr(model, "model_name", None)):
+            if draft is not None and language is not None:
+                from . import speculative
+                return speculative.transcribe(model, draft, audio, language, options, on_segment,
+                                              getattr(_progress, "callback", None))
+            if on_segment is not None:
+                return _decode_incremental(model, audio, language, options, on_segment)
+            return model.transcribe(audio, language=language, **options)
+
+
+def _decode_incremental(model, audio, language, options, on_segment):
+    """
+    `model.transcribe` normal (mesmo avanço pelos timestamps entre as janelas,
+    mesmo resultado), entregando os segmentos de cada janela de 30 s logo que
+    ela termina, pelo mesmo gancho da barra de progresso.
+    """
+    delivered = 0
+
+    def on_window(segments):
+        nonlocal delivered
+        for segment in segments[delivered:]:
+            on_segment(segment)
+        delivered = len(segments)
+
+    previous = getattr(_progress, "on_window", None)
+    _install_progress_hook()
+    _progress.on_window = on_window
+    try:
+        result = model.transcribe(audio, language=language, **options)
+    finally:
+        _progress.on_window = previous
+    # O que o gancho não viu (ex.: outra versão do Whisper) sai no fim
+    on_window(result["segments"])
+    return result
+
+
+@contextmanager
+def progress_callback(callback):
+    """
+    Durante o bloco, `callback(fração)` é chamado (nesta thread) a cada janela
+    decodificada pelo Whisper: posição do fim do último segmento sobre a
+    duração do áudio. Uma exceção levantada pelo callback interrompe a
+    transcrição (usado para cancelar trabalhos).
+    """
+    _install_progress_hook()
+    previous = getattr(_progress, "callback", None)
+    _progress.callback = callback
+    try:
+        yield
+    finally:
+        _progress.callback = previous
+
+
+def _install_progress_hook():
+    """
+    O Whisper só expõe o progresso pela barra do tqdm; a barra usada por
+    `whisper.transcribe` é trocada (uma vez) por uma que repassa o avanço ao
+    callback da thread atual e mantém a barra original quando `verbose=False`.
+    Com entrega incremental (ver _decode_incremental), a barra também
+    repassa os segmentos já prontos a cada janela.
+    """
+    # `whisper.transcribe` é também o nome da função exportada pelo pacote
+    whisper_transcribe = importlib.import_module("whisper.transcribe")
+
+    with _progress_hook_lock:
+        if getattr(whisper_transcribe.tqdm, "_speechtotext_hook", False):
+            return
+        original_tqdm = whisper_transcribe.tqdm.tqdm
+
+        class ProgressBar:
+            def __init__(self, total=None, disable=False, **kwargs):
+                self.total = total
+                self.n = 0
+                self.callback = getattr(_progress, "callback", None)
+                self.on_window = getattr(_progress, "on_window", None)
+                self.bar = None if disable else original_tqdm(total=total, **kwargs)
+
+            def update(self, n=1):
+                self.n += n
+                if self.on_window is not None:
+                    # Chamado pelo laço de `whisper.transcribe` logo depois de
+                    # guardar os segmentos da janela em `all_segments`
+                    segments = sys._getframe(1).f_locals.get("all_segments")
+                    if segments is not None:
+                        self.on_window(segments)
+                if self.bar is not None:
+                    self.bar.update(n)
+                if self.callback is not None and self.total:
+                    self.callback(min(1.0, self.n / self.total))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                if self.bar is not None:
+                    self.bar.close()
+
+        whisper_transcribe.tqdm = types.SimpleNamespace(tqdm=ProgressBar, _speechtotext_hook=True)
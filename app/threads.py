@@ -1,6 +1,7 @@
-import whisper
 from PySide6.QtCore import QThread, Signal
-import torch
+
+from .services import inference_worker, instrumentation, tuning
+from .services.model_pool import get_model_pool
 
 class ModelLoaderThread(QThread):
     """
@@ -8,7 +9,8 @@ class ModelLoaderThread(QThread):
     evitando que a interface do usuário congele.
     """
     # Sinal que será emitido quando o modelo estiver carregado.
-    # Ele enviará o objeto do modelo como argumento.
+    # Ele enviará o objeto do modelo como argumento (ou só o nome, quando o
+    # modelo fica num processo de trabalho, ver inference_worker).
     model_loaded = Signal(object)
 
     def __init__(self, model_name):
@@ -22,13 +24,19 @@ class ModelLoaderThread(QThread):
         O carregamento pesado acontece aqui.
         """
         try:
-            # Verifica se há uma GPU CUDA disponível para melhor desempenho
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            print(f"Carregando modelo '{self.model_name}' no dispositivo: {device}...")
-            
-            self.model = whisper.load_model(self.model_name, device=device)
+            # whisper/torch só são importados dentro do serviço, na primeira
+            # carga, para que a janela abra sem esperar por essas importações.
+            # Modelos já residentes no conjunto voltam sem recarregar.
+            if inference_worker.enabled():
+                # O modelo fica carregado no processo de trabalho, não aqui
+                inference_worker.get_worker_pool().preload([self.model_name])
+                self.model = self.model_name
+            else:
+                self.model = get_model_pool().get(self.model_name)
+                # Threads do perfil de desempenho desta máquina (python -m app.tune)
+                tuning.apply_threads(self.model_name, self.model.device.type)
             self.model_loaded.emit(self.model)
             
         except Exception as e:
-            print(f"Erro ao carregar o modelo: {e}")
+            instrumentation.log(f"Erro ao carregar o modelo: {e}")
             self.model_loaded.emit(None) # Emite None em caso de erro
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Ajuste automático do desempenho nesta máquina (uma vez por máquina).
+
+Uso:
+    python -m app.tune -m tiny small medium --audio amostra.wav [--reference amostra.txt]
+    python -m app.tune -m medium large-v3 --int8 --audio amostra.wav [--reference amostra.txt]
+
+Para cada modelo, mede as threads do torch e as opções de decodificação com
+o áudio indicado (de preferência uma gravação típica, de 30 s a alguns
+minutos) e grava o perfil mais rápido dentro da tolerância de WER (ver
+services/tuning.py). A interface e o modo em lote aplicam o perfil sozinhos.
+
+Com --int8, compara cada modelo com a sua versão quantizada (ver
+services/quantization.py): tempo, tamanho dos pesos e diferença de WER. Sem
+--reference, o texto do float32 é a referência. A interface mostra o
+resultado ao carregar o modelo int8.
+"""
+
+import argparse
+import sys
+
+from .services import quantization, tuning, whisper_service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ajuste automático do desempenho nesta máquina.")
+    parser.add_argument("-m", "--models", nargs="+", default=["small"], help="Modelos a ajustar")
+    parser.add_argument("--audio", nargs="+", required=True, help="Áudio(s) de amostra")
+    parser.add_argument("--reference", default=None,
+                        help="Arquivo de texto com a transcrição correta dos áudios (na mesma ordem)")
+    parser.add_argument("--tolerance", type=float, default=tuning.DEFAULT_TOLERANCE,
+                        help="Aumento máximo de WER aceito em relação à referência (padrão: 0.02)")
+    parser.add_argument("--threads", type=int, nargs="+", default=None,
+                        help="Números de threads a testar (padrão: potências de 2 até os núcleos)")
+    parser.add_argument("--language", default=whisper_service.DEFAULT_LANGUAGE, help="Idioma do áudio")
+    parser.add_argument("--int8", action="store_true",
+                        help="Compara cada modelo com a versão quantizada em int8 em vez de ajustar")
+    args = parser.parse_args(argv)
+
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = f.read()
+    audios = [whisper_service.load_audio(path) for path in args.audio]
+
+    try:
+        for model_name in args.models:
+            if args.int8:
+                compare_int8(model_name, audios, reference, args.language)
+                continue
+            print(f"Ajustando '{model_name}'...")
+            profile = tuning.tune_model(model_name, audios, reference, args.tolerance,
+                                        args.threads, args.language)
+            previous = tuning.get_profile(model_name) or {}
+            if "fp32_comparison" in previous:
+                profile["fp32_comparison"] = previous["fp32_comparison"]
+            tuning.save_profile(model_name, profile)
+            print(f"  {profile['threads']} thread(s), decodificação {profile['decode'] or 'padrão'}: "
+                  f"{profile['seconds']}s, WER {profile['wer']:.1%}")
+    except KeyboardInterrupt:
+        return 130
+    print(f"Perfil salvo em {tuning.PROFILE_PATH}")
+    return 0
+
+
+def compare_int8(model_name, audios, reference, language):
+    """Mede o modelo float32 e o int8 e guarda a comparação no perfil do int8."""
+    base = quantization.base_model_name(model_name)
+    print(f"Comparando '{base}' com '{base}{quantization.QUANTIZED_SUFFIX}'...")
+    comparison = quantization.compare_with_fp32(base, audios, reference, language)
+    name = base + quantization.QUANTIZED_SUFFIX
+    profile = tuning.get_profile(name) or {}
+    profile["fp32_comparison"] = comparison
+    tuning.save_profile(name, profile)
+    fp32, int8 = comparison["fp32"], comparison["int8"]
+    print(f"  float32: {fp32['seconds']}s, {fp32['weights_mb']} MB, WER {fp32['wer']:.1%}")
+    print(f"  int8:    {int8['seconds']}s, {int8['weights_mb']} MB, WER {int8['wer']:.1%} "
+          f"({comparison['wer_delta']:+.1%}, {comparison['speedup']}x)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
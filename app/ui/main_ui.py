@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, 
-    QComboBox, QLabel, QCheckBox, QProgressBar
+    QComboBox, QLabel, QCheckBox, QProgressBar, QListWidget
 )
 from .styles import SAVE_AUDIO_CHECKBOX_STYLE, BTN_SAVE_AUDIO_STYLE
 
@@ -22,6 +22,11 @@ def setup_ui(parent_widget):
     parent_widget.mic_combo = QComboBox()
     mic_layout.addWidget(mic_label)
     mic_layout.addWidget(parent_widget.mic_combo)
+    parent_widget.warm_capture_checkbox = QCheckBox("Microfone sempre aberto")
+    parent_widget.warm_capture_checkbox.setStyleSheet(SAVE_AUDIO_CHECKBOX_STYLE)
+    parent_widget.warm_capture_checkbox.setToolTip("Mantém o microfone aberto: a gravação começa na hora, "
+                                                   "incluindo os últimos segundos antes do clique")
+    mic_layout.addWidget(parent_widget.warm_capture_checkbox)
     main_layout.addLayout(mic_layout)
 
     # Opção de salvar áudio
@@ -30,6 +35,28 @@ def setup_ui(parent_widget):
     parent_widget.save_audio_checkbox.setStyleSheet(SAVE_AUDIO_CHECKBOX_STYLE)
     parent_widget.save_audio_checkbox.setToolTip("Se marcado, será solicitado onde salvar o arquivo de áudio")
     save_layout.addWidget(parent_widget.save_audio_checkbox)
+    parent_widget.audio_format_combo = QComboBox()
+    parent_widget.audio_format_combo.addItem("WAV (16 bits)", "wav")
+    parent_widget.audio_format_combo.addItem("FLAC (sem perdas)", "flac")
+    parent_widget.audio_format_combo.setToolTip("Formato do arquivo de áudio salvo (FLAC ocupa cerca de metade do espaço)")
+    save_layout.addWidget(parent_widget.audio_format_combo)
+    parent_widget.live_transcription_checkbox = QCheckBox("Transcrição ao vivo")
+    parent_widget.live_transcription_checkbox.setStyleSheet(SAVE_AUDIO_CHECKBOX_STYLE)
+    parent_widget.live_transcription_checkbox.setToolTip("Se marcado, o texto aparece enquanto você fala")
+    save_layout.addWidget(parent_widget.live_transcription_checkbox)
+    parent_widget.vad_checkbox = QCheckBox("Ignorar silêncios")
+    parent_widget.vad_checkbox.setStyleSheet(SAVE_AUDIO_CHECKBOX_STYLE)
+    parent_widget.vad_checkbox.setToolTip("Remove os trechos sem fala antes de transcrever (mais rápido)")
+    save_layout.addWidget(parent_widget.vad_checkbox)
+    parent_widget.parallel_checkbox = QCheckBox("Arquivo longo em paralelo")
+    parent_widget.parallel_checkbox.setStyleSheet(SAVE_AUDIO_CHECKBOX_STYLE)
+    parent_widget.parallel_checkbox.setToolTip("Divide áudios com mais de 5 minutos em blocos transcritos ao mesmo tempo em vários núcleos")
+    save_layout.addWidget(parent_widget.parallel_checkbox)
+    parent_widget.speculative_checkbox = QCheckBox("Acelerar com rascunho (tiny)")
+    parent_widget.speculative_checkbox.setStyleSheet(SAVE_AUDIO_CHECKBOX_STYLE)
+    parent_widget.speculative_checkbox.setToolTip("O modelo tiny propõe o texto e o modelo escolhido o confere: "
+                                                  "mesmo resultado, mais rápido em CPU com modelos grandes")
+    save_layout.addWidget(parent_widget.speculative_checkbox)
     save_layout.addStretch()
     main_layout.addLayout(save_layout)
 
@@ -42,15 +69,39 @@ def setup_ui(parent_widget):
     main_layout.addLayout(btn_layout)
     
     parent_widget.progress_bar = QProgressBar()
-    parent_widget.progress_bar.setRange(0, 0)  # Coloca em modo "ocupado" (animação)
-    parent_widget.progress_bar.setTextVisible(False)
+    parent_widget.progress_bar.setRange(0, 100)  # Percentual do áudio já transcrito
     parent_widget.progress_bar.setVisible(False) # Começa invisível
     main_layout.addWidget(parent_widget.progress_bar)
 
-    # Label de status
+    # Fila de trabalhos de transcrição (aparece quando há trabalhos)
+    jobs_layout = QHBoxLayout()
+    parent_widget.jobs_list = QListWidget()
+    parent_widget.jobs_list.setMaximumHeight(90)
+    parent_widget.jobs_list.setToolTip("Clique em um trabalho concluído para ver o texto")
+    jobs_layout.addWidget(parent_widget.jobs_list)
+    parent_widget.btn_cancel_job = QPushButton("Cancelar")
+    parent_widget.btn_cancel_job.setToolTip("Cancela o trabalho selecionado (ou o primeiro em andamento)")
+    jobs_layout.addWidget(parent_widget.btn_cancel_job)
+    parent_widget.jobs_widgets = (parent_widget.jobs_list, parent_widget.btn_cancel_job)
+    for widget in parent_widget.jobs_widgets:
+        widget.setVisible(False)
+    main_layout.addLayout(jobs_layout)
+
+    # Label de status e detalhamento de latência do último trabalho
+    status_layout = QHBoxLayout()
     parent_widget.status_label = QLabel("Carregando...") # ALTERADO: Texto inicial
     parent_widget.status_label.setStyleSheet("color: #27ae60; font-weight: bold;")
-    main_layout.addWidget(parent_widget.status_label)
+    status_layout.addWidget(parent_widget.status_label)
+    status_layout.addStretch()
+    parent_widget.btn_latency = QPushButton("Latência")
+    parent_widget.btn_latency.setToolTip("Mostra onde foi gasto o tempo do último trabalho")
+    status_layout.addWidget(parent_widget.btn_latency)
+    main_layout.addLayout(status_layout)
+
+    parent_widget.latency_label = QLabel()
+    parent_widget.latency_label.setStyleSheet("color: #aaaaaa; font-family: monospace; font-size: 12px;")
+    parent_widget.latency_label.setVisible(False)
+    main_layout.addWidget(parent_widget.latency_label)
 
     # Área de texto
     parent_widget.text_edit = QTextEdit()
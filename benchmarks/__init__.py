@@ -0,0 +1 @@
+"""Benchmarks de desempenho da captura e da transcrição (python -m benchmarks)."""
@@ -0,0 +1,54 @@
+"""
+Benchmarks de desempenho (somente CPU).
+
+Uso:
+    python -m benchmarks run --models tiny,base --output resultados.json
+    python -m benchmarks compare linha_de_base.json resultados.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+from .compare import DEFAULT_THRESHOLD, compare_results, load_results, print_comparison
+from .suite import ALL_MODELS, DEFAULT_DURATIONS, DEFAULT_MODELS, run_suite
+
+
+def _csv(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Executa o benchmark e grava o JSON de resultados")
+    run.add_argument("--models", type=_csv, default=DEFAULT_MODELS,
+                     help=f"Modelos separados por vírgula (disponíveis: {','.join(ALL_MODELS)})")
+    run.add_argument("--durations", type=lambda v: _csv(v, int), default=DEFAULT_DURATIONS,
+                     help="Durações dos áudios sintéticos em segundos")
+    run.add_argument("--skip-startup", action="store_true", help="Não mede a abertura da janela")
+    run.add_argument("-o", "--output", default="benchmark_results.json")
+
+    compare = sub.add_parser("compare", help="Compara um resultado com a linha de base")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="Piora relativa tolerada (0.1 = 10%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_suite(args.models, args.durations, include_startup=not args.skip_startup)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}")
+        return 0
+
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    return 1 if print_comparison(rows, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Comparação de resultados de benchmark com uma linha de base salva."""
+
+import json
+
+from .suite import flatten_metrics
+
+DEFAULT_THRESHOLD = 0.10    # Piora relativa tolerada (10%)
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara duas execuções. Retorna uma lista de linhas
+    (métrica, base, atual, variação relativa, regrediu?).
+    """
+    base_metrics = flatten_metrics(baseline)
+    current_metrics = flatten_metrics(current)
+    rows = []
+    for name in sorted(base_metrics.keys() & current_metrics.keys()):
+        base, value = base_metrics[name], current_metrics[name]
+        change = (value - base) / base if base else 0.0
+        rows.append((name, base, value, change, change > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold=DEFAULT_THRESHOLD):
+    """Imprime a tabela de comparação e retorna o número de regressões."""
+    width = max((len(r[0]) for r in rows), default=10)
+    print(f"{'métrica':<{width}}  {'base':>10}  {'atual':>10}  {'variação':>9}")
+    regressions = 0
+    for name, base, value, change, regressed in rows:
+        flag = "  REGRESSÃO" if regressed else ""
+        print(f"{name:<{width}}  {base:>10.4g}  {value:>10.4g}  {change:>+8.1%}{flag}")
+        regressions += regressed
+    print(f"{regressions} regressão(ões) acima de {threshold:.0%}")
+    return regressions
@@ -0,0 +1,57 @@
+"""
+Áudios sintéticos e reprodutíveis para os benchmarks.
+
+Não são fala de verdade: o sinal "de fala" é uma fonte harmônica com contorno
+de entonação, formantes simples e envelope de sílabas (~4 Hz), intercalado com
+pausas. É suficiente para exercitar o VAD, a captura e o custo do modelo de
+forma determinística (mesma semente, mesmo áudio).
+"""
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(seconds, sr=SAMPLE_RATE, seed=0, pause_ratio=0.3):
+    """Sinal parecido com fala (float32 mono), com ~`pause_ratio` de pausas."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+
+    # Frequência fundamental entre ~100 e ~220 Hz variando lentamente
+    f0 = 160 + 60 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    source = sum(np.sin(k * phase) / k for k in range(1, 12))
+
+    # Duas "formantes" como modulação de amplitude de harmônicos altos
+    formants = 0.3 * np.sin(2 * np.pi * 700 * t) + 0.15 * np.sin(2 * np.pi * 1200 * t)
+    voiced = source * (1 + formants)
+
+    # Envelope de sílabas e pausas aleatórias de 0,3 a 1,5 s
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    gate = np.ones(n)
+    pos = 0
+    while pos < n:
+        talk = int(rng.uniform(1.0, 4.0) * sr)
+        pause = int(rng.uniform(0.3, 1.5) * sr * pause_ratio / 0.3)
+        gate[pos + talk:pos + talk + pause] = 0
+        pos += talk + pause
+
+    audio = 0.1 * voiced * syllables * gate + rng.normal(0, 0.002, n)
+    return audio.astype(np.float32)
+
+
+def silence(seconds, sr=SAMPLE_RATE, seed=0, noise_level=0.002):
+    """Silêncio com ruído de fundo leve (float32 mono)."""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, noise_level, int(seconds * sr)).astype(np.float32)
+
+
+def device_blocks(seconds, samplerate=48000, block_seconds=0.01, dtype="float32", seed=0):
+    """Gera blocos como os entregues pelo callback de um microfone (2D, 1 canal)."""
+    audio = speech_like(seconds, samplerate, seed)
+    if dtype == "int16":
+        audio = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    block = int(block_seconds * samplerate)
+    for start in range(0, len(audio) - block + 1, block):
+        yield audio[start:start + block].reshape(-1, 1)
@@ -0,0 +1,105 @@
+"""
+Benchmark de inicialização: mede o tempo até a janela principal aparecer.
+
+Executa `run.py` em um processo novo (partida a frio do interpretador) com a
+variável S2T_STARTUP_BENCHMARK definida. A aplicação exibe a janela, imprime
+um marcador e encerra. O tempo medido vai do disparo do processo até o
+marcador, repetido algumas vezes; a mediana é comparada com a meta.
+
+Uso:
+    python benchmarks/startup_benchmark.py --runs 5 --target-ms 2000
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_SCRIPT = os.path.join(ROOT_DIR, "run.py")
+
+DEFAULT_TARGET_MS = 2000.0
+
+
+def measure_startup_once(timeout=120):
+    """Executa a aplicação uma vez e retorna (ms até a janela, módulos pesados)."""
+    env = dict(os.environ)
+    env["S2T_STARTUP_BENCHMARK"] = "1"
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, RUN_SCRIPT],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+
+    elapsed_ms = None
+    heavy_modules = []
+    try:
+        for line in proc.stdout:
+            line = line.strip()
+            if line == "STARTUP_WINDOW_SHOWN":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            elif line.startswith("STARTUP_HEAVY_MODULES="):
+                value = line.split("=", 1)[1]
+                heavy_modules = [m for m in value.split(",") if m]
+        proc.wait(timeout=timeout)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    if elapsed_ms is None:
+        raise RuntimeError("A aplicação encerrou sem exibir a janela")
+    return elapsed_ms, heavy_modules
+
+
+def run_startup_benchmark(runs=5, target_ms=DEFAULT_TARGET_MS):
+    """Mede a inicialização `runs` vezes e retorna um dicionário com os resultados."""
+    timings = []
+    heavy_modules = set()
+    for i in range(runs):
+        elapsed_ms, heavy = measure_startup_once()
+        timings.append(elapsed_ms)
+        heavy_modules.update(heavy)
+        print(f"  execução {i + 1}: {elapsed_ms:.0f} ms")
+
+    median_ms = statistics.median(timings)
+    return {
+        "runs": runs,
+        "timings_ms": timings,
+        "median_ms": median_ms,
+        "min_ms": min(timings),
+        "target_ms": target_ms,
+        "heavy_modules_at_startup": sorted(heavy_modules),
+        "passed": median_ms <= target_ms and not heavy_modules,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo até a primeira janela.")
+    parser.add_argument("--runs", type=int, default=5, help="Número de execuções")
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_MS,
+                        help="Meta para a mediana do tempo até a janela (ms)")
+    args = parser.parse_args(argv)
+
+    print(f"Medindo inicialização ({args.runs} execuções)...")
+    result = run_startup_benchmark(args.runs, args.target_ms)
+
+    print(f"Mediana: {result['median_ms']:.0f} ms (meta: {result['target_ms']:.0f} ms)")
+    if result["heavy_modules_at_startup"]:
+        print(f"Módulos pesados importados antes da janela: {', '.join(result['heavy_modules_at_startup'])}")
+
+    if result["passed"]:
+        print("OK: inicialização dentro da meta")
+        return 0
+    print("FALHA: inicialização acima da meta")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+"""
+Casos do benchmark de desempenho (somente CPU).
+
+Cada caso roda num processo novo para que o pico de memória (RSS) medido seja
+só dele. Todos os tempos estão em segundos.
+"""
+
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.services.memory import get_peak_rss_bytes  # noqa: E402
+
+from . import fixtures  # noqa: E402
+
+# Mesmos modelos oferecidos na interface (_populate_models)
+ALL_MODELS = ["tiny", "base", "small", "medium", "large-v3"]
+DEFAULT_MODELS = ["tiny", "base"]
+DEFAULT_DURATIONS = [10, 30, 60]
+
+
+def _isolated(func, *args):
+    """Executa `func(*args)` num processo novo e anexa o pico de RSS do processo."""
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(_measure, (func, args))
+
+
+def _measure(func, args):
+    result = func(*args)
+    peak = get_peak_rss_bytes()
+    result["peak_rss_mb"] = round(peak / 2**20, 1) if peak else None
+    return result
+
+
+def _force_cpu():
+    import torch
+    torch.set_num_threads(os.cpu_count() or 1)
+
+
+def case_model_load(model_name, mmap=True):
+    """
+    Tempo de carga do modelo (com o checkpoint já no cache local), com os
+    pesos mapeados (`mmap=True`, já convertidos antes de medir) ou pelo
+    `whisper.load_model` original. `first_encode_seconds` é a primeira passada
+    do encoder, onde a carga mapeada paga a leitura das páginas do disco.
+    """
+    from app.services import model_store, whisper_service
+
+    _force_cpu()
+    if mmap:
+        model_store.convert_checkpoint(model_name)
+    start = time.perf_counter()
+    model = whisper_service.load_model(model_name, device="cpu", mmap=mmap)
+    seconds = time.perf_counter() - start
+
+    import torch
+    mel = torch.zeros(1, model.dims.n_mels, 2 * model.dims.n_audio_ctx)
+    start = time.perf_counter()
+    with torch.no_grad():
+        model.embed_audio(mel)
+    return {"seconds": round(seconds, 3), "first_encode_seconds": round(time.perf_counter() - start, 3)}
+
+
+def case_transcribe_rtf(model_name, durations):
+    """Fator de tempo real (tempo de decodificação / duração do áudio) por duração."""
+    from app.services import whisper_service
+
+    _force_cpu()
+    model = whisper_service.load_model(model_name, device="cpu")
+    results = {}
+    for seconds in durations:
+        audio = fixtures.speech_like(seconds, seed=seconds)
+        start = time.perf_counter()
+        # temperature=0: sem fallback aleatório, para resultados reprodutíveis
+        whisper_service.transcribe(model, audio, temperature=0.0)
+        elapsed = time.perf_counter() - start
+        results[str(seconds)] = {"seconds": round(elapsed, 3), "rtf": round(elapsed / seconds, 4)}
+    return {"durations": results}
+
+
+def case_batch_throughput(model_name, clips=16, seconds=8, batch_size=8):
+    """
+    Clipes curtos por segundo transcritos um a um e em lotes de `batch_size`
+    (uma passada do encoder e do decoder por lote, ver transcribe_batch).
+    """
+    from app.services import encoder_cache, whisper_service
+
+    _force_cpu()
+    model = whisper_service.load_model(model_name, device="cpu")
+    audios = [fixtures.speech_like(seconds, seed=100 + i) for i in range(clips)]
+
+    start = time.perf_counter()
+    for audio in audios:
+        whisper_service.transcribe(model, audio, temperature=0.0)
+    sequential = time.perf_counter() - start
+
+    # Sem as saídas do encoder da passada anterior: compara só o lote
+    encoder_cache.get_encoder_cache().clear()
+    start = time.perf_counter()
+    whisper_service.transcribe_batch(model, audios, batch_size=batch_size, temperature=0.0)
+    batched = time.perf_counter() - start
+
+    return {
+        "clips": clips,
+        "batch_size": batch_size,
+        "sequential_clips_per_second": round(clips / sequential, 2),
+        "batched_clips_per_second": round(clips / batched, 2),
+        "seconds_per_clip": round(batched / clips, 3),
+        "speedup": round(sequential / batched, 2),
+    }
+
+
+def case_speculative(model_name, draft_name="tiny", seconds=30):
+    """
+    Decodificação gulosa do modelo sozinho vs. especulativa com `draft_name`
+    propondo os tokens, no mesmo áudio. `identical` confere, na primeira
+    janela, se os tokens são os mesmos da decodificação gulosa do Whisper.
+    """
+    import torch
+    import whisper
+    from app.services import encoder_cache, speculative, whisper_service
+
+    _force_cpu()
+    model = whisper_service.load_model(model_name, device="cpu")
+    draft = whisper_service.load_model(draft_name, device="cpu")
+    audio = fixtures.speech_like(seconds, seed=11)
+
+    start = time.perf_counter()
+    whisper_service.transcribe(model, audio, temperature=0.0)
+    greedy = time.perf_counter() - start
+
+    encoder_cache.get_encoder_cache().clear()
+    start = time.perf_counter()
+    result = whisper_service.transcribe(model, audio, draft=draft, temperature=0.0)
+    spec = time.perf_counter() - start
+
+    window = audio[:30 * 16000]
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(window)), model.dims.n_mels)
+    options = whisper.DecodingOptions(language=whisper_service.DEFAULT_LANGUAGE, temperature=0.0, fp16=False)
+    reference = model.decode(mel[None], options)[0]
+    window_result = speculative.decode_window(model, draft, window, whisper_service.DEFAULT_LANGUAGE)
+
+    stats = result["speculative"]
+    return {
+        "draft": draft_name,
+        "greedy_seconds": round(greedy, 3),
+        "seconds": round(spec, 3),
+        "speedup": round(greedy / spec, 2),
+        "accept_rate": stats["accept_rate"],
+        "tokens_per_pass": stats["tokens_per_pass"],
+        "identical": window_result.tokens == reference.tokens,
+    }
+
+
+def case_encoder_cache(model_name, seconds=60):
+    """
+    Repetição da transcrição do mesmo áudio com outras opções de decodificação
+    (outro prompt): sem cache, com as saídas do encoder em memória e lidas do
+    disco (cache novo, como numa nova execução).
+    """
+    from app.services import encoder_cache, whisper_service
+
+    _force_cpu()
+    model = whisper_service.load_model(model_name, device="cpu")
+    audio = fixtures.speech_like(seconds, seed=21)
+
+    def rerun(prompt):
+        start = time.perf_counter()
+        whisper_service.transcribe(model, audio, temperature=0.0, initial_prompt=prompt)
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        encoder_cache.set_encoder_cache(encoder_cache.EncoderCache(disk_dir=tmp))
+        cold = rerun(None)
+        memory = rerun("Reunião de equipe.")
+        encoder_cache.set_encoder_cache(encoder_cache.EncoderCache(disk_dir=tmp))
+        disk = rerun("Aula gravada.")
+    return {
+        "cold_seconds": round(cold, 3),
+        "warm_seconds": round(memory, 3),
+        "disk_seconds": round(disk, 3),
+        "speedup": round(cold / memory, 2),
+    }
+
+
+def case_quantized(model_name, seconds=30):
+    """
+    Modelo float32 vs. quantizado em int8 (ver quantization.py) no mesmo
+    áudio: tempo, tamanho dos pesos e diferença de WER em relação ao float32.
+    """
+    from app.services import quantization
+
+    _force_cpu()
+    comparison = quantization.compare_with_fp32(model_name, [fixtures.speech_like(seconds, seed=31)])
+    return {
+        "fp32_seconds": comparison["fp32"]["seconds"],
+        "seconds": comparison["int8"]["seconds"],
+        "fp32_weights_mb": comparison["fp32"]["weights_mb"],
+        "weights_mb": comparison["int8"]["weights_mb"],
+        "wer_delta": comparison["wer_delta"],
+        "speedup": comparison["speedup"],
+    }
+
+
+def case_audio_load(seconds=300, samplerate=48000):
+    """
+    Decodificação de arquivos (estéreo, `samplerate`) para 16 kHz mono no
+    próprio processo, por formato.
+    """
+    import numpy as np
+    import soundfile as sf
+    from app.services import whisper_service
+
+    audio = fixtures.speech_like(seconds, seed=7)
+    audio = np.repeat(audio, samplerate // 16000)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("wav", "flac"):
+            path = os.path.join(tmp, f"audio.{fmt}")
+            sf.write(path, np.stack([audio, audio], axis=1), samplerate, subtype="PCM_16")
+            start = time.perf_counter()
+            whisper_service.load_audio(path)
+            results[fmt] = {"seconds": round(time.perf_counter() - start, 3),
+                            "mb": round(os.path.getsize(path) / 2**20, 1)}
+    return {"audio_seconds": seconds, "formats": results}
+
+
+def case_capture_loop(seconds=60, samplerate=48000, block_seconds=0.01, drain_seconds=0.1):
+    """
+    Custo por bloco da captura com entrada simulada: callback -> buffer circular
+    -> leitura pela thread de gravação -> reamostragem para 16 kHz -> arquivo.
+    """
+    from app.services.audio_recorder import RecordingThread, open_recording_file
+    from app.services.audio_utils import WHISPER_SAMPLE_RATE, StreamingResampler
+    from app.services.capture_engine import CaptureEngine
+
+    class _Status:
+        input_overflow = False
+
+    engine = CaptureEngine(None, samplerate)
+    engine.allocate("float32")
+    recorder = RecordingThread(None, None, None)
+    recorder._resampler = StreamingResampler(samplerate, WHISPER_SAMPLE_RATE)
+
+    blocks = list(fixtures.device_blocks(seconds, samplerate, block_seconds))
+    blocks_per_drain = max(1, int(drain_seconds / block_seconds))
+    status = _Status()
+    callback_time = 0.0
+    drain_time = 0.0
+    drains = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open_recording_file(os.path.join(tmp, "capture.wav"), samplerate) as out_file:
+            for i, block in enumerate(blocks, 1):
+                start = time.perf_counter()
+                engine._callback(block, len(block), None, status)
+                callback_time += time.perf_counter() - start
+
+                if i % blocks_per_drain == 0 or i == len(blocks):
+                    start = time.perf_counter()
+                    recorder._handle_block(engine.read_available(), out_file)
+                    drain_time += time.perf_counter() - start
+                    drains += 1
+
+    return {
+        "blocks": len(blocks),
+        "callback_us_per_block": round(callback_time / len(blocks) * 1e6, 2),
+        "drain_ms_per_chunk": round(drain_time / drains * 1000, 3),
+        # Fração do tempo real gasta na captura (quanto menor, melhor)
+        "cpu_fraction": round((callback_time + drain_time) / seconds, 5),
+    }
+
+
+def case_warm_capture_idle(seconds=60, samplerate=48000, block_seconds=0.01, preroll_seconds=2.0):
+    """
+    Custo ocioso da captura quente (WarmInput) com entrada simulada: só o
+    callback roda, e a gravação começa com a pré-gravação já no buffer.
+    """
+    from app.services.audio_recorder import RECORDING_RING_SECONDS
+    from app.services.capture_engine import CaptureEngine
+
+    class _Status:
+        input_overflow = False
+
+    engine = CaptureEngine(None, samplerate, ring_seconds=RECORDING_RING_SECONDS + 2 * preroll_seconds)
+    engine.allocate("float32")
+    engine.idle = True
+    blocks = list(fixtures.device_blocks(seconds, samplerate, block_seconds))
+    status = _Status()
+    for block in blocks:
+        engine._callback(block, len(block), None, status)
+
+    start = time.perf_counter()
+    engine.begin(preroll_seconds)
+    preroll = engine.read_available()
+    begin_ms = (time.perf_counter() - start) * 1000
+    return {
+        "callback_us_per_block": round(engine.callback_seconds / len(blocks) * 1e6, 2),
+        "cpu_fraction": round(engine.callback_seconds / seconds, 5),
+        "buffer_mb": round(engine._ring.nbytes / 2**20, 2),
+        "preroll_seconds": round(len(preroll) / samplerate, 3),
+        "begin_ms": round(begin_ms, 3),
+    }
+
+
+def environment_info():
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def run_suite(models=None, durations=None, include_startup=True):
+    """Roda todos os casos e retorna o dicionário de resultados."""
+    models = models or DEFAULT_MODELS
+    durations = durations or DEFAULT_DURATIONS
+    results = {"environment": environment_info(), "model_load": {}, "transcribe": {}}
+
+    for model_name in models:
+        print(f"Carga do modelo '{model_name}'...")
+        results["model_load"][model_name] = _isolated(case_model_load, model_name)
+        results["model_load"][model_name]["pickle"] = _isolated(case_model_load, model_name, False)
+        load = results["model_load"][model_name]
+        print(f"  mapeado: {load['seconds']}s, original: {load['pickle']['seconds']}s")
+
+        print(f"Fator de tempo real '{model_name}' ({', '.join(map(str, durations))} s)...")
+        results["transcribe"][model_name] = _isolated(case_transcribe_rtf, model_name, durations)
+
+        print(f"Clipes curtos em lote '{model_name}'...")
+        batch = results.setdefault("batch", {})[model_name] = _isolated(case_batch_throughput, model_name)
+        print(f"  {batch['sequential_clips_per_second']} -> {batch['batched_clips_per_second']} clipes/s"
+              f" ({batch['speedup']}x)")
+
+    for model_name in models:
+        if model_name in ("tiny", "base"):
+            continue
+        print(f"Decodificação especulativa '{model_name}' (rascunho tiny)...")
+        spec = results.setdefault("speculative", {})[model_name] = _isolated(case_speculative, model_name)
+        print(f"  {spec['greedy_seconds']}s -> {spec['seconds']}s ({spec['speedup']}x), "
+              f"{spec['accept_rate']:.0%} aceitos, tokens idênticos: {spec['identical']}")
+
+    for model_name in models:
+        print(f"Repetição com cache do encoder '{model_name}'...")
+        enc = results.setdefault("encoder_cache", {})[model_name] = _isolated(case_encoder_cache, model_name)
+        print(f"  {enc['cold_seconds']}s -> {enc['warm_seconds']}s em memória ({enc['speedup']}x), "
+              f"{enc['disk_seconds']}s do disco")
+
+    for model_name in models:
+        print(f"Quantização int8 '{model_name}'...")
+        quant = results.setdefault("quantized", {})[model_name] = _isolated(case_quantized, model_name)
+        print(f"  {quant['fp32_seconds']}s -> {quant['seconds']}s ({quant['speedup']}x), "
+              f"{quant['fp32_weights_mb']} -> {quant['weights_mb']} MB, WER {quant['wer_delta']:+.1%}")
+
+    print("Decodificação de arquivos...")
+    results["audio_load"] = _isolated(case_audio_load)
+
+    print("Laço de captura (entrada simulada)...")
+    results["capture"] = _isolated(case_capture_loop)
+    # Dispositivo que aceita 16 kHz direto (perfil de captura nativo): sem reamostragem
+    results["capture"]["native_16k"] = _isolated(case_capture_loop, 60, 16000)
+    results["warm_capture"] = _isolated(case_warm_capture_idle)
+
+    if include_startup:
+        from .startup_benchmark import run_startup_benchmark
+        print("Inicialização da janela...")
+        startup = run_startup_benchmark(runs=3)
+        results["startup"] = {"median_ms": round(startup["median_ms"], 1)}
+
+    return results
+
+
+def flatten_metrics(results):
+    """
+    Extrai as métricas comparáveis como {nome: valor}. Em todas, menor é melhor.
+    """
+    metrics = {}
+    for model_name, data in results.get("model_load", {}).items():
+        metrics[f"model_load.{model_name}.seconds"] = data["seconds"]
+        metrics[f"model_load.{model_name}.peak_rss_mb"] = data.get("peak_rss_mb")
+        metrics[f"model_load.{model_name}.first_encode_seconds"] = data.get("first_encode_seconds")
+        if "pickle" in data:
+            metrics[f"model_load.{model_name}.pickle_seconds"] = data["pickle"]["seconds"]
+    for model_name, data in results.get("transcribe", {}).items():
+        for seconds, values in data["durations"].items():
+            metrics[f"transcribe.{model_name}.{seconds}s.rtf"] = values["rtf"]
+        metrics[f"transcribe.{model_name}.peak_rss_mb"] = data.get("peak_rss_mb")
+    for model_name, data in results.get("batch", {}).items():
+        metrics[f"batch.{model_name}.seconds_per_clip"] = data["seconds_per_clip"]
+    for model_name, data in results.get("speculative", {}).items():
+        metrics[f"speculative.{model_name}.seconds"] = data["seconds"]
+    for model_name, data in results.get("quantized", {}).items():
+        metrics[f"quantized.{model_name}.seconds"] = data["seconds"]
+        metrics[f"quantized.{model_name}.weights_mb"] = data["weights_mb"]
+    for model_name, data in results.get("encoder_cache", {}).items():
+        metrics[f"encoder_cache.{model_name}.warm_seconds"] = data["warm_seconds"]
+        metrics[f"encoder_cache.{model_name}.disk_seconds"] = data["disk_seconds"]
+    audio_load = results.get("audio_load")
+    if audio_load:
+        for fmt, values in audio_load["formats"].items():
+            metrics[f"audio_load.{fmt}.seconds"] = values["seconds"]
+        metrics["audio_load.peak_rss_mb"] = audio_load.get("peak_rss_mb")
+    capture = results.get("capture")
+    if capture:
+        for key in ("callback_us_per_block", "drain_ms_per_chunk", "cpu_fraction", "peak_rss_mb"):
+            metrics[f"capture.{key}"] = capture.get(key)
+        if "native_16k" in capture:
+            metrics["capture.native_16k.cpu_fraction"] = capture["native_16k"]["cpu_fraction"]
+    warm = results.get("warm_capture")
+    if warm:
+        for key in ("cpu_fraction", "buffer_mb", "begin_ms"):
+            metrics[f"warm_capture.{key}"] = warm[key]
+    if "startup" in results:
+        metrics["startup.median_ms"] = results["startup"]["median_ms"]
+    return {k: v for k, v in metrics.items() if v is not None}
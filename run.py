@@ -1,5 +1,8 @@
+import multiprocessing
 import sys
 from app.main import start_application
 
 if __name__ == "__main__":
+    # Executável do PyInstaller: os processos de trabalho (spawn) passam por aqui
+    multiprocessing.freeze_support()
     sys.exit(start_application())
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""Divisão em blocos e costura do modo paralelo (sem modelo)."""
+
+import numpy as np
+import pytest
+
+from app.services.parallel import _dedupe_words, split_at_silence, stitch_segments
+from benchmarks.fixtures import speech_like
+
+SR = 16000
+
+
+def talk_with_pauses(talk_seconds=7.0, pause_seconds=1.0, repeats=12):
+    """Fala contínua intercalada com pausas em silêncio; retorna o áudio e as pausas (amostras)."""
+    parts, pauses, pos = [], [], 0
+    for i in range(repeats):
+        talk = speech_like(talk_seconds, seed=i, pause_ratio=0.0)
+        parts += [talk, np.zeros(int(pause_seconds * SR), dtype=np.float32)]
+        pos += len(talk)
+        pauses.append((pos, pos + int(pause_seconds * SR)))
+        pos += int(pause_seconds * SR)
+    return np.concatenate(parts), pauses
+
+
+def test_short_audio_is_a_single_chunk():
+    audio = np.zeros(5 * SR, dtype=np.float32)
+    assert split_at_silence(audio, chunk_seconds=10) == ([0, len(audio)], [(0, len(audio))])
+
+
+def test_cuts_fall_in_pauses_and_chunks_overlap():
+    audio, pauses = talk_with_pauses()
+    cuts, chunks = split_at_silence(audio, chunk_seconds=20, overlap_seconds=2)
+
+    assert cuts[0] == 0 and cuts[-1] == len(audio) and len(cuts) > 2
+    for cut in cuts[1:-1]:
+        assert any(start <= cut < end for start, end in pauses)
+    for i, (start, end) in enumerate(chunks):
+        assert start == max(0, cuts[i] - 2 * SR)
+        assert end == min(len(audio), cuts[i + 1] + 2 * SR)
+
+
+def test_strict_cuts_before_the_maximum_even_with_a_longer_pause_after_it():
+    # Pausa curta aos 24 s e uma longa aos 26 s: sem `strict`, o corte iria para a longa
+    silence = lambda seconds: np.zeros(int(seconds * SR), dtype=np.float32)
+    audio = np.concatenate([speech_like(24, seed=1, pause_ratio=0.0), silence(0.3),
+                            speech_like(2, seed=2, pause_ratio=0.0), silence(2.0),
+                            speech_like(30, seed=3, pause_ratio=0.0)])
+
+    loose, _ = split_at_silence(audio, chunk_seconds=25, overlap_seconds=0.5)
+    strict, _ = split_at_silence(audio, chunk_seconds=25, overlap_seconds=0.5, strict=True)
+
+    assert loose[1] > 25 * SR
+    assert 24 * SR <= strict[1] <= 24.3 * SR
+    assert max(np.diff(strict)) <= 25 * SR
+
+
+def test_strict_without_pauses_still_respects_the_maximum():
+    # Ruído de fundo acima do limiar de silêncio: nenhum quadro é silencioso
+    rng = np.random.default_rng(0)
+    audio = speech_like(90, seed=4) + rng.normal(0, 0.02, 90 * SR).astype(np.float32)
+
+    cuts, _ = split_at_silence(audio, chunk_seconds=25, overlap_seconds=0.5, strict=True)
+
+    assert len(cuts) > 3 and cuts[-1] == len(audio)
+    assert max(np.diff(cuts)) <= 25 * SR
+
+
+def test_overlap_segments_belong_to_the_chunk_of_their_midpoint():
+    cuts = [0, 10 * SR, 20 * SR]
+    first = [{"start": 0.0, "end": 4.0, "text": "um"},
+             {"start": 8.5, "end": 10.5, "text": "dois"},       # ponto médio 9,5: fica aqui
+             {"start": 10.5, "end": 11.5, "text": "três"}]      # já é do próximo bloco
+    second = [{"start": 8.5, "end": 10.5, "text": "dois"},
+              {"start": 10.5, "end": 11.5, "text": "três"},
+              {"start": 19.0, "end": 21.0, "text": "quatro"}]   # o último bloco fica com o resto
+
+    merged = stitch_segments([first, second], cuts)
+
+    assert [s["text"] for s in merged] == ["um", "dois", "três", "quatro"]
+
+
+def test_stitch_removes_words_repeated_at_the_seam():
+    cuts = [0, 10 * SR, 20 * SR]
+    first = [{"start": 6.0, "end": 9.8, "text": "vamos falar do projeto"}]
+    second = [{"start": 10.0, "end": 12.0, "text": "do projeto novo"},
+              {"start": 12.0, "end": 13.0, "text": "projeto"}]
+
+    merged = stitch_segments([first, second], cuts)
+
+    assert [s["text"] for s in merged] == ["vamos falar do projeto", "novo", "projeto"]
+
+
+def test_stitch_drops_segments_left_empty():
+    cuts = [0, 10 * SR, 20 * SR]
+    merged = stitch_segments([[{"start": 8.0, "end": 9.9, "text": "bom dia"}],
+                              [{"start": 10.1, "end": 11.0, "text": "Bom dia."}]], cuts)
+    assert [s["text"] for s in merged] == ["bom dia"]
+
+
+@pytest.mark.parametrize("previous, text, expected", [
+    ("e então ele disse que", "ele disse que viria", "viria"),
+    ("Até amanhã.", "até amanhã, pessoal", "pessoal"),       # caixa e pontuação não contam
+    ("uma frase qualquer", "outra frase", "outra frase"),
+    ("", "texto", "texto"),
+    ("a b", "a b", ""),
+])
+def test_dedupe_words(previous, text, expected):
+    assert _dedupe_words(previous, text) == expected
+
+
+def test_dedupe_words_looks_only_at_the_last_words():
+    previous = "x " + " ".join(f"w{i}" for i in range(12))
+    text = "x " + " ".join(f"w{i}" for i in range(12)) + " fim"
+    # A repetição tem 13 palavras, mais que `max_words`: só o sufixo é comparado
+    assert _dedupe_words(previous, text, max_words=12) == text
+    assert _dedupe_words(previous, text, max_words=13) == "fim"
@@ -0,0 +1,51 @@
+"""decode_window deve dar os mesmos tokens que a decodificação gulosa do modelo grande."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+whisper = pytest.importorskip("whisper")
+
+from whisper.model import ModelDimensions, Whisper
+
+from app.services.speculative import SpeculativeStats, decode_window
+from benchmarks.fixtures import speech_like
+
+
+def small_model(n_mels, n_vocab, seed):
+    """Modelo minúsculo com pesos aleatórios (mesmo formato de entrada e vocabulário dos oficiais)."""
+    torch.manual_seed(seed)
+    dims = ModelDimensions(n_mels=n_mels, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2,
+                           n_audio_layer=1, n_vocab=n_vocab, n_text_ctx=448, n_text_state=64,
+                           n_text_head=2, n_text_layer=2)
+    return Whisper(dims).eval()
+
+
+def greedy_tokens(model, audio, language):
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), model.dims.n_mels)
+    options = whisper.DecodingOptions(task="transcribe", language=language, temperature=0.0, fp16=False)
+    return model.decode(mel, options).tokens
+
+
+@pytest.mark.parametrize("target_vocab, target_mels, draft_vocab, draft_mels", [
+    (51865, 80, 51865, 80),     # Mesmo tokenizador (ex.: "small" com "tiny")
+    (51866, 128, 51865, 80),    # "large-v3" com "tiny": tokens especiais deslocados
+])
+def test_decode_window_matches_greedy_decode(target_vocab, target_mels, draft_vocab, draft_mels):
+    target = small_model(target_mels, target_vocab, seed=1)
+    draft = small_model(draft_mels, draft_vocab, seed=2)
+    audio = speech_like(10, seed=3)
+
+    result = decode_window(target, draft, audio, "pt")
+
+    assert result.tokens == greedy_tokens(target, audio, "pt")
+
+
+def test_decode_window_accepts_proposals_of_the_same_model():
+    model = small_model(80, 51865, seed=1)
+    audio = speech_like(10, seed=4)
+    stats = SpeculativeStats()
+
+    result = decode_window(model, model, audio, "pt", stats=stats)
+
+    assert result.tokens == greedy_tokens(model, audio, "pt")
+    assert stats.proposed > 0 and stats.accepted == stats.proposed
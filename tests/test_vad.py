@@ -0,0 +1,32 @@
+"""Conversão de tempos do áudio sem silêncio para o original."""
+
+from app.services.vad import TimeMap
+
+SR = 16000
+
+
+def test_times_skip_the_removed_gaps():
+    # Fala em 0-1 s, 3-4 s e 10-12 s; o áudio compactado tem 4 s
+    time_map = TimeMap([(0, SR), (3 * SR, 4 * SR), (10 * SR, 12 * SR)])
+
+    assert time_map.to_original(0.5) == 0.5
+    assert time_map.to_original(1.0) == 3.0
+    assert time_map.to_original(1.5) == 3.5
+    assert time_map.to_original(2.0) == 10.0
+    assert time_map.to_original(3.5) == 11.5
+
+
+def test_remap_result_moves_segments_and_words():
+    time_map = TimeMap([(0, SR), (5 * SR, 7 * SR)])
+    result = {"segments": [{"start": 0.2, "end": 2.5, "text": "oi tudo",
+                            "words": [{"word": "oi", "start": 0.2, "end": 0.6},
+                                      {"word": "tudo", "start": 1.2, "end": 2.5}]}]}
+
+    segment = time_map.remap_result(result)["segments"][0]
+
+    assert (segment["start"], segment["end"]) == (0.2, 6.5)
+    assert [(w["start"], w["end"]) for w in segment["words"]] == [(0.2, 0.6), (5.2, 6.5)]
+
+
+def test_without_intervals_times_are_unchanged():
+    assert TimeMap([]).to_original(12.3) == 12.3